@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for copyright and license details
+
+
+'''
+AST memory benchmark: bytes per node and peak RSS after parsing.
+
+Usage: python -m benchmarks.ast_memory [func_count ...]
+'''
+
+
+import resource
+import sys
+import tracemalloc
+from misery import (
+    misc,
+    parse,
+)
+from benchmarks import (
+    synthetic,
+)
+
+
+def count_nodes(node):
+    ''' Count AST nodes (objects with fields) reachable from node. '''
+    count = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict):
+            stack.extend(node.values())
+        elif hasattr(node, '__slots__') or hasattr(node, '__dict__'):
+            count += 1
+            stack.extend(value for _, value in misc.object_fields(node))
+    return count
+
+
+def main(args):
+    func_counts = [int(arg) for arg in args] or [1000, 10000]
+    for func_count in func_counts:
+        input_string = synthetic.make_program(func_count)
+        tracemalloc.start()
+        module = parse.parse(input_string, backend='descent')
+        ast_size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        node_count = count_nodes(module)
+        print('%6d funcs: %8d nodes, %6.1f bytes/node, %7.1f MB ast' % (
+            func_count,
+            node_count,
+            float(ast_size) / node_count,
+            ast_size / 2.0 ** 20,
+        ))
+        del module
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print('peak RSS: %.1f MB' % (max_rss / 1024.0))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
+
+
+# vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for copyright and license details
+
+
+'''
+Batch compilation benchmark: many modules translated to C
+with different count of worker processes.
+
+Usage: python -m benchmarks.batch [module_count [func_count]]
+'''
+
+
+import os
+import sys
+import tempfile
+import time
+from misery import (
+    driver,
+)
+from benchmarks import (
+    synthetic,
+)
+
+
+def main(args):
+    module_count = int(args[0]) if len(args) > 0 else 200
+    func_count = int(args[1]) if len(args) > 1 else 100
+    input_string = synthetic.make_program(func_count)
+    options = driver.Options(emit_c=True)
+    job_counts = sorted({1, 2, os.cpu_count() or 1})
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_file_names = []
+        for index in range(module_count):
+            file_name = os.path.join(tmp_dir, 'module%d.mis' % index)
+            with open(file_name, 'w') as file_:
+                file_.write(input_string)
+            input_file_names.append(file_name)
+        for jobs in job_counts:
+            start_time = time.perf_counter()
+            result_list = driver.compile_files(
+                input_file_names,
+                options,
+                jobs=jobs,
+            )
+            elapsed = time.perf_counter() - start_time
+            assert all(result.ok for result in result_list)
+            print('%4d modules x %4d funcs, %2d jobs: %7.3f s' % (
+                module_count,
+                func_count,
+                jobs,
+                elapsed,
+            ))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
+
+
+# vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for copyright and license details
+
+
+'''
+Compilation cache benchmark: cold and warm translation to C.
+
+Usage: python -m benchmarks.cache [func_count ...]
+'''
+
+
+import os
+import sys
+import tempfile
+import time
+from misery import (
+    driver,
+)
+from benchmarks import (
+    synthetic,
+)
+
+
+def main(args):
+    func_counts = [int(arg) for arg in args] or [100, 1000, 10000]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        options = driver.Options(
+            emit_c=True,
+            use_cache=True,
+            cache_dir=os.path.join(tmp_dir, 'cache'),
+        )
+        for func_count in func_counts:
+            input_file_name = os.path.join(tmp_dir, 'prog.mis')
+            with open(input_file_name, 'w') as file_:
+                file_.write(synthetic.make_program(func_count))
+            times = []
+            for _ in ('cold', 'warm'):
+                start_time = time.perf_counter()
+                result = driver.compile_file(input_file_name, None, options)
+                times.append(time.perf_counter() - start_time)
+                assert result.ok
+            print('%6d funcs: cold %7.3f s, warm %7.3f s' % (
+                func_count,
+                times[0],
+                times[1],
+            ))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
+
+
+# vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for copyright and license details
+
+
+'''
+Frame size benchmark: size of generated C code, count of locals
+and size of stack frames as optimization passes are added one by
+one: constant folding with tail calls, dead code elimination
+and tmp slot reuse.
+
+Frame size is sum of sizes of locals of all funcs,
+Int is 4 bytes, pointers and String are 8 bytes.
+
+Usage: python -m benchmarks.frame_size [func_count]
+'''
+
+
+import os
+import sys
+from misery import (
+    ast,
+    datatype,
+    generator,
+    ident_table,
+    optimizer,
+    parse,
+)
+from benchmarks import (
+    synthetic,
+)
+
+
+_RUNTIME_DIR = os.path.join(os.path.dirname(__file__), 'runtime')
+
+
+def _c_size(datatype_):
+    is_reference = datatype_.prefix_list and 'R' in datatype_.prefix_list
+    if datatype_.name == 'Int' and not is_reference:
+        return 4
+    return 8
+
+
+def _frame_stats(ast_):
+    ''' Return (count of locals, frame size) of all funcs. '''
+    local_count = 0
+    frame_size = 0
+    for decl in ast_.decl_list:
+        if not isinstance(decl, ast.FuncDecl):
+            continue
+        local_count += len(decl.vars)
+        frame_size += 8 * len(decl.vars)
+        for datatype_ in decl.tmp_vars.values():
+            local_count += 1
+            frame_size += _c_size(datatype_)
+        for expr in decl.constants.values():
+            local_count += 1
+            frame_size += _c_size(datatype.literal_datatype(expr))
+    return local_count, frame_size
+
+
+def _programs(func_count):
+    for file_name in sorted(os.listdir(_RUNTIME_DIR)):
+        if file_name.endswith('.mis'):
+            with open(os.path.join(_RUNTIME_DIR, file_name)) as file_:
+                yield os.path.splitext(file_name)[0], file_.read()
+    yield (
+        'synthetic_%d' % func_count,
+        synthetic.make_program(func_count),
+    )
+    yield (
+        'dead_code_%d' % func_count,
+        synthetic.make_dead_code_program(func_count),
+    )
+
+
+def main(args):
+    func_count = int(args[0]) if args else 1000
+    stages = [
+        ('none', lambda ast_: ast_),
+        ('fold', lambda ast_: optimizer.mark_tail_calls(
+            optimizer.fold_constants(ast_))),
+        ('dce', lambda ast_: optimizer.eliminate_dead_code(
+            optimizer.mark_tail_calls(optimizer.fold_constants(ast_)))),
+        ('-O', optimizer.optimize),
+    ]
+    print('%-16s %-7s %8s %7s %8s' % (
+        'program', 'passes', 'C, bytes', 'locals', 'frame, B'))
+    for name, input_string in _programs(func_count):
+        ast_ = parse.parse(input_string, backend='descent')
+        ast_.ident_list = ident_table.ident_table(ast_)
+        ast_ = datatype.mark_out_datatypes(ast_)
+        for stage_name, run_passes in stages:
+            optimized_ast = run_passes(ast_)
+            c_code = generator.Generator(optimized_ast).generate()
+            local_count, frame_size = _frame_stats(optimized_ast)
+            print('%-16s %-7s %8d %7d %8d' % (
+                name,
+                stage_name,
+                len(c_code),
+                local_count,
+                frame_size,
+            ))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
+
+
+# vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for copyright and license details
+
+
+'''
+C generation benchmark: time and peak memory of generating
+C code into a string and streaming it into a file.
+
+Usage: python -m benchmarks.generator [func_count ...]
+'''
+
+
+import os
+import sys
+import tempfile
+from misery import (
+    datatype,
+    generator,
+    ident_table,
+    parse,
+)
+from benchmarks import (
+    measure,
+    synthetic,
+)
+
+
+def main(args):
+    func_counts = [int(arg) for arg in args] or [50000]
+    for func_count in func_counts:
+        input_string = synthetic.make_program(func_count)
+        ast_ = parse.parse(input_string, backend='descent')
+        ast_.ident_list = ident_table.ident_table(ast_)
+        ast_ = datatype.mark_out_datatypes(ast_)
+        del input_string
+        generator_ = generator.Generator(ast_)
+        elapsed, peak, _ = measure.measure(generator_.generate_full)
+        print('%6d funcs, string: %7.3f s, peak %7.1f MB' % (
+            func_count,
+            elapsed,
+            peak,
+        ))
+        file_descriptor, file_name = tempfile.mkstemp(suffix='.c')
+        try:
+            with os.fdopen(file_descriptor, 'w') as file_:
+
+                def write_full():
+                    file_.seek(0)
+                    file_.truncate()
+                    generator_.write_full(file_)
+
+                elapsed, peak, _ = measure.measure(write_full)
+            print('%6d funcs, file:   %7.3f s, peak %7.1f MB, %.1f MB' % (
+                func_count,
+                elapsed,
+                peak,
+                os.path.getsize(file_name) / 2.0 ** 20,
+            ))
+        finally:
+            os.remove(file_name)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
+
+
+# vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for copyright and license details
+
+
+'''
+Incremental build benchmark: program of many modules is rebuilt
+to executable after different kinds of changes, as one C file
+and with separate compilation of modules.
+
+Usage: python -m benchmarks.incremental [module_count [func_count]]
+
+C compiler is $CC or tcc.
+'''
+
+
+import os
+import sys
+import tempfile
+import time
+from misery import (
+    build,
+)
+from benchmarks import (
+    synthetic,
+)
+
+
+def _write(file_name, string):
+    with open(file_name, 'w') as file_:
+        file_.write(string)
+
+
+def main(args):
+    module_count = int(args[0]) if len(args) > 0 else 50
+    func_count = int(args[1]) if len(args) > 1 else 200
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        names = ['m%d' % index for index in range(module_count)]
+        for name in names:
+            _write(
+                os.path.join(tmp_dir, name + '.mis'),
+                synthetic.make_library(name, func_count),
+            )
+        main_file_name = os.path.join(tmp_dir, 'main.mis')
+        _write(main_file_name, (
+            'import { ' + ' '.join(names) + ' }\n'
+            'func start {\n' +
+            ''.join('  print(%sF0(1))\n' % name for name in names) +
+            '}\n'
+        ))
+        changed_file_name = os.path.join(tmp_dir, names[0] + '.mis')
+        changed_source = synthetic.make_library(names[0], func_count)
+
+        def change_body():
+            _write(changed_file_name, changed_source.replace(
+                'print(a)', 'print(plus(a 1))', 1))
+
+        def change_interface():
+            _write(changed_file_name, changed_source + (
+                'func extra -> Int { return 1 }\n'))
+
+        cc = os.environ.get('CC', 'tcc')
+        exe_file_name = os.path.join(tmp_dir, 'main')
+        for separate in (False, True):
+            print('separate compilation' if separate else 'one C file')
+            _write(changed_file_name, changed_source)
+            builder = build.Builder(
+                os.path.join(tmp_dir, 'build'),
+                separate=separate,
+                cc=cc,
+            )
+            for title, change in [
+                ('full build', None),
+                ('no changes', None),
+                ('func body changed', change_body),
+                ('interface changed', change_interface),
+            ]:
+                if change:
+                    change()
+                start_time = time.perf_counter()
+                if separate:
+                    builder.build_executable(main_file_name, exe_file_name)
+                else:
+                    c_file_name = builder.build(main_file_name)
+                    build.run_c_compiler(
+                        cc,
+                        [c_file_name, '-o', exe_file_name],
+                    )
+                elapsed = time.perf_counter() - start_time
+                print('  %-20s %7.3f s, %3d of %d modules translated' % (
+                    title,
+                    elapsed,
+                    len(builder.rebuilt_module_names),
+                    module_count + 1,
+                ))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
+
+
+# vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for copyright and license details
+
+
+'''
+Lexer throughput benchmark.
+
+Usage: python -m benchmarks.lexer [size_in_megabytes ...]
+'''
+
+
+import sys
+import time
+from misery import (
+    parse,
+)
+from benchmarks import (
+    synthetic,
+)
+
+
+def _count_tokens(lexer, input_string):
+    lexer.input(input_string)
+    count = 0
+    for _ in lexer:
+        count += 1
+    return count
+
+
+def _bench(name, func, input_string):
+    start_time = time.perf_counter()
+    token_count = func(input_string)
+    elapsed = time.perf_counter() - start_time
+    print('  %-12s %9d tokens %8.3f s %12.0f tokens/s' % (
+        name,
+        token_count,
+        elapsed,
+        token_count / elapsed,
+    ))
+
+
+def main(args):
+    sizes = [float(arg) for arg in args] or [1.0, 4.0]
+    ply_lexer = parse.make_lexer()
+    for size in sizes:
+        input_string = synthetic.make_program_of_size(int(size * 2 ** 20))
+        print('input: %.1f MB' % (len(input_string) / 2.0 ** 20))
+        _bench(
+            'ply',
+            lambda s: _count_tokens(ply_lexer.clone(), s),
+            input_string,
+        )
+        _bench(
+            'fast',
+            lambda s: _count_tokens(parse.FastLexer(), s),
+            input_string,
+        )
+        _bench('scan', lambda s: len(parse.scan(s)), input_string)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
+
+
+# vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
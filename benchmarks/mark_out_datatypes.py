@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for copyright and license details
+
+
+'''
+Datatype marking benchmark: time and peak memory.
+
+Usage: python -m benchmarks.mark_out_datatypes [func_count ...]
+'''
+
+
+import sys
+import time
+import tracemalloc
+from misery import (
+    datatype,
+    ident_table,
+    parse,
+)
+from benchmarks import (
+    synthetic,
+)
+
+
+def main(args):
+    func_counts = [int(arg) for arg in args] or [1000, 10000]
+    for func_count in func_counts:
+        input_string = synthetic.make_program(func_count)
+        ast_ = parse.parse(input_string, backend='descent')
+        ast_.ident_list = ident_table.ident_table(ast_)
+        tracemalloc.start()
+        start_memory, _ = tracemalloc.get_traced_memory()
+        start_time = time.perf_counter()
+        marked_ast = datatype.mark_out_datatypes(ast_)
+        elapsed = time.perf_counter() - start_time
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print('%6d funcs: %7.3f s, peak %7.1f MB' % (
+            func_count,
+            elapsed,
+            (peak_memory - start_memory) / 2.0 ** 20,
+        ))
+        del marked_ast
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
+
+
+# vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for copyright and license details
+
+
+'''
+Time and peak memory of benchmarked calls.
+'''
+
+
+import time
+import tracemalloc
+
+
+def measure(func):
+    ''' Return (seconds, peak MB, result) of func call.
+
+        Time is measured separately, tracemalloc slows code down,
+        so func is called twice.
+    '''
+    start_time = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start_time
+    tracemalloc.start()
+    start_memory, _ = tracemalloc.get_traced_memory()
+    func()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, (peak_memory - start_memory) / 2.0 ** 20, result
+
+
+# vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
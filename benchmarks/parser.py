@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for copyright and license details
+
+
+'''
+Parser backends benchmark: startup latency and throughput.
+
+Usage: python -m benchmarks.parser [func_count]
+'''
+
+
+import subprocess
+import sys
+import time
+from misery import (
+    parse,
+)
+from benchmarks import (
+    synthetic,
+)
+
+
+_startup_code = '''
+import time
+start_time = time.perf_counter()
+from misery import parse
+parse.parse('func start { print(1) }', backend=%r)
+print(time.perf_counter() - start_time)
+'''
+
+
+def _startup_time(backend):
+    ''' Time of first parse in fresh interpreter. '''
+    output = subprocess.check_output(
+        [sys.executable, '-c', _startup_code % backend],
+        universal_newlines=True,
+    )
+    return float(output)
+
+
+def main(args):
+    func_count = int(args[0]) if args else 2000
+    input_string = synthetic.make_program(func_count)
+    token_count = len(parse.scan(input_string))
+    print('input: %d funcs, %d tokens' % (func_count, token_count))
+    for backend in ('ply', 'descent'):
+        parse.parse('', backend=backend)  # warm up
+        start_time = time.perf_counter()
+        parse.parse(input_string, backend=backend)
+        elapsed = time.perf_counter() - start_time
+        print('  %-8s startup %7.2f ms, parse %7.3f s, %10.0f tokens/s' % (
+            backend,
+            _startup_time(backend) * 1000,
+            elapsed,
+            token_count / elapsed,
+        ))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
+
+
+# vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for copyright and license details
+
+
+'''
+Runtime benchmark of generated executables.
+
+Every <name>.mis program in this dir has hand-written C baseline
+<name>.c printing the same output. Both are compiled with every
+C compiler and optimization level, the best of several runs
+is reported, so overhead of generated code can be tracked.
+
+Usage: python -m benchmarks.runtime [--cc tcc gcc]
+           [--opt 0 2] [--repeat 3] [--pass-by-value] [-O]
+           [-o out.json] [name ...]
+'''
+
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from misery import (
+    driver,
+)
+
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _program_names():
+    return sorted(
+        os.path.splitext(file_name)[0]
+        for file_name in os.listdir(_DIR)
+        if file_name.endswith('.mis')
+    )
+
+
+def _run(exe_file_name, repeat):
+    ''' Return (best seconds, stdout) of runs of executable. '''
+    out = subprocess.check_output([exe_file_name])
+    best_time = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        subprocess.check_call([exe_file_name], stdout=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start_time
+        if best_time is None or elapsed < best_time:
+            best_time = elapsed
+    return best_time, out
+
+
+def _bench(name, cc, opt, repeat, tmp_dir, options):
+    cflags = [opt] if opt else []
+    mis_exe_file_name = os.path.join(tmp_dir, name + '_mis')
+    result = driver.compile_file(
+        os.path.join(_DIR, name + '.mis'),
+        mis_exe_file_name,
+        driver.Options(cc=cc, cflags=cflags, **options),
+    )
+    if not result.ok:
+        raise Exception(result.error)
+    c_exe_file_name = os.path.join(tmp_dir, name + '_c')
+    driver.compile_c(
+        os.path.join(_DIR, name + '.c'),
+        c_exe_file_name,
+        cc=cc,
+        cflags=cflags,
+    )
+    mis_time, mis_out = _run(mis_exe_file_name, repeat)
+    c_time, c_out = _run(c_exe_file_name, repeat)
+    if mis_out != c_out:
+        raise Exception('Output of ' + name + ' differs from C baseline')
+    return {
+        'program': name,
+        'cc': cc,
+        'opt': opt,
+        'misery_time': mis_time,
+        'c_time': c_time,
+        'ratio': mis_time / c_time,
+    }
+
+
+def _make_arg_parser():
+    arg_parser = argparse.ArgumentParser(prog='benchmarks.runtime')
+    arg_parser.add_argument(
+        'name',
+        nargs='*',
+        help='programs to run (default: all)',
+    )
+    arg_parser.add_argument(
+        '--cc',
+        nargs='+',
+        default=['tcc', 'gcc'],
+        help='C compilers, missing ones are skipped (default: tcc gcc)',
+    )
+    arg_parser.add_argument(
+        '--opt',
+        nargs='+',
+        default=['0', '1', '2', '3'],
+        help='optimization levels, tcc has none (default: 0 1 2 3)',
+    )
+    arg_parser.add_argument(
+        '--repeat',
+        type=int,
+        default=3,
+        help='runs of every executable, best time is taken',
+    )
+    arg_parser.add_argument(
+        '--pass-by-value',
+        action='store_true',
+        help='compile misery programs in pass-by-value mode',
+    )
+    arg_parser.add_argument(
+        '-O', '--optimize',
+        action='store_true',
+        help='compile misery programs with optimization passes',
+    )
+    arg_parser.add_argument(
+        '-o', '--output',
+        help='also write results as JSON to file',
+    )
+    return arg_parser
+
+
+def main(args):
+    args = _make_arg_parser().parse_args(args)
+    name_list = args.name or _program_names()
+    options = {
+        'pass_by_value': args.pass_by_value,
+        'optimize': args.optimize,
+    }
+    result_list = []
+    print('%-16s %-5s %-4s %9s %9s %7s' % (
+        'program', 'cc', 'opt', 'misery, s', 'C, s', 'ratio'))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for cc in args.cc:
+            if shutil.which(cc) is None:
+                sys.stderr.write('%s not found, skipped\n' % cc)
+                continue
+            # tcc has no optimizer, one level is enough
+            opt_list = [''] if cc == 'tcc' else [
+                '-O' + level for level in args.opt]
+            for opt in opt_list:
+                for name in name_list:
+                    result = _bench(
+                        name,
+                        cc,
+                        opt,
+                        args.repeat,
+                        tmp_dir,
+                        options,
+                    )
+                    print('%-16s %-5s %-4s %9.3f %9.3f %7.2f' % (
+                        name,
+                        cc,
+                        opt,
+                        result['misery_time'],
+                        result['c_time'],
+                        result['ratio'],
+                    ))
+                    result_list.append(result)
+    if args.output:
+        with open(args.output, 'w') as file_:
+            json.dump(result_list, file_, indent=1)
+            file_.write('\n')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
+
+
+# vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
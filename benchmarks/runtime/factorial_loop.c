@@ -0,0 +1,20 @@
+#include <stdio.h>
+
+int fac(int n) {
+  int result = 1;
+  int i;
+  for (i = 1; i < n + 1; i++) {
+    result *= i;
+  }
+  return result;
+}
+
+int main(void) {
+  int sum = 0;
+  int i;
+  for (i = 0; i < 2000000; i++) {
+    sum += fac(12) - 479001599;
+  }
+  printf("%d\n", sum);
+  return 0;
+}
@@ -0,0 +1,12 @@
+#include <stdio.h>
+
+int main(void) {
+  int i;
+  for (i = 0; i < 1000000; i++) {
+    printf("%d", i);
+    printf("%s", " ");
+    printf("%d", i - 1);
+    printf("\n");
+  }
+  return 0;
+}
@@ -0,0 +1,14 @@
+#include <stdio.h>
+
+int main(void) {
+  int count = 0;
+  int i;
+  int j;
+  for (i = 0; i < 3000; i++) {
+    for (j = 0; j < 3000; j++) {
+      count += (j < i);
+    }
+  }
+  printf("%d\n", count);
+  return 0;
+}
@@ -0,0 +1,18 @@
+#include <stdio.h>
+
+int sumTo(int n, int acc) {
+  if (n < 1) {
+    return acc;
+  }
+  return sumTo(n - 1, acc + n);
+}
+
+int main(void) {
+  int total = 0;
+  int i;
+  for (i = 0; i < 300; i++) {
+    total = total + sumTo(20000, 0);
+  }
+  printf("%d\n", total);
+  return 0;
+}
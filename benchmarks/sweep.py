@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for copyright and license details
+
+
+'''
+Size sweep of compiler phases: time and peak memory of lex, parse,
+ident_table, mark_out_datatypes and generate as function of one
+knob of synthetic program shape. Results are printed as JSON,
+so runs can be compared.
+
+Usage: python -m benchmarks.sweep [--knob func_count]
+           [--values 1000 2000 4000] [--stmt-count 4] ... [-o out.json]
+'''
+
+
+import argparse
+import json
+import platform
+import sys
+from misery import (
+    datatype,
+    generator,
+    ident_table,
+    parse,
+)
+from benchmarks import (
+    measure,
+    synthetic,
+)
+
+
+_KNOBS = (
+    'func_count',
+    'stmt_count',
+    'call_depth',
+    'overload_count',
+    'nesting_depth',
+)
+
+_DEFAULT_VALUES = {
+    'func_count': [500, 1000, 2000, 4000],
+    'stmt_count': [1, 4, 16, 64],
+    'call_depth': [1, 4, 16, 64],
+    'overload_count': [1, 4, 16, 64],
+    'nesting_depth': [0, 4, 16, 64],
+}
+
+
+def _run(shape):
+    ''' Measure all phases on program of given shape. '''
+    input_string = synthetic.make_shaped_program(**shape)
+    phases = {}
+
+    def run_phase(name, func):
+        elapsed, peak, result = measure.measure(func)
+        phases[name] = {'time': elapsed, 'peak_memory': peak}
+        return result
+
+    token_count = len(run_phase('lex', lambda: parse.scan(input_string)))
+    # parse includes lex
+    ast_ = run_phase(
+        'parse',
+        lambda: parse.parse(input_string, backend='descent'),
+    )
+    ast_.ident_list = run_phase(
+        'ident_table',
+        lambda: ident_table.ident_table(ast_),
+    )
+    marked_ast = run_phase(
+        'mark_out_datatypes',
+        lambda: datatype.mark_out_datatypes(ast_),
+    )
+    c_code = run_phase(
+        'generate',
+        generator.Generator(marked_ast).generate,
+    )
+    return {
+        'shape': shape,
+        'input_size': len(input_string),
+        'token_count': token_count,
+        'output_size': len(c_code),
+        'phases': phases,
+    }
+
+
+def _make_arg_parser():
+    arg_parser = argparse.ArgumentParser(prog='benchmarks.sweep')
+    arg_parser.add_argument(
+        '--knob',
+        choices=_KNOBS,
+        default='func_count',
+        help='shape knob to sweep (default: func_count)',
+    )
+    arg_parser.add_argument(
+        '--values',
+        type=int,
+        nargs='+',
+        help='values of swept knob',
+    )
+    arg_parser.add_argument('--func-count', type=int, default=1000)
+    arg_parser.add_argument('--stmt-count', type=int, default=1)
+    arg_parser.add_argument('--call-depth', type=int, default=1)
+    arg_parser.add_argument('--overload-count', type=int, default=1)
+    arg_parser.add_argument('--nesting-depth', type=int, default=0)
+    arg_parser.add_argument(
+        '-o', '--output',
+        help='write JSON to file instead of stdout',
+    )
+    return arg_parser
+
+
+def main(args):
+    args = _make_arg_parser().parse_args(args)
+    base_shape = dict((knob, getattr(args, knob)) for knob in _KNOBS)
+    run_list = []
+    for value in args.values or _DEFAULT_VALUES[args.knob]:
+        shape = dict(base_shape)
+        shape[args.knob] = value
+        run = _run(shape)
+        sys.stderr.write('%s=%d: %s\n' % (
+            args.knob,
+            value,
+            ' '.join(
+                '%s %.3f s' % (name, phase['time'])
+                for name, phase in run['phases'].items()
+            ),
+        ))
+        run_list.append(run)
+    result = {
+        'python': platform.python_version(),
+        'knob': args.knob,
+        'base_shape': base_shape,
+        'runs': run_list,
+    }
+    if args.output:
+        with open(args.output, 'w') as file_:
+            json.dump(result, file_, indent=1)
+            file_.write('\n')
+    else:
+        json.dump(result, sys.stdout, indent=1)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
+
+
+# vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
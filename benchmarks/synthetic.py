@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for copyright and license details
+
+
+'''
+Synthetic Misery programs for benchmarks.
+'''
+
+
+def _func(index, prefix='f'):
+    return (
+        'func %(prefix)s%(index)d (n Int) -> Int {\n'
+        '  a ::= plus(n %(index)d)\n'
+        '  if isLess(a 10) {\n'
+        '    print(a)\n'
+        '    printNewLine()\n'
+        '  } else {\n'
+        '    a = minus(a 1)\n'
+        '  }\n'
+        '  print("some string")\n'
+        '  return multiply(a 2)\n'
+        '}\n'
+    ) % {'index': index, 'prefix': prefix}
+
+
+def make_program(func_count):
+    ''' Return valid Misery program with func_count funcs. '''
+    out = ''
+    for index in range(func_count):
+        out += _func(index)
+    out += 'func start {\n'
+    for index in range(func_count):
+        out += '  print(f%d(1))\n' % index
+    out += '}\n'
+    return out
+
+
+def make_library(name, func_count, import_list=()):
+    ''' Return valid Misery module without 'start' func.
+
+        Funcs are named <name>F<index>.
+    '''
+    out = ''
+    if import_list:
+        out += 'import { ' + ' '.join(import_list) + ' }\n'
+    for index in range(func_count):
+        out += _func(index, prefix=name + 'F')
+    return out
+
+
+def _nested_call(call_depth):
+    ''' Expr with call_depth nested calls. '''
+    expr = 'n'
+    for _ in range(call_depth - 1):
+        expr = 'plus(' + expr + ' 1)'
+    return expr
+
+
+def _shaped_func(index, stmt_count, call_depth, param_count, nesting_depth):
+    params = ', '.join(
+        'n Int' if i == 0 else 'm%d Int' % i
+        for i in range(param_count)
+    )
+    out = 'func f%d (%s) -> Int {\n' % (index, params)
+    out += '  a ::= plus(n %d)\n' % index
+    indent = '  '
+    for depth in range(nesting_depth):
+        if depth % 2 == 0:
+            out += indent + 'if isLess(a 10) {\n'
+        else:
+            out += indent + 'for isLess(a 10) {\n'
+            out += indent + '  a = plus(a 1)\n'
+        indent += '  '
+    for _ in range(stmt_count):
+        out += indent + 'a = plus(a %s)\n' % _nested_call(call_depth)
+    for depth in reversed(range(nesting_depth)):
+        indent = indent[:-2]
+        out += indent + '}\n'
+    out += '  return a\n'
+    out += '}\n'
+    return out
+
+
+def make_shaped_program(
+    func_count,
+    stmt_count=1,
+    call_depth=1,
+    overload_count=1,
+    nesting_depth=0,
+):
+    ''' Return valid Misery program of given shape.
+
+        stmt_count - statements in innermost block of every func.
+        call_depth - nesting of calls in every statement.
+        overload_count - funcs of same name with 1, 2, ... params.
+        nesting_depth - nesting of if and for blocks, by turns.
+    '''
+    out = ''
+    for index in range(func_count):
+        for param_count in range(1, overload_count + 1):
+            out += _shaped_func(
+                index,
+                stmt_count,
+                call_depth,
+                param_count,
+                nesting_depth,
+            )
+    out += 'func start {\n'
+    for index in range(func_count):
+        for param_count in range(1, overload_count + 1):
+            args = ' '.join(str(i + 1) for i in range(param_count))
+            out += '  print(f%d(%s))\n' % (index, args)
+    out += '}\n'
+    return out
+
+
+def _dead_code_func(index):
+    return (
+        'func f%(index)d (n Int) -> Int {\n'
+        '  limit ::= %(index)d\n'
+        '  step ::= plus(limit 1)\n'
+        '  unused := multiply(n step)\n'
+        '  if isLess(n limit) {\n'
+        '    print(n)\n'
+        '  }\n'
+        '  plus(n step)\n'
+        '  return minus(n step)\n'
+        '}\n'
+    ) % {'index': index}
+
+
+def make_dead_code_program(func_count):
+    ''' Return valid Misery program with dead code: vars
+        holding constants, unused vars and unused results.
+    '''
+    out = ''
+    for index in range(func_count):
+        out += _dead_code_func(index)
+    out += 'func start {\n'
+    for index in range(func_count):
+        out += '  print(f%d(1))\n' % index
+    out += '}\n'
+    return out
+
+
+def make_program_of_size(size):
+    ''' Return valid Misery program at least size chars long. '''
+    func_count = max(1, size // len(_func(0)))
+    return make_program(func_count)
+
+
+# vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for copyright and license details
+
+
+'''
+Type resolution benchmark: profiles datatype marking and C
+generation and counts type resolution calls per compiled func.
+
+Usage: python -m benchmarks.type_resolution [func_count ...]
+'''
+
+
+import cProfile
+import pstats
+import sys
+from misery import (
+    datatype,
+    generator,
+    ident_table,
+    parse,
+)
+from benchmarks import (
+    synthetic,
+)
+
+
+_RESOLUTION_FUNC_NAMES = (
+    'find',
+    'match_signature',
+    'func_signature',
+    'expr_datatype',
+)
+
+
+def _count_resolution_calls(profile):
+    ''' Return {func name: call count} for datatype module. '''
+    counts = dict.fromkeys(_RESOLUTION_FUNC_NAMES, 0)
+    stats = pstats.Stats(profile).stats
+    for (file_name, _, func_name), stat in stats.items():
+        if file_name != datatype.__file__:
+            continue
+        if func_name in counts:
+            counts[func_name] += stat[1]  # total call count
+    return counts
+
+
+def _print_counts(phase, counts, func_count):
+    print('  %-9s' % phase + ''.join(
+        '  %s %6.2f' % (name, float(counts[name]) / func_count)
+        for name in _RESOLUTION_FUNC_NAMES
+    ))
+
+
+def main(args):
+    func_counts = [int(arg) for arg in args] or [1000]
+    for func_count in func_counts:
+        input_string = synthetic.make_program(func_count)
+        ast_ = parse.parse(input_string, backend='descent')
+        ast_.ident_list = ident_table.ident_table(ast_)
+        # 'start' func is compiled too
+        compiled_func_count = func_count + 1
+        print('%6d funcs, resolution calls per func:' % func_count)
+        profile = cProfile.Profile()
+        profile.enable()
+        marked_ast = datatype.mark_out_datatypes(ast_)
+        profile.disable()
+        counts = _count_resolution_calls(profile)
+        _print_counts('mark out', counts, compiled_func_count)
+        profile = cProfile.Profile()
+        profile.enable()
+        generator.Generator(marked_ast).generate()
+        profile.disable()
+        counts = _count_resolution_calls(profile)
+        _print_counts('generate', counts, compiled_func_count)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
+
+
+# vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
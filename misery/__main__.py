@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for copyright and license details
+
+
+''' Entry point: python -m misery. '''
+
+
+import sys
+from misery import (
+    driver,
+)
+
+
+sys.exit(driver.main(sys.argv[1:]))
+
+
+# vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
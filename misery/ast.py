@@ -12,7 +12,26 @@ from misery import (
 )
 
 
-class Module(object):
+class Node(object):
+    ''' Base class of AST nodes.
+
+        Each node type declares its fields in __slots__,
+        misc.object_fields() uses them as node schema.
+    '''
+
+    __slots__ = ()
+
+    def copy(self):
+        ''' Return shallow copy of node. '''
+        node = object.__new__(type(self))
+        for name in misc.class_slots(type(self)):
+            setattr(node, name, getattr(self, name))
+        return node
+
+
+class Module(Node):
+    __slots__ = ('import_list', 'decl_list', 'ident_list')
+
     def __init__(
         self,
         import_list=None,
@@ -23,44 +42,58 @@ class Module(object):
         self.ident_list = None
 
 
-class Ident(object):
+class Ident(Node):
+    __slots__ = ('name',)
+
     def __init__(self, name):
         self.name = name
 
 
-class Field(object):
+class Field(Node):
+    __slots__ = ('name', 'datatype')
+
     def __init__(self, name, datatype):
         self.name = name
         self.datatype = datatype
 
 
-class ConstDecl(object):
+class ConstDecl(Node):
+    __slots__ = ('name', 'datatype', 'expr')
+
     def __init__(self, name, datatype, expr):
         self.name = name
         self.datatype = datatype
         self.expr = expr
 
 
-class ClassDecl(object):
+class ClassDecl(Node):
+    __slots__ = ('name', 'field_list', 'decl_list')
+
     def __init__(self, name, field_list=None, decl_list=None):
         self.name = name
         self.field_list = misc.tolist(field_list)
         self.decl_list = misc.tolist(decl_list)
 
 
-class Number(object):
+class Number(Node):
+    __slots__ = ('value', 'binded_var_name')
+
     def __init__(self, value):
         self.value = value
         self.binded_var_name = None
 
 
-class String(object):
+class String(Node):
+    __slots__ = ('value', 'binded_var_name')
+
     def __init__(self, value):
         self.value = value
         self.binded_var_name = None
 
 
-class FuncDecl(object):
+class FuncDecl(Node):
+    __slots__ = ('name', 'signature', 'body', 'vars', 'tmp_vars', 'constants')
+
     def __init__(self, name, signature, body=None):
         self.name = name
         self.signature = signature
@@ -71,7 +104,9 @@ class FuncDecl(object):
         self.constants = {}
 
 
-class FuncSignature(object):
+class FuncSignature(Node):
+    __slots__ = ('param_list', 'generic_param_list', 'return_type')
+
     def __init__(
         self,
         param_list=None,
@@ -83,20 +118,33 @@ class FuncSignature(object):
         self.return_type = return_type
 
 
-class Param(object):
+class Param(Node):
+    __slots__ = ('name', 'datatype')
+
     def __init__(self, name, datatype):
         self.name = name
         self.datatype = datatype
 
 
-class FuncCall(object):
+class FuncCall(Node):
+    __slots__ = ('called_expr', 'arg_list', 'binded_var_name', 'signature')
+
     def __init__(self, expr, arg_list=None):
         self.called_expr = expr
         self.arg_list = misc.tolist(arg_list)
         self.binded_var_name = None
+        self.signature = None
+
 
+class VarDecl(Node):
+    __slots__ = (
+        'name',
+        'rvalue_expr',
+        'datatype',
+        'allocate_memory_on_stack',
+        'binded_var_name',
+    )
 
-class VarDecl(object):
     def __init__(
         self,
         name,
@@ -108,9 +156,12 @@ class VarDecl(object):
         self.rvalue_expr = expr
         self.datatype = datatype
         self.allocate_memory_on_stack = allocate_memory_on_stack
+        self.binded_var_name = None
+
 
+class Assign(Node):
+    __slots__ = ('name', 'rvalue_expr', 'datatype')
 
-class Assign(object):
     def __init__(
         self,
         name,
@@ -122,7 +173,9 @@ class Assign(object):
         self.datatype = datatype
 
 
-class If(object):
+class If(Node):
+    __slots__ = ('condition', 'branch_if', 'branch_else')
+
     def __init__(
         self,
         condition,
@@ -134,15 +187,21 @@ class If(object):
         self.branch_else = branch_else
 
 
-class For(object):
+class For(Node):
+    __slots__ = ('condition', 'branch')
+
     def __init__(self, condition, branch):
         self.condition = condition
         self.branch = branch
 
 
-class Return(object):
+class Return(Node):
+    __slots__ = ('expr', 'is_tail_call')
+
     def __init__(self, expr=None):
         self.expr = expr
+        # call of enclosing func, see optimizer.mark_tail_calls
+        self.is_tail_call = False
 
 
 # vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
@@ -0,0 +1,499 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for copyright and license details
+
+
+'''
+Incremental builds of programs made of many modules.
+
+Imports are resolved against search path, every module is
+translated to its own C fragment. Fragment is translated again
+only if module source or interface of some imported module
+changed since previous build.
+'''
+
+
+import concurrent.futures
+import hashlib
+import io
+import json
+import os
+import pickle
+import subprocess
+from misery import (
+    ast,
+    cache,
+    datatype,
+    generator,
+    ident_table,
+    instrument,
+    misc,
+    optimizer,
+    parse,
+)
+
+
+def find_module(name, search_path):
+    ''' Return file name of module 'name'. '''
+    for dir_name in search_path:
+        file_name = os.path.join(dir_name, name + '.mis')
+        if os.path.isfile(file_name):
+            return file_name
+    raise Exception('Can not find module: \'' + name + '\'')
+
+
+def _hash_string(string):
+    return hashlib.sha1(string.encode('utf-8')).hexdigest()
+
+
+def interface_fingerprint(ast_):
+    ''' Hash of all decls visible to importing modules.
+
+        Func bodies are not part of interface.
+    '''
+    hasher = hashlib.sha1()
+    for decl in ast_.decl_list:
+        if isinstance(decl, ast.FuncDecl):
+            text = 'func ' + decl.name + '\n'
+            text += misc.pretty_print(decl.signature)
+        else:
+            text = misc.pretty_print(decl)
+        hasher.update(text.encode('utf-8'))
+    return hasher.hexdigest()
+
+
+def interface_decls(ast_):
+    ''' Decls of module without func bodies. '''
+    decl_list = []
+    for decl in ast_.decl_list:
+        if isinstance(decl, ast.FuncDecl):
+            decl = ast.FuncDecl(name=decl.name, signature=decl.signature)
+        decl_list.append(decl)
+    return decl_list
+
+
+c_compiler_error_prefix = 'C compiler error:\n'
+
+
+def run_c_compiler(cc, args):
+    ''' Run C compiler, raise exception on error. '''
+    proc = subprocess.Popen(
+        [cc] + list(args),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    out, err = proc.communicate()
+    if proc.returncode != 0:
+        raise Exception(c_compiler_error_prefix + out + err)
+
+
+def _write_file_atomic(file_name, data, mode='w'):
+    tmp_file_name = file_name + '.' + str(os.getpid()) + '.tmp'
+    with open(tmp_file_name, mode) as file_:
+        file_.write(data)
+    os.replace(tmp_file_name, file_name)
+
+
+def _write_file_if_changed(file_name, string):
+    ''' Return True if file was written. '''
+    try:
+        with open(file_name) as file_:
+            if file_.read() == string:
+                return False
+    except (IOError, OSError):
+        pass
+    _write_file_atomic(file_name, string)
+    return True
+
+
+class _Module(object):
+    ''' Module of program being built. '''
+
+    def __init__(self, name, file_name, source):
+        self.name = name
+        self.file_name = file_name
+        self.source = source
+        self.source_hash = _hash_string(source)
+        self.ast = None
+        self.import_list = None
+        self.interface = None
+        self.interface_decls = None
+
+
+class Builder(object):
+    ''' Builds program from entry module and modules it imports.
+
+        Build state is kept in build_dir/build_state.json.
+
+        separate - compile every module to its own object file
+        instead of one whole program C file.
+    '''
+
+    state_file_name = 'build_state.json'
+    runtime_name = 'misery_runtime'
+
+    def __init__(
+        self,
+        build_dir,
+        search_path=None,
+        parser_backend='descent',
+        separate=False,
+        cc='tcc',
+        cflags=None,
+        jobs=None,
+        optimize=False,
+        pass_by_value=False,
+    ):
+        self.build_dir = build_dir
+        self.search_path = misc.tolist(search_path)
+        self.parser_backend = parser_backend
+        self.separate = separate
+        self.cc = cc
+        self.cflags = list(cflags or [])
+        self.jobs = jobs or os.cpu_count() or 1
+        self.optimize = optimize
+        self.pass_by_value = pass_by_value
+        self.rebuilt_module_names = []
+        self._modules = {}
+        self._state = None
+        if separate:
+            # two modes must not see outputs of each other
+            self._out_dir = os.path.join(build_dir, 'separate')
+        else:
+            self._out_dir = build_dir
+
+    def _path(self, module_name, extension):
+        return os.path.join(self._out_dir, module_name + extension)
+
+    def _state_path(self):
+        return os.path.join(self._out_dir, Builder.state_file_name)
+
+    def _fragment_path(self, module_name):
+        return self._path(module_name, '.part.c')
+
+    def _interface_path(self, module_name):
+        return self._path(module_name, '.iface.pickle')
+
+    def _output_paths(self, module_name):
+        ''' Files made from module, module is rebuilt if any is lost. '''
+        if self.separate:
+            extension_list = ['.h', '.c', '.o']
+        else:
+            extension_list = ['.part.c']
+        return [
+            self._path(module_name, extension)
+            for extension in extension_list + ['.iface.pickle']
+        ]
+
+    def _output_key(self):
+        ''' Options changing generated code. '''
+        return [self.optimize, self.pass_by_value]
+
+    def _load_state(self):
+        try:
+            with open(self._state_path()) as file_:
+                state = json.load(file_)
+        except (IOError, OSError, ValueError):
+            state = None
+        # new compiler may generate other code,
+        # other C compiler makes incompatible objects
+        version = cache.compiler_version()
+        cc = [self.cc] + self.cflags if self.separate else None
+        if not state or state.get('version') != version or \
+                state.get('cc') != cc or \
+                state.get('output_key') != self._output_key():
+            state = {
+                'version': version,
+                'cc': cc,
+                'output_key': self._output_key(),
+                'modules': {},
+            }
+        return state
+
+    def _parse(self, module):
+        if module.ast is None:
+            module.ast = parse.parse(
+                module.source,
+                backend=self.parser_backend,
+            )
+            module.import_list = module.ast.import_list
+            module.interface = interface_fingerprint(module.ast)
+            module.interface_decls = interface_decls(module.ast)
+
+    def _load_interface_decls(self, module):
+        ''' Decls of imported module, unchanged modules are not parsed. '''
+        if module.interface_decls is None:
+            try:
+                with open(self._interface_path(module.name), 'rb') as file_:
+                    module.interface_decls = pickle.load(file_)
+            except Exception:
+                self._parse(module)  # no or broken interface file
+        return module.interface_decls
+
+    def _load_module(self, name, file_name):
+        with instrument.phase('read'):
+            with open(file_name) as file_:
+                module = _Module(name, file_name, file_.read())
+        module_state = self._state['modules'].get(name)
+        if module_state and module_state['source_hash'] == module.source_hash:
+            # unchanged module is not even parsed
+            module.import_list = module_state['import_list']
+            module.interface = module_state['interface']
+        else:
+            self._parse(module)
+        return module
+
+    def _load_graph(self, entry_file_name, search_path):
+        ''' Load all modules, return them in dependency order. '''
+        module_list = []
+        path = []  # modules being loaded, for cycle detection
+
+        def load(name, file_name=None):
+            if name in path:
+                cycle = path[path.index(name):] + [name]
+                raise Exception('Import cycle: ' + ' -> '.join(cycle))
+            if name in self._modules:
+                return
+            path.append(name)
+            if file_name is None:
+                file_name = find_module(name, search_path)
+            module = self._load_module(name, file_name)
+            for import_name in module.import_list:
+                load(import_name)
+            path.pop()
+            self._modules[name] = module
+            module_list.append(module)
+
+        entry_base_name = os.path.basename(entry_file_name)
+        load(os.path.splitext(entry_base_name)[0], entry_file_name)
+        return module_list
+
+    def _check_duplicate_funcs(self, module_list):
+        ''' Funcs of all modules go to one C namespace, so func with
+            the same name and param datatypes may be declared
+            in only one module.
+        '''
+        func_modules = {}  # (name, param datatype names): module name
+        for module in module_list:
+            for decl in self._load_interface_decls(module):
+                if not isinstance(decl, ast.FuncDecl):
+                    continue
+                datatype_names = tuple(
+                    param.datatype.name
+                    for param in decl.signature.param_list
+                )
+                key = (decl.name, datatype_names)
+                other_name = func_modules.setdefault(key, module.name)
+                if other_name != module.name:
+                    raise Exception(
+                        'Func \'' + decl.name +
+                        '(' + ', '.join(datatype_names) + ')\'' +
+                        ' is declared in modules \'' + other_name +
+                        '\' and \'' + module.name + '\''
+                    )
+
+    def _import_interfaces(self, module):
+        return dict(
+            (name, self._modules[name].interface)
+            for name in module.import_list
+        )
+
+    def _is_dirty(self, module, is_entry):
+        module_state = self._state['modules'].get(module.name)
+        if not module_state:
+            return True
+        if module_state['source_hash'] != module.source_hash:
+            return True
+        if module_state['is_entry'] != is_entry:
+            return True
+        for path in self._output_paths(module.name):
+            if not os.path.isfile(path):
+                return True
+        return module_state['import_interfaces'] != \
+            self._import_interfaces(module)
+
+    def _mark_out(self, module):
+        ''' Return annotated ast of module. '''
+        self._parse(module)
+        imported_decl_list = []
+        for name in module.import_list:
+            imported_decl_list.extend(
+                self._load_interface_decls(self._modules[name]),
+            )
+        ast_ = module.ast
+        ast_.ident_list = ident_table.ident_table(
+            ast_,
+            imported_decl_list=imported_decl_list,
+        )
+        ast_ = datatype.mark_out_datatypes(ast_)
+        if self.optimize:
+            ast_ = optimizer.optimize(ast_)
+        return ast_
+
+    def _translate(self, module, is_entry):
+        ''' Write C code of module, return its new state. '''
+        generator_ = generator.Generator(
+            self._mark_out(module),
+            pass_by_value=self.pass_by_value,
+        )
+        if self.separate:
+            header = io.StringIO()
+            generator_.write_header(
+                header,
+                guard_name='MISERY_' + module.name.upper() + '_H',
+                include_list=[name + '.h' for name in module.import_list],
+            )
+            source = io.StringIO()
+            generator_.write_source(
+                source,
+                header_name=module.name + '.h',
+                is_entry=is_entry,
+            )
+            _write_file_if_changed(
+                self._path(module.name, '.h'),
+                header.getvalue(),
+            )
+            _write_file_atomic(
+                self._path(module.name, '.c'),
+                source.getvalue(),
+            )
+        else:
+            _write_file_atomic(
+                self._fragment_path(module.name),
+                generator_.generate(),
+            )
+        _write_file_atomic(
+            self._interface_path(module.name),
+            pickle.dumps(module.interface_decls, pickle.HIGHEST_PROTOCOL),
+            mode='wb',
+        )
+        return {
+            'source_hash': module.source_hash,
+            'import_list': module.import_list,
+            'interface': module.interface,
+            'import_interfaces': self._import_interfaces(module),
+            'is_entry': is_entry,
+        }
+
+    def _save_state(self):
+        _write_file_atomic(self._state_path(), json.dumps(
+            self._state,
+            indent=1,
+            sort_keys=True,
+        ))
+
+    def _compile_object(self, name):
+        run_c_compiler(self.cc, self.cflags + [
+            '-c', self._path(name, '.c'),
+            '-o', self._path(name, '.o'),
+        ])
+
+    def _compile_objects(self, name_list):
+        ''' Compile C files of modules in parallel.
+
+            Return list of (name, error or None).
+        '''
+
+        def compile_object(name):
+            try:
+                self._compile_object(name)
+            except Exception as e:
+                return name, e
+            return name, None
+
+        if not name_list:
+            return []
+        with instrument.phase('cc'):
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.jobs,
+            ) as executor:
+                return list(executor.map(compile_object, name_list))
+
+    def _build_runtime(self):
+        ''' Return name of runtime module to compile or None. '''
+        name = Builder.runtime_name
+        _write_file_if_changed(
+            self._path(name, '.h'),
+            generator.Generator.runtime_header(self.pass_by_value),
+        )
+        is_changed = _write_file_if_changed(
+            self._path(name, '.c'),
+            generator.Generator.runtime_source(self.pass_by_value),
+        )
+        if is_changed or not os.path.isfile(self._path(name, '.o')):
+            return name
+        return None
+
+    def _build_modules(self, entry_file_name):
+        ''' Bring all module outputs up to date, return module list. '''
+        entry_dir = os.path.dirname(entry_file_name)
+        search_path = [entry_dir or '.'] + self.search_path
+        if not os.path.isdir(self._out_dir):
+            os.makedirs(self._out_dir)
+        self._state = self._load_state()
+        self._modules = {}
+        self.rebuilt_module_names = []
+        try:
+            module_list = self._load_graph(entry_file_name, search_path)
+            self._check_duplicate_funcs(module_list)
+            new_states = {}
+            for module in module_list:
+                is_entry = module is module_list[-1]
+                if self._is_dirty(module, is_entry):
+                    new_states[module.name] = self._translate(
+                        module,
+                        is_entry,
+                    )
+                    self.rebuilt_module_names.append(module.name)
+            if self.separate:
+                object_name_list = list(new_states.keys())
+                runtime_name = self._build_runtime()
+                if runtime_name:
+                    object_name_list.append(runtime_name)
+                error_list = []
+                for name, error in self._compile_objects(object_name_list):
+                    if error:
+                        error_list.append(error)
+                        new_states.pop(name, None)
+            # only modules with all outputs ready
+            self._state['modules'].update(new_states)
+            if self.separate and error_list:
+                raise error_list[0]
+        finally:
+            self._save_state()
+        return module_list
+
+    def build(self, entry_file_name):
+        ''' Build whole program C file, return its name. '''
+        assert not self.separate
+        module_list = self._build_modules(entry_file_name)
+        entry_name = module_list[-1].name
+        c_file_name = os.path.join(self.build_dir, entry_name + '.c')
+        with instrument.phase('combine'):
+            with open(c_file_name, 'w') as file_:
+                file_.write(
+                    generator.Generator.full_prefix(self.pass_by_value))
+                for module in module_list:
+                    path = self._fragment_path(module.name)
+                    with open(path) as fragment_file:
+                        file_.write(fragment_file.read())
+                file_.write(generator.Generator.full_postfix())
+        return c_file_name
+
+    def build_executable(self, entry_file_name, exe_file_name):
+        ''' Compile changed modules separately and link executable. '''
+        assert self.separate
+        module_list = self._build_modules(entry_file_name)
+        object_list = [
+            self._path(name, '.o') for name in
+            [module.name for module in module_list] + [Builder.runtime_name]
+        ]
+        with instrument.phase('link'):
+            run_c_compiler(
+                self.cc,
+                self.cflags + object_list + ['-o', exe_file_name],
+            )
+        return exe_file_name
+
+
+# vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for copyright and license details
+
+
+'''
+On-disk content-addressed cache of generated C code.
+
+Entries are written to temporary files and renamed in place,
+so many compiler processes can share one cache directory.
+'''
+
+
+import hashlib
+import os
+from misery import (
+    misc,
+)
+
+
+_compiler_version = None
+
+
+def compiler_version():
+    ''' Hash of compiler sources, changes with every compiler change. '''
+    global _compiler_version
+    if _compiler_version is None:
+        hasher = hashlib.sha1()
+        package_dir = os.path.dirname(os.path.abspath(__file__))
+        for file_name in sorted(os.listdir(package_dir)):
+            if not file_name.endswith('.py'):
+                continue
+            if file_name.startswith('test_') or file_name == 'parsetab.py':
+                continue
+            hasher.update(file_name.encode('utf-8'))
+            with open(os.path.join(package_dir, file_name), 'rb') as file_:
+                hasher.update(file_.read())
+        _compiler_version = hasher.hexdigest()
+    return _compiler_version
+
+
+def cache_key(input_string, options_key=''):
+    ''' Key of source text compiled with options.
+
+        options_key - string of all options that change output.
+    '''
+    hasher = hashlib.sha1()
+    for part in (compiler_version(), options_key, input_string):
+        data = part.encode('utf-8')
+        hasher.update(str(len(data)).encode('utf-8') + b':')
+        hasher.update(data)
+    return hasher.hexdigest()
+
+
+class Cache(object):
+    ''' Directory of <key>.c files with size-bounded LRU eviction.
+
+        Last use time of entry is its mtime.
+    '''
+
+    default_max_size = 256 * 2 ** 20
+
+    def __init__(self, cache_dir=None, max_size=None):
+        if cache_dir is None:
+            cache_dir = os.path.join(misc.default_cache_dir(), 'c')
+        if max_size is None:
+            max_size = Cache.default_max_size
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self._size = None  # estimated, other processes may write too
+
+    def _file_name(self, key):
+        return os.path.join(self.cache_dir, key + '.c')
+
+    def get(self, key):
+        ''' Return cached C code or None. '''
+        file_name = self._file_name(key)
+        try:
+            with open(file_name) as file_:
+                c_code = file_.read()
+        except (IOError, OSError):
+            return None
+        try:
+            os.utime(file_name, None)
+        except OSError:
+            pass  # evicted by other process
+        return c_code
+
+    def put(self, key, c_code):
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            file_name = self._file_name(key)
+            tmp_file_name = file_name + '.' + str(os.getpid()) + '.tmp'
+            with open(tmp_file_name, 'w') as file_:
+                file_.write(c_code)
+            os.replace(tmp_file_name, file_name)
+        except (IOError, OSError):
+            return  # cache is optional
+        if self._size is None:
+            self._size = self.size()
+        else:
+            self._size += len(c_code)
+        if self._size > self.max_size:
+            self.evict()
+
+    def _entries(self):
+        ''' Return [(mtime, size, file_name), ...]. '''
+        entry_list = []
+        try:
+            dir_entries = list(os.scandir(self.cache_dir))
+        except OSError:
+            return entry_list
+        for dir_entry in dir_entries:
+            if not dir_entry.name.endswith('.c'):
+                continue
+            try:
+                stat = dir_entry.stat()
+            except OSError:
+                continue  # evicted by other process
+            entry_list.append((stat.st_mtime, stat.st_size, dir_entry.path))
+        return entry_list
+
+    def size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        ''' Remove least recently used entries until cache fits. '''
+        entry_list = sorted(self._entries())
+        size = sum(size for _, size, _ in entry_list)
+        for _, entry_size, file_name in entry_list:
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(file_name)
+            except OSError:
+                pass  # evicted by other process
+            size -= entry_size
+        self._size = size
+
+
+# vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
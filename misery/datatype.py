@@ -7,182 +7,326 @@ Data types.
 '''
 
 
-import copy
 from misery import (
     ast,
+    instrument,
     misc,
 )
 
 
 class SimpleDataType(object):
-    def __init__(self, name, prefix_list=None):
-        self.name = name
-        self.prefix_list = misc.tolist(prefix_list)
+    ''' Interned immutable datatype.
+
+        Equal (name, prefix_list) pairs give the same object,
+        so datatypes are compared with 'is' and hashed by identity.
+    '''
+
+    __slots__ = ('name', 'prefix_list')
+
+    _interned = {}
+
+    def __new__(cls, name, prefix_list=None):
+        if prefix_list is None:
+            prefix_list = ()
+        else:
+            prefix_list = tuple(prefix_list)
+        key = (name, prefix_list)
+        datatype_ = cls._interned.get(key)
+        if datatype_ is None:
+            datatype_ = object.__new__(cls)
+            object.__setattr__(datatype_, 'name', name)
+            object.__setattr__(datatype_, 'prefix_list', prefix_list)
+            datatype_ = cls._interned.setdefault(key, datatype_)
+        return datatype_
+
+    def __setattr__(self, name, value):
+        raise AttributeError('SimpleDataType is immutable')
+
+    def __reduce__(self):
+        return (SimpleDataType, (self.name, self.prefix_list))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    @property
+    def base(self):
+        ''' Same datatype without prefixes. '''
+        if not self.prefix_list:
+            return self
+        return SimpleDataType(self.name)
+
+
+int_datatype = SimpleDataType('Int')
+string_datatype = SimpleDataType('String')
+
+
+def is_scalar(datatype_):
+    ''' Scalars can be passed and returned by value. '''
+    if datatype_.prefix_list and 'R' in datatype_.prefix_list:
+        return False
+    return datatype_.name in ('Int', 'String')
 
 
 def find_var_datatype(func_decl, var_name):
     for param in func_decl.signature.param_list:
         if param.name == var_name:
             return param.datatype
-    for local_var_name in func_decl.vars.keys():
-        if local_var_name == var_name:
-            return func_decl.vars[local_var_name]
+    if var_name in func_decl.vars:
+        return func_decl.vars[var_name]
     raise Exception('Bad var name: \'' + var_name + '\'')
 
 
-def get_expr_datatype(ident_list, func_decl, expr):
+def literal_datatype(expr):
     if isinstance(expr, ast.Number):
-        return SimpleDataType('Int')
+        return int_datatype
     elif isinstance(expr, ast.String):
-        return SimpleDataType('String')
-    elif isinstance(expr, ast.Ident):
-        return find_var_datatype(func_decl, expr.name)
-    elif isinstance(expr, ast.FuncCall):
-        return get_func_call_expr_datatype(
-            func_decl,
-            ident_list,
-            expr,
-        )
+        return string_datatype
     else:
         raise Exception('Bad type: ' + str(type(expr)))
 
 
+class OverloadIndex(object):
+    ''' Func signatures keyed by (name, param datatypes).
+
+        Length of datatype tuple is signature arity.
+        Prefixes of datatypes are ignored.
+    '''
+
+    def __init__(self, ident_list):
+        self._signatures = {}
+        for name, signature_list in ident_list.items():
+            for signature in misc.tolist(signature_list):
+                key = (name, tuple(
+                    param.datatype.base for param in signature.param_list
+                ))
+                # first declared signature wins
+                if key not in self._signatures:
+                    self._signatures[key] = signature
+
+    def find(self, name, arg_datatypes):
+        key = (name, tuple(
+            datatype_ and datatype_.base for datatype_ in arg_datatypes
+        ))
+        signature = self._signatures.get(key)
+        if signature is None:
+            raise Exception('Can not find matching signature')
+        return signature
+
+
+class TypeResolver(object):
+    ''' Finds datatypes of exprs and signatures of func calls.
+
+        Signature of every FuncCall node is resolved only once.
+    '''
+
+    def __init__(self, ident_list, index=None):
+        if ident_list is None:
+            ident_list = {}
+        if index is None:
+            index = OverloadIndex(ident_list)
+        self._ident_list = ident_list
+        self._index = index
+        self._signatures = {}
+
+    def expr_datatype(self, func_decl, expr):
+        if isinstance(expr, (ast.Number, ast.String)):
+            return literal_datatype(expr)
+        elif isinstance(expr, ast.Ident):
+            return find_var_datatype(func_decl, expr.name)
+        elif isinstance(expr, ast.FuncCall):
+            return self.func_signature(func_decl, expr).return_type
+        else:
+            raise Exception('Bad type: ' + str(type(expr)))
+
+    def func_signature(self, func_decl, func_call_expr):
+        expr = func_call_expr  # shortcut
+        cached = self._signatures.get(id(expr))
+        if cached is not None and cached[0] is expr:
+            return cached[1]
+        assert isinstance(expr.called_expr, ast.Ident)
+        self._check_func_name(expr.called_expr.name)
+        arg_datatypes = [
+            self.expr_datatype(func_decl, arg) for arg in expr.arg_list
+        ]
+        signature = self.match_signature(expr, arg_datatypes)
+        # node is kept in cache so its id can not be reused
+        self._signatures[id(expr)] = (expr, signature)
+        return signature
+
+    def match_signature(self, func_call_expr, arg_datatypes):
+        ''' Find signature for already known arg datatypes. '''
+        func_name = func_call_expr.called_expr.name
+        self._check_func_name(func_name)
+        return self._index.find(func_name, arg_datatypes)
+
+    def _check_func_name(self, func_name):
+        if func_name not in self._ident_list:
+            raise Exception('no func: \'' + func_name + '\'')
+        if not self._ident_list[func_name]:
+            raise Exception('Can not find any signatures')
+
+
+# (ident_list, OverloadIndex) of last lookup by funcs below
+_last_index = (None, None)
+
+
+def _resolver(ident_list):
+    ''' Return TypeResolver for one lookup.
+
+        OverloadIndex is built once and reused while funcs below
+        are called with the same ident_list object, so ident_list
+        must not be changed after lookup.
+    '''
+    global _last_index
+    if ident_list is None:
+        return TypeResolver(ident_list)
+    last_ident_list, index = _last_index
+    if last_ident_list is not ident_list:
+        index = OverloadIndex(ident_list)
+        _last_index = (ident_list, index)
+    return TypeResolver(ident_list, index=index)
+
+
+def get_expr_datatype(ident_list, func_decl, expr):
+    return _resolver(ident_list).expr_datatype(func_decl, expr)
+
+
 def get_func_call_expr_datatype(func_decl, ident_list, func_call_expr):
     ''' Get datatype of function call expr. '''
-    func_name = func_call_expr.called_expr.name  # shortcut
-    if func_name not in ident_list:
-        raise Exception('no func: \'' + func_name + '\'')
-    return find_func_signature(
-        ident_list,
+    return _resolver(ident_list).func_signature(
         func_decl,
         func_call_expr,
     ).return_type
 
 
 def find_func_signature(ident_list, func_decl, func_call_expr):
-    expr = func_call_expr  # shortcut
-    assert isinstance(expr.called_expr, ast.Ident)
-    func_name = expr.called_expr.name
-    signature_list = ident_list[func_name]
-    if not signature_list:
-        raise Exception('Can not find any signatures')
-    signature_list = misc.tolist(signature_list)
-    for signature in signature_list:
-        par_count = len(signature.param_list)
-        arg_count = len(expr.arg_list)
-        if par_count == 0 and arg_count == 0:
-            return signature
-        if par_count != arg_count:
-            continue
-        for arg, param in zip(expr.arg_list, signature.param_list):
-            arg_type = get_expr_datatype(ident_list, func_decl, arg)
-            if arg_type.name == param.datatype.name:
-                return signature
-    raise Exception('Can not find matching signature')
+    return _resolver(ident_list).func_signature(
+        func_decl,
+        func_call_expr,
+    )
 
 
 # TODO: split statement processing phases
 def _mark_out_datatypes(ast_):
-    ''' Mark out 'datatype' fields to ast nodes. '''
+    ''' Return ast_ with marked out 'datatype' fields.
+
+        ast_ is not changed. Only annotated nodes are copied,
+        idents, signatures, datatypes and literal values
+        are shared with ast_.
+    '''
 
     func_decl = None
+    resolver = TypeResolver(ast_.ident_list)
+
+    def mark_out_expr(expr):
+        ''' Return (marked expr, expr datatype).
 
-    def scan_stmt_vars(stmt):
-
-        def scan_expr_vars(expr):
-            fd = func_decl  # shortcut
-            if isinstance(expr, ast.FuncCall):
-                for arg in expr.arg_list:
-                    scan_expr_vars(arg)
-                assert isinstance(expr.called_expr, ast.Ident)
-                called_func_name = expr.called_expr.name
-                return_type = find_func_signature(
-                    ast_.ident_list,
-                    func_decl,
-                    expr,
-                ).return_type
-                if return_type:
-                    var_name = 'tmp_' + str(len(fd.tmp_vars))
-                    fd.tmp_vars[var_name] = return_type
-                    expr.binded_var_name = var_name
-            elif isinstance(expr, (ast.Number, ast.String)):
-                var_name = 'const_' + str(len(fd.constants))
-                fd.constants[var_name] = copy.deepcopy(expr)
+            Datatypes are found bottom-up, so every
+            func call is resolved only once.
+        '''
+        fd = func_decl  # shortcut
+        if isinstance(expr, ast.FuncCall):
+            assert isinstance(expr.called_expr, ast.Ident)
+            expr = expr.copy()
+            arg_list = []
+            arg_datatypes = []
+            for arg in expr.arg_list:
+                arg, arg_datatype = mark_out_expr(arg)
+                arg_list.append(arg)
+                arg_datatypes.append(arg_datatype)
+            expr.arg_list = arg_list
+            # generator uses resolved signature, not resolver
+            expr.signature = resolver.match_signature(expr, arg_datatypes)
+            return_type = expr.signature.return_type
+            if return_type:
+                var_name = 'tmp_' + str(len(fd.tmp_vars))
+                fd.tmp_vars[var_name] = return_type
                 expr.binded_var_name = var_name
-            elif isinstance(expr, ast.Ident):
-                pass  # ok
-            else:
-                raise Exception('Bad expr type: ' + str(type(expr)))
+            return expr, return_type
+        elif isinstance(expr, (ast.Number, ast.String)):
+            var_name = 'const_' + str(len(fd.constants))
+            # original node is never annotated, so it can be shared
+            fd.constants[var_name] = expr
+            datatype_ = literal_datatype(expr)
+            expr = expr.copy()
+            expr.binded_var_name = var_name
+            return expr, datatype_
+        elif isinstance(expr, ast.Ident):
+            return expr, find_var_datatype(fd, expr.name)
+        else:
+            raise Exception('Bad type: ' + str(type(expr)))
 
+    def mark_out_stmt(stmt):
+        ''' stmt - current parsed stmt in current parsed block '''
+        fd = func_decl  # shortcut
         if isinstance(stmt, ast.FuncCall):
-            scan_expr_vars(stmt)
+            stmt, _ = mark_out_expr(stmt)
         elif isinstance(stmt, ast.VarDecl):
-            datatype_ = copy.deepcopy(stmt.datatype)
-            func_decl.vars[stmt.name] = datatype_
+            stmt = stmt.copy()
             if stmt.allocate_memory_on_stack:
-                var_name = 'tmp_' + str(len(func_decl.tmp_vars))
-                func_decl.tmp_vars[var_name] = copy.deepcopy(stmt.datatype)
+                # var memory goes before rvalue temporaries
+                var_name = 'tmp_' + str(len(fd.tmp_vars))
+                fd.tmp_vars[var_name] = None
                 stmt.binded_var_name = var_name
-            scan_expr_vars(stmt.rvalue_expr)
-        elif isinstance(stmt, ast.Return):
-            scan_expr_vars(stmt.expr)
+            stmt.rvalue_expr, stmt.datatype = mark_out_expr(stmt.rvalue_expr)
+            fd.vars[stmt.name] = stmt.datatype
+            if stmt.allocate_memory_on_stack:
+                fd.tmp_vars[stmt.binded_var_name] = stmt.datatype
         elif isinstance(stmt, ast.Assign):
-            scan_expr_vars(stmt.rvalue_expr)
+            stmt = stmt.copy()
+            stmt.rvalue_expr, stmt.datatype = mark_out_expr(stmt.rvalue_expr)
+        elif isinstance(stmt, ast.Return):
+            stmt = stmt.copy()
+            stmt.expr, _ = mark_out_expr(stmt.expr)
         elif isinstance(stmt, ast.If):
-            scan_expr_vars(stmt.condition)
-            mark_out_block(stmt.branch_if)
+            stmt = stmt.copy()
+            stmt.condition, _ = mark_out_expr(stmt.condition)
+            stmt.branch_if = mark_out_block(stmt.branch_if)
             if stmt.branch_else:
-                mark_out_block(stmt.branch_else)
+                stmt.branch_else = mark_out_block(stmt.branch_else)
         elif isinstance(stmt, ast.For):
-            scan_expr_vars(stmt.condition)
-            mark_out_block(stmt.branch)
-        else:
-            raise Exception('Bad stmt type: ' + str(type(stmt)))
-
-    def mark_out_assign_stmt(assign_stmt):
-        assign_stmt.datatype = get_expr_datatype(
-            ast_.ident_list,
-            func_decl,
-            assign_stmt.rvalue_expr,
-        )
-
-    def mark_out_stmt(stmt):
-        ''' stmt - current parsed stmt in current parsed block '''
-        ignored_stmt_type_tuple = (
-            ast.FuncCall,
-            ast.Return,
-            ast.If,
-            ast.For,
-        )
-        if isinstance(stmt, ast.VarDecl):
-            mark_out_assign_stmt(stmt)
-        elif isinstance(stmt, ast.Assign):
-            mark_out_assign_stmt(stmt)
-        elif isinstance(stmt, ignored_stmt_type_tuple):
-            pass  # do nothing for this stmts
+            stmt = stmt.copy()
+            stmt.condition, _ = mark_out_expr(stmt.condition)
+            stmt.branch = mark_out_block(stmt.branch)
         else:
             raise Exception('Bad type: ' + str(type(stmt)))
+        return stmt
 
     def mark_out_block(block):
-        for stmt in block:
-            mark_out_stmt(stmt)
-            scan_stmt_vars(stmt)
+        return [mark_out_stmt(stmt) for stmt in block]
 
+    marked_ast = ast_.copy()
+    marked_ast.decl_list = []
     for decl in ast_.decl_list:
         if isinstance(decl, ast.FuncDecl):
-            func_decl = decl
-            mark_out_block(decl.body)
+            func_decl = decl.copy()
+            func_decl.vars = {}
+            func_decl.tmp_vars = {}
+            func_decl.constants = {}
+            with instrument.phase('mark_out_datatypes', decl.name):
+                func_decl.body = mark_out_block(decl.body)
+            if instrument.is_enabled():
+                instrument.count('tmp vars', len(func_decl.tmp_vars))
+                instrument.count('constants', len(func_decl.constants))
+            decl = func_decl
         elif isinstance(decl, ast.ClassDecl):
             pass
         else:
             raise Exception('Bad type: ' + str(type(decl)))
+        marked_ast.decl_list.append(decl)
+    return marked_ast
 
 
 def mark_out_datatypes(ast_):
-    ''' Mark out 'datatype' fields to ast nodes. '''
-    copied_ast_ = copy.deepcopy(ast_)
-    _mark_out_datatypes(copied_ast_)
-    return copied_ast_
+    ''' Mark out 'datatype' fields to ast nodes.
+
+        Returns new ast, ast_ is left untouched.
+    '''
+    with instrument.phase('mark_out_datatypes'):
+        return _mark_out_datatypes(ast_)
 
 
 # vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
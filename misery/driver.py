@@ -0,0 +1,719 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for copyright and license details
+
+
+'''
+Compiler driver: Misery source -> C code -> executable.
+
+Usage: python -m misery [options] input.mis [input.mis ...]
+'''
+
+
+import argparse
+import concurrent.futures
+import contextlib
+import io
+import itertools
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from misery import (
+    build,
+    cache,
+    datatype,
+    generator,
+    ident_table,
+    instrument,
+    optimizer,
+    parse,
+)
+
+
+def translate(
+    input_string,
+    parser_backend='descent',
+    optimize=False,
+    pass_by_value=False,
+):
+    ''' Parse and annotate Misery source, return C generator. '''
+    ast_ = parse.parse(input_string, backend=parser_backend)
+    ast_.ident_list = ident_table.ident_table(ast_)
+    ast_ = datatype.mark_out_datatypes(ast_)
+    if optimize:
+        ast_ = optimizer.optimize(ast_)
+    return generator.Generator(ast_, pass_by_value=pass_by_value)
+
+
+def write_c(
+    input_string,
+    file_,
+    parser_backend='descent',
+    optimize=False,
+    pass_by_value=False,
+):
+    ''' Translate Misery source to full C program in file_. '''
+    generator_ = translate(
+        input_string,
+        parser_backend=parser_backend,
+        optimize=optimize,
+        pass_by_value=pass_by_value,
+    )
+    generator_.write_full(file_)
+
+
+class Options(object):
+    ''' Compilation options, are sent to worker processes. '''
+
+    def __init__(
+        self,
+        cc='tcc',
+        cflags=None,
+        parser_backend='descent',
+        emit_c=False,
+        keep_c=False,
+        use_cache=False,
+        cache_dir=None,
+        cache_max_size=None,
+        build_dir=None,
+        search_path=None,
+        separate=False,
+        optimize=False,
+        pass_by_value=False,
+    ):
+        self.cc = cc
+        self.cflags = list(cflags or [])
+        self.parser_backend = parser_backend
+        self.emit_c = emit_c  # only translate to C
+        self.keep_c = keep_c  # keep C code next to executable
+        self.use_cache = use_cache
+        self.cache_dir = cache_dir
+        self.cache_max_size = cache_max_size
+        self.build_dir = build_dir  # keep state of incremental builds
+        self.search_path = list(search_path or [])  # dirs with modules
+        self.separate = separate  # compile modules to own objects
+        self.optimize = optimize
+        self.pass_by_value = pass_by_value  # scalars are not pointers
+
+    def output_key(self):
+        ''' String of options that change generated C code. '''
+        key_list = []
+        if self.optimize:
+            key_list.append('O')
+        if self.pass_by_value:
+            key_list.append('pass_by_value')
+        return ' '.join(key_list)
+
+
+class Diagnostic(object):
+    ''' Error or warning of Misery or C compiler.
+
+        source - 'misery' or 'cc'.
+        line, column - position in source or None.
+    '''
+
+    def __init__(self, source, severity, message, line=None, column=None):
+        self.source = source
+        self.severity = severity
+        self.message = message
+        self.line = line
+        self.column = column
+
+    def __repr__(self):
+        return 'Diagnostic(%r, %r, %r, line=%r, column=%r)' % (
+            self.source,
+            self.severity,
+            self.message,
+            self.line,
+            self.column,
+        )
+
+
+_diagnostic_re = re.compile(
+    r'^[^:\n]*:(?P<line>\d+):(?:(?P<column>\d+):)? '
+    r'(?:(?P<severity>error|warning|note): )?(?P<message>.*)$',
+    re.MULTILINE,
+)
+
+
+def parse_diagnostics(source, text):
+    ''' Return [Diagnostic, ...] of compiler messages.
+
+        Text without positions is one error.
+    '''
+    diagnostic_list = []
+    for match in _diagnostic_re.finditer(text):
+        column = match.group('column')
+        diagnostic_list.append(Diagnostic(
+            source,
+            match.group('severity') or 'error',
+            match.group('message').strip(),
+            line=int(match.group('line')),
+            column=int(column) if column else None,
+        ))
+    if not diagnostic_list and text.strip():
+        diagnostic_list.append(Diagnostic(source, 'error', text.strip()))
+    return diagnostic_list
+
+
+class CompileResult(object):
+    ''' Outcome of compilation of one file. '''
+
+    def __init__(self, input_file_name, output_file_name):
+        self.input_file_name = input_file_name
+        self.output_file_name = output_file_name
+        self.error = None
+        self.diagnostics = []  # [Diagnostic, ...]
+        self.phase_list = []  # [(name, seconds), ...]
+        # only for programs run by compile_source()
+        self.stdout = None
+        self.returncode = None
+
+    def _set_error(self, error):
+        self.error = error
+        if not self.diagnostics:
+            prefix = build.c_compiler_error_prefix
+            if error.startswith(prefix):
+                self.diagnostics = parse_diagnostics(
+                    'cc',
+                    error[len(prefix):],
+                )
+            else:
+                self.diagnostics = parse_diagnostics('misery', error)
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def default_exe_file_name(input_file_name):
+    exe_file_name = os.path.splitext(input_file_name)[0]
+    if sys.platform == 'win32':
+        exe_file_name += '.exe'
+    return exe_file_name
+
+
+def default_output_file_name(input_file_name, emit_c=False):
+    if emit_c:
+        return os.path.splitext(input_file_name)[0] + '.c'
+    return default_exe_file_name(input_file_name)
+
+
+def compile_c(c_file_name, exe_file_name, cc='tcc', cflags=None):
+    ''' Compile C file with C compiler. '''
+    build.run_c_compiler(
+        cc,
+        list(cflags or []) + [c_file_name, '-o', exe_file_name],
+    )
+
+
+_caches = {}
+
+
+def _get_cache(options):
+    ''' Cache object is shared to keep its size estimate. '''
+    key = (options.cache_dir, options.cache_max_size)
+    if key not in _caches:
+        _caches[key] = cache.Cache(
+            cache_dir=options.cache_dir,
+            max_size=options.cache_max_size,
+        )
+    return _caches[key]
+
+
+def write_c_cached(input_string, file_, options):
+    ''' Like write_c, but takes C code from cache if possible. '''
+    cache_ = _get_cache(options)
+    with instrument.phase('cache'):
+        key = cache.cache_key(input_string, options.output_key())
+        c_code = cache_.get(key)
+    if c_code is None:
+        out = io.StringIO()
+        write_c(
+            input_string,
+            out,
+            parser_backend=options.parser_backend,
+            optimize=options.optimize,
+            pass_by_value=options.pass_by_value,
+        )
+        c_code = out.getvalue()
+        with instrument.phase('cache'):
+            cache_.put(key, c_code)
+    file_.write(c_code)
+
+
+_import_re = re.compile(r'(?:\s|#[^\n]*)*import\b')
+
+
+def _build_file(input_file_name, output_file_name, options):
+    ''' Build program of many modules, see build.Builder. '''
+    with contextlib.ExitStack() as stack:
+        build_dir = options.build_dir
+        if build_dir is None:
+            build_dir = stack.enter_context(tempfile.TemporaryDirectory())
+        builder = build.Builder(
+            build_dir,
+            search_path=options.search_path,
+            parser_backend=options.parser_backend,
+            separate=options.separate,
+            cc=options.cc,
+            cflags=options.cflags,
+            optimize=options.optimize,
+            pass_by_value=options.pass_by_value,
+        )
+        if options.separate:
+            builder.build_executable(input_file_name, output_file_name)
+            return
+        c_file_name = builder.build(input_file_name)
+        if options.emit_c:
+            shutil.copyfile(c_file_name, output_file_name)
+            return
+        if options.keep_c:
+            shutil.copyfile(
+                c_file_name,
+                os.path.splitext(output_file_name)[0] + '.c',
+            )
+        with instrument.phase('cc'):
+            compile_c(
+                c_file_name=c_file_name,
+                exe_file_name=output_file_name,
+                cc=options.cc,
+                cflags=options.cflags,
+            )
+
+
+def _compile_file(input_file_name, output_file_name, options):
+    with instrument.phase('read'):
+        with open(input_file_name) as file_:
+            input_string = file_.read()
+    is_build = options.build_dir is not None or options.separate
+    if is_build or _import_re.match(input_string):
+        _build_file(input_file_name, output_file_name, options)
+        return
+    if options.emit_c:
+        c_file_name = output_file_name
+    elif options.keep_c:
+        c_file_name = os.path.splitext(output_file_name)[0] + '.c'
+    else:
+        c_file_name = output_file_name + '.tmp.c'
+    try:
+        with open(c_file_name, 'w') as file_:
+            if options.use_cache:
+                write_c_cached(input_string, file_, options)
+            else:
+                write_c(
+                    input_string,
+                    file_,
+                    parser_backend=options.parser_backend,
+                    optimize=options.optimize,
+                    pass_by_value=options.pass_by_value,
+                )
+        if not options.emit_c:
+            with instrument.phase('cc'):
+                compile_c(
+                    c_file_name=c_file_name,
+                    exe_file_name=output_file_name,
+                    cc=options.cc,
+                    cflags=options.cflags,
+                )
+    finally:
+        is_tmp_file = not options.emit_c and not options.keep_c
+        if is_tmp_file and os.path.exists(c_file_name):
+            os.remove(c_file_name)
+
+
+def compile_file(input_file_name, output_file_name=None, options=None):
+    ''' Compile one Misery file, return CompileResult.
+
+        Errors are stored in result, not raised.
+    '''
+    if options is None:
+        options = Options()
+    if output_file_name is None:
+        output_file_name = default_output_file_name(
+            input_file_name,
+            emit_c=options.emit_c,
+        )
+    result = CompileResult(input_file_name, output_file_name)
+    timer = instrument.PhaseTimer()
+    try:
+        with instrument.listening(timer):
+            _compile_file(input_file_name, output_file_name, options)
+    except Exception as e:
+        result._set_error(str(e))
+    result.phase_list = timer.phase_list
+    return result
+
+
+def _is_tcc(cc):
+    return os.path.basename(cc).startswith('tcc')
+
+
+def _pipe_input(proc, write_input, phase_name):
+    ''' Call write_input(proc.stdin) while proc already reads it,
+        return (stdout, stderr) of proc.
+
+        stdout and stderr are read by threads, so full pipe
+        never blocks writing. Time of waiting for proc after
+        input is written goes to phase phase_name.
+    '''
+    output = {}
+
+    def read(name, file_):
+        output[name] = file_.read()
+
+    thread_list = [
+        threading.Thread(target=read, args=('stdout', proc.stdout)),
+        threading.Thread(target=read, args=('stderr', proc.stderr)),
+    ]
+    for thread in thread_list:
+        thread.start()
+    is_written = False
+    try:
+        try:
+            write_input(proc.stdin)
+        except BrokenPipeError:
+            pass  # proc exited early, its stderr tells why
+        is_written = True
+    finally:
+        if not is_written:
+            proc.kill()
+        with instrument.phase(phase_name):
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+            for thread in thread_list:
+                thread.join()
+            proc.wait()
+    return output['stdout'], output['stderr']
+
+
+def _compile_source(input_string, output_file_name, options, run, result):
+    if options.use_cache:
+        # cached C code is one string anyway
+        out = io.StringIO()
+        write_c_cached(input_string, out, options)
+        c_code = out.getvalue()
+
+        def write_input(file_):
+            file_.write(c_code)
+    else:
+        # Misery errors are found before C compiler is started
+        generator_ = translate(
+            input_string,
+            parser_backend=options.parser_backend,
+            optimize=options.optimize,
+            pass_by_value=options.pass_by_value,
+        )
+        write_input = generator_.write_full
+    if options.emit_c:
+        with open(output_file_name, 'w') as file_:
+            write_input(file_)
+        return
+    if run:
+        if not _is_tcc(options.cc):
+            raise Exception('Only tcc can run program without executable')
+        args = options.cflags + ['-run', '-']
+    else:
+        args = options.cflags + ['-x', 'c', '-', '-o', output_file_name]
+    proc = subprocess.Popen(
+        [options.cc] + args,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    # generator writes code decl by decl,
+    # C compiler reads it while rest is generated
+    stdout, stderr = _pipe_input(
+        proc,
+        write_input,
+        'run' if run else 'cc',
+    )
+    diagnostic_list = parse_diagnostics('cc', stderr)
+    if run:
+        # program may fail too, its own stderr is not diagnostics
+        is_error = any(
+            diagnostic.severity == 'error' and diagnostic.line is not None
+            for diagnostic in diagnostic_list
+        )
+        if not is_error:
+            result.stdout = stdout
+            result.returncode = proc.returncode
+            return
+    elif proc.returncode == 0:
+        # warnings
+        result.diagnostics = [
+            diagnostic for diagnostic in diagnostic_list
+            if diagnostic.line is not None
+        ]
+        return
+    result.diagnostics = diagnostic_list
+    raise Exception(
+        build.c_compiler_error_prefix + stdout + stderr)
+
+
+def compile_source(
+    input_string,
+    options=None,
+    output_file_name=None,
+    run=False,
+):
+    ''' Compile Misery source text, return CompileResult.
+
+        No temporary files: generated C is streamed to stdin of
+        C compiler decl by decl, so compiler reads it while rest
+        is generated, and compiler writes executable to
+        output_file_name (or C code is written, if options.emit_c).
+        C code taken from cache is piped as one string.
+        With run=True program is run by 'tcc -run', its stdout
+        and exit code are stored in result. Errors are stored
+        in result, not raised.
+    '''
+    if options is None:
+        options = Options()
+    result = CompileResult(None, output_file_name)
+    timer = instrument.PhaseTimer()
+    try:
+        if not run and output_file_name is None:
+            raise Exception('No output file name')
+        with instrument.listening(timer):
+            _compile_source(
+                input_string,
+                output_file_name,
+                options,
+                run,
+                result,
+            )
+    except Exception as e:
+        result._set_error(str(e))
+    result.phase_list = timer.phase_list
+    return result
+
+
+def _init_worker(parser_backend, parse_cache_dir):
+    ''' Build parser tables once per worker process. '''
+    if parser_backend == 'ply':
+        parse.get_session(cache_dir=parse_cache_dir)
+
+
+def compile_files(input_file_names, options=None, jobs=None):
+    ''' Compile many Misery files in parallel.
+
+        jobs - count of worker processes, CPU count by default.
+        Results are returned in order of input_file_names.
+    '''
+    if options is None:
+        options = Options()
+    input_file_names = list(input_file_names)
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(input_file_names))
+    if jobs <= 1:
+        return [compile_file(name, options=options)
+                for name in input_file_names]
+    # bigger chunks mean less interprocess communication
+    chunksize = max(1, len(input_file_names) // (jobs * 4))
+    parse_cache_dir = None
+    if options.parser_backend == 'ply':
+        # workers use parser tables cached by this process
+        parse_cache_dir = parse.get_session().cache_dir
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_init_worker,
+        initargs=(options.parser_backend, parse_cache_dir),
+    ) as executor:
+        return list(executor.map(
+            compile_file,
+            input_file_names,
+            itertools.repeat(None),
+            itertools.repeat(options),
+            chunksize=chunksize,
+        ))
+
+
+def _make_arg_parser():
+    arg_parser = argparse.ArgumentParser(
+        prog='misery',
+        description='Compile Misery programs to executables via C.',
+    )
+    arg_parser.add_argument(
+        'input',
+        nargs='+',
+        help='input .mis files',
+    )
+    arg_parser.add_argument(
+        '-o', '--output',
+        help='output file (default: input name without extension),'
+        ' only for one input file',
+    )
+    arg_parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        help='count of parallel jobs (default: CPU count)',
+    )
+    arg_parser.add_argument(
+        '-S', '--emit-c',
+        action='store_true',
+        help='only translate to C, write C code to output file',
+    )
+    arg_parser.add_argument(
+        '--keep-c',
+        action='store_true',
+        help='keep generated C code next to executable',
+    )
+    arg_parser.add_argument(
+        '--cc',
+        default=os.environ.get('CC', 'tcc'),
+        help='C compiler (default: $CC or tcc)',
+    )
+    arg_parser.add_argument(
+        '--cflags',
+        default=os.environ.get('CFLAGS', ''),
+        help='C compiler flags (default: $CFLAGS)',
+    )
+    arg_parser.add_argument(
+        '--parser',
+        choices=('descent', 'ply'),
+        default='descent',
+        help='parser backend (default: descent)',
+    )
+    arg_parser.add_argument(
+        '-O', '--optimize',
+        action='store_true',
+        help='fold constants, prune constant ifs, turn self tail calls'
+             ' into jumps, remove dead code, share tmp var slots',
+    )
+    arg_parser.add_argument(
+        '--pass-by-value',
+        action='store_true',
+        help='pass and return Int and String by value, not by pointer',
+    )
+    arg_parser.add_argument(
+        '-I',
+        dest='search_path',
+        action='append',
+        metavar='DIR',
+        help='search imported modules in DIR too',
+    )
+    arg_parser.add_argument(
+        '--build-dir',
+        help='rebuild only changed modules, keep build state in this dir',
+    )
+    arg_parser.add_argument(
+        '--separate',
+        action='store_true',
+        help='compile every module to its own object file and link them',
+    )
+    arg_parser.add_argument(
+        '--cache',
+        action='store_true',
+        help='take generated C code from cache if source is unchanged',
+    )
+    arg_parser.add_argument(
+        '--cache-dir',
+        help='cache directory (default: ~/.cache/misery/c)',
+    )
+    arg_parser.add_argument(
+        '--cache-size',
+        type=int,
+        help='max cache size in MB (default: %d)' % (
+            cache.Cache.default_max_size // 2 ** 20),
+    )
+    arg_parser.add_argument(
+        '--time-phases',
+        action='store_true',
+        help='print time of every compiler phase to stderr',
+    )
+    arg_parser.add_argument(
+        '--report',
+        action='store_true',
+        help='print time, CPU time and peak memory of phases'
+        ' and of slowest funcs to stderr, implies -j 1',
+    )
+    return arg_parser
+
+
+def _format_batch_report(result_list, elapsed):
+    ''' Per file totals, summed phase times and wall time. '''
+    out = ''
+    phase_list = []
+    for result in result_list:
+        file_time = sum(elapsed for _, elapsed in result.phase_list)
+        out += '%-40s %8.3f s\n' % (result.input_file_name, file_time)
+        phase_list.extend(result.phase_list)
+    out += '\n'
+    out += instrument.format_phase_report(phase_list)
+    out += '%-20s %8.3f s\n' % ('wall', elapsed)
+    return out
+
+
+def main(args):
+    ''' Run driver with command line args, return exit code. '''
+    arg_parser = _make_arg_parser()
+    args = arg_parser.parse_args(args)
+    if args.output and len(args.input) > 1:
+        arg_parser.error('-o can not be used with many input files')
+    if args.separate and args.emit_c:
+        arg_parser.error('-S can not be used with --separate')
+    options = Options(
+        cc=args.cc,
+        cflags=shlex.split(args.cflags),
+        parser_backend=args.parser,
+        emit_c=args.emit_c,
+        keep_c=args.keep_c,
+        build_dir=args.build_dir,
+        search_path=args.search_path,
+        separate=args.separate,
+        optimize=args.optimize,
+        pass_by_value=args.pass_by_value,
+        use_cache=args.cache,
+        cache_dir=args.cache_dir,
+        cache_max_size=(
+            args.cache_size * 2 ** 20 if args.cache_size else None
+        ),
+    )
+    jobs = args.jobs
+    reporter = None
+    if args.report:
+        # workers would not be seen by reporter
+        jobs = 1
+        reporter = instrument.Reporter()
+        instrument.add_listener(reporter)
+    start_time = time.perf_counter()
+    try:
+        if args.output:
+            result_list = [compile_file(args.input[0], args.output, options)]
+        else:
+            result_list = compile_files(args.input, options, jobs=jobs)
+    finally:
+        if reporter is not None:
+            instrument.remove_listener(reporter)
+            reporter.close()
+    elapsed = time.perf_counter() - start_time
+    exit_code = 0
+    for result in result_list:
+        if not result.ok:
+            sys.stderr.write('misery: error: %s: %s\n' % (
+                result.input_file_name,
+                result.error,
+            ))
+            exit_code = 1
+    if args.time_phases:
+        if len(result_list) == 1:
+            sys.stderr.write(
+                instrument.format_phase_report(result_list[0].phase_list))
+        else:
+            sys.stderr.write(_format_batch_report(result_list, elapsed))
+    if reporter is not None:
+        sys.stderr.write(reporter.report())
+    return exit_code
+
+
+# vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
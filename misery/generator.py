@@ -2,10 +2,13 @@
 # See LICENSE file for copyright and license details
 
 
+import io
 import textwrap
 from misery import (
     ast,
     datatype,
+    instrument,
+    intrinsics,
 )
 
 
@@ -23,59 +26,52 @@ def _is_constructor(func_name):
     return first_letter.istitle()
 
 
-class Generator(object):
-
-    prefix = '''
-        #include <stdio.h>
-
-        typedef int Int;
-        typedef char* String;
-
-        void Int_Int_init(Int* __result, Int* n) {
-          *__result = *n;
-        }
-
-        void print_Int(Int* n) {
-          printf("%d", *n);
-        }
+def _iter_stmts(block):
+    for stmt in block:
+        yield stmt
+        if isinstance(stmt, ast.If):
+            for nested_stmt in _iter_stmts(stmt.branch_if):
+                yield nested_stmt
+            for nested_stmt in _iter_stmts(stmt.branch_else or []):
+                yield nested_stmt
+        elif isinstance(stmt, ast.For):
+            for nested_stmt in _iter_stmts(stmt.branch):
+                yield nested_stmt
 
-        void print_String(String* s) {
-          printf("%s", *s);
-        }
 
-        void printNewLine() {
-          printf("\\n");
-        }
+def _find_tail_calls(block):
+    return [
+        stmt.expr for stmt in _iter_stmts(block)
+        if isinstance(stmt, ast.Return) and stmt.is_tail_call
+    ]
 
-        void isLess_Int_Int(Int* __result, Int* a, Int* b) {
-          *__result = (*a < *b);
-        }
 
-        void isGreater_Int_Int(Int* __result, Int* a, Int* b) {
-          *__result = (*a < *b);
-        }
+def _find_tail_call_slots(func_decl, tail_call_list, value_params):
+    ''' Params passed by pointer that get new values by tail calls. '''
+    slot_list = []
+    for param_index, param in enumerate(func_decl.signature.param_list):
+        if param.name in value_params:
+            continue
+        for func_call_expr in tail_call_list:
+            arg = func_call_expr.arg_list[param_index]
+            if not (isinstance(arg, ast.Ident) and arg.name == param.name):
+                slot_list.append(param)
+                break
+    return slot_list
 
-        void isEqual_Int_Int(Int* __result, Int* a, Int* b) {
-          *__result = (*a == *b);
-        }
 
-        void minus_Int_Int(Int* __result, Int* a, Int* b) {
-          *__result = (*a - *b);
-        }
-
-        void plus_Int_Int(Int* __result, Int* a, Int* b) {
-          *__result = (*a + *b);
-        }
+class Generator(object):
 
-        void multiply_Int_Int(Int* __result, Int* a, Int* b) {
-          *__result = (*a * *b);
-        }
+    runtime_types = '''
+        #include <stdio.h>
+        #include <stdlib.h>
 
-        void allocInt(Int** __result) {
-          *__result = (Int*)calloc(1, sizeof(Int));
-        }
+        typedef int Int;
+        typedef char* String;
     '''
 
+    runtime_header_name = 'misery_runtime.h'
+
     postfix = '''
         Int main(void) {
           start();
@@ -84,10 +80,26 @@ class Generator(object):
 
     '''
 
-    def __init__(self, ast_):
+    max_chunk_count = 4096
+
+    def __init__(self, ast_, pass_by_value=False):
         self._ast = ast_
+        # pass and return scalars by value, not by pointer
+        self._pass_by_value = pass_by_value
+        self._value_params = frozenset()  # of current func
+        self._tail_call_slots = []  # of current func
         self._indent_level = 0
         self._func_decl = None
+        self._file = None
+        self._is_header = False
+        self._is_separate = False  # separate compilation mode
+        self._chunks = []
+        self._write = self._chunks.append
+
+    def _flush(self):
+        ''' Move buffered chunks to output file. '''
+        self._file.write(''.join(self._chunks))
+        del self._chunks[:]
 
     def _indent(self):
         return self._indent_level * '  '
@@ -98,43 +110,51 @@ class Generator(object):
     def _decrenent_indent(self):
         self._indent_level -= 1
 
+    def _is_by_value(self, datatype_):
+        return self._pass_by_value and datatype.is_scalar(datatype_)
+
+    def _returns_value(self, signature):
+        ''' Check if func returns C value, not writes to __result. '''
+        return_type = signature.return_type
+        return bool(return_type) and self._is_by_value(return_type)
+
     def _generate_func_header(self, name, signature):
 
-        def generate_func_params(param_list):
-            out = ''
-            is_first = True
-            for param in param_list:
-                if is_first:
-                    is_first = False
-                else:
-                    out += ', '
-                out += param.datatype.name + '*' + ' ' + param.name
-            return out
+        def generate_func_param(param):
+            if self._is_by_value(param.datatype):
+                return param.datatype.name + ' ' + param.name
+            return param.datatype.name + '*' + ' ' + param.name
 
+        has_result_param = bool(signature.return_type) and \
+            not self._returns_value(signature)
         out = ''
-        out += 'void '
+        if self._returns_value(signature):
+            out += signature.return_type.name + ' '
+        else:
+            out += 'void '
         out += func_signature_to_mangled_name(
             func_name=name,
             func_signature=signature,
         )
         out += '('
-        if signature.return_type:
+        if has_result_param:
             out += signature.return_type.name + '*' + ' ' + '__result'
         if len(signature.param_list) != 0:
-            if signature.return_type:
+            if has_result_param:
                 out += ', '
-            out += generate_func_params(signature.param_list)
-        elif not signature.return_type:
+            out += ', '.join(
+                generate_func_param(param)
+                for param in signature.param_list
+            )
+        elif not has_result_param:
             out += 'void'
         out += ')'
         return out
 
     def _generate_expr_dependencies(self, func_call_expr):
-        out = ''
         for arg in func_call_expr.arg_list:
             if isinstance(arg, ast.FuncCall):
-                out += self._generate_expr(arg)
-        return out
+                self._generate_expr(arg)
 
     def _is_correct_ident(self, name):
         ''' Check if this is correct ident '''
@@ -143,371 +163,530 @@ class Generator(object):
             return True
         return False
 
-    def _generate_arg(self, arg):
-        out = ''
-        if isinstance(arg, (ast.Number, ast.String)):
-            out += '&' + arg.binded_var_name
+    def _ident_pointer(self, name):
+        if name in self._value_params:
+            return '&' + name
+        return name
+
+    def _ident_value(self, name):
+        if name in self._value_params:
+            return name
+        return '*' + name
+
+    def _generate_arg(self, arg, by_value=False):
+        if isinstance(arg, (ast.Number, ast.String, ast.FuncCall)):
+            if by_value:
+                return arg.binded_var_name
+            return '&' + arg.binded_var_name
         elif isinstance(arg, ast.Ident):
             assert self._is_correct_ident(arg.name)
-            out += arg.name
-        elif isinstance(arg, ast.FuncCall):
-            out += '&' + arg.binded_var_name
+            if by_value:
+                return self._ident_value(arg.name)
+            return self._ident_pointer(arg.name)
         else:
             raise Exception('Wrong arg type: ' + str(type(arg)))
-        return out
 
     def _generate_func_call_expr_args(
         self,
         func_call_expr,
     ):
-        out = ''
-        is_first = True
         assert isinstance(
             func_call_expr.called_expr,
             ast.Ident,
         )
-        called_func_name = func_call_expr.called_expr.name
-        return_type = datatype.find_func_signature(
-            self._ast.ident_list,
-            self._func_decl,
-            func_call_expr
-        ).return_type
-        if return_type:
-            prefix_list = return_type.prefix_list
-            if prefix_list and 'R' in prefix_list:
-                out += '&' + func_call_expr.binded_var_name
-            else:
-                out += '&' + func_call_expr.binded_var_name
-            is_first = False
-        for arg in func_call_expr.arg_list:
-            if is_first:
-                is_first = False
-            else:
-                out += ', '
-            out += self._generate_arg(arg)
-        return out
+        arg_list = []
+        signature = func_call_expr.signature
+        if signature.return_type and not self._returns_value(signature):
+            arg_list.append('&' + func_call_expr.binded_var_name)
+        for arg, param in zip(func_call_expr.arg_list, signature.param_list):
+            arg_list.append(self._generate_arg(
+                arg,
+                by_value=self._is_by_value(param.datatype),
+            ))
+        return ', '.join(arg_list)
 
     def _generate_func_call_expr(self, func_call_expr):
-        out = ''
         # TODO: implement other exprs
         assert isinstance(
             func_call_expr.called_expr,
             ast.Ident,
         )
-        func_signature = datatype.find_func_signature(
-            self._ast.ident_list,
-            self._func_decl,
-            func_call_expr
-        )
+        # resolved by datatype.mark_out_datatypes
+        func_signature = func_call_expr.signature
+        assert func_signature is not None
         called_func_name = func_signature_to_mangled_name(
             func_name=func_call_expr.called_expr.name,
             func_signature=func_signature,
         )
-        out += self._generate_expr_dependencies(
+        self._generate_expr_dependencies(
             func_call_expr=func_call_expr,
         )
-        out += self._indent()
+        write = self._write  # shortcut
+        intrinsic = intrinsics.find(
+            func_call_expr.called_expr.name,
+            func_signature,
+        )
+        if intrinsic and intrinsic.is_inline:
+            write(
+                self._indent() + func_call_expr.binded_var_name +
+                ' = ' + intrinsic.format_c_expr([
+                    self._generate_arg(arg, by_value=True)
+                    for arg in func_call_expr.arg_list
+                ]) + ';\n'
+            )
+            return
+        write(self._indent())
+        if self._returns_value(func_signature):
+            write(func_call_expr.binded_var_name + ' = ')
         if _is_constructor(called_func_name):
-            out += called_func_name + '_init'
+            write(called_func_name + '_init')
         else:
-            out += called_func_name
-        out += '('
-        out += self._generate_func_call_expr_args(
-            func_call_expr,
-        )
-        out += ');\n'
-        return out
+            write(called_func_name)
+        write('(')
+        write(self._generate_func_call_expr_args(func_call_expr))
+        write(');\n')
 
     def _generate_expr(self, expr):
         ''' Generate evaluation code. '''
-        out = ''
         if isinstance(expr, ast.FuncCall):
-            out += self._generate_func_call_expr(expr)
+            self._generate_func_call_expr(expr)
         elif isinstance(expr, ast.Ident):
             pass  # ok
         else:
             raise Exception('Bad expr type: ' + str(type(expr)))
-        return out
 
     def _generate_assign_stmt(self, assign_stmt):
-        out = ''
         rvalue_expr = assign_stmt.rvalue_expr
         if isinstance(rvalue_expr, (ast.Number, ast.String)):
-            out += self._indent()
-            out += '*' + assign_stmt.name
-            out += ' = '
-            out += rvalue_expr.binded_var_name
-            out += ';\n'
+            pass  # constants are already initialized
         elif isinstance(rvalue_expr, ast.FuncCall):
-            out += self._generate_expr(rvalue_expr)
-            out += self._indent()
-            out += '*' + assign_stmt.name
-            out += ' = '
-            out += rvalue_expr.binded_var_name
-            out += ';\n'
+            self._generate_expr(rvalue_expr)
         else:
             raise Exception(
                 'Bad expr type: ' + str(type(rvalue_expr)),
             )
-        return out
+        self._write(
+            self._indent() +
+            '*' + assign_stmt.name +
+            ' = ' +
+            rvalue_expr.binded_var_name +
+            ';\n'
+        )
 
     def _generate_func_call_stmt(self, stmt):
-        out = ''
-        out += self._generate_expr(stmt)
-        return out
+        self._generate_expr(stmt)
 
     def _generate_if_stmt(self, stmt):
-        out = ''
+        write = self._write  # shortcut
         assert isinstance(stmt.condition, ast.FuncCall)
-        out += self._generate_expr(stmt.condition)
-        out += self._indent() + 'if ('
+        self._generate_expr(stmt.condition)
         var_name = stmt.condition.binded_var_name
-        out += var_name
-        out += ') {\n'
+        write(self._indent() + 'if (' + var_name + ') {\n')
         self._increnent_indent()
-        out += self._generate_block(block=stmt.branch_if)
+        self._generate_block(block=stmt.branch_if)
         self._decrenent_indent()
-        out += self._indent() + '}'
+        write(self._indent() + '}')
         if stmt.branch_else:
-            out += ' else {\n'
+            write(' else {\n')
             self._increnent_indent()
-            out += self._generate_block(block=stmt.branch_else)
+            self._generate_block(block=stmt.branch_else)
             self._decrenent_indent()
-            out += self._indent() + '}'
-        out += '\n'
-        return out
+            write(self._indent() + '}')
+        write('\n')
 
     def _generate_for_stmt(self, stmt):
-        out = ''
+        write = self._write  # shortcut
         assert isinstance(stmt.condition, ast.FuncCall)
-        out += self._indent() + 'while (1) {\n'
+        write(self._indent() + 'while (1) {\n')
         self._increnent_indent()
-        out += self._generate_expr(stmt.condition)
+        self._generate_expr(stmt.condition)
         var_name = stmt.condition.binded_var_name
-        out += self._indent() + 'if (' + '!' + var_name + ') {\n'
+        write(self._indent() + 'if (' + '!' + var_name + ') {\n')
         self._increnent_indent()
-        out += self._indent() + 'break;\n'
+        write(self._indent() + 'break;\n')
         self._decrenent_indent()
-        out += self._indent() + '}'
-        out += '\n'
-        out += self._generate_block(block=stmt.branch)
+        write(self._indent() + '}\n')
+        self._generate_block(block=stmt.branch)
         self._decrenent_indent()
-        out += self._indent() + '}'
-        out += '\n'
-        return out
+        write(self._indent() + '}\n')
 
     def _generate_return_stmt(self, stmt):
         def gen_expr(expr):
-            out = ''
             if isinstance(expr, (ast.Number, ast.String)):
-                out += expr.binded_var_name
+                return expr.binded_var_name
             elif isinstance(expr, ast.Ident):
-                out = '*' + expr.name
+                return self._ident_value(expr.name)
             elif isinstance(expr, ast.FuncCall):
-                out += expr.binded_var_name
+                return expr.binded_var_name
             else:
                 raise Exception(
                     'Wrong expr type: ' + str(type(expr)),
                 )
-            return out
 
-        out = ''
+        if stmt.is_tail_call:
+            self._generate_tail_call(stmt.expr)
+            return
         if isinstance(stmt.expr, ast.FuncCall):
-            out += self._generate_expr(stmt.expr)
-        out += self._indent() + '*__result = '
-        out += gen_expr(expr=stmt.expr)
-        out += ';\n'
-        out += self._indent() + 'return;\n'
-        return out
+            self._generate_expr(stmt.expr)
+        if self._returns_value(self._func_decl.signature):
+            self._write(
+                self._indent() + 'return ' +
+                gen_expr(expr=stmt.expr) + ';\n'
+            )
+            return
+        self._write(
+            self._indent() + '*__result = ' +
+            gen_expr(expr=stmt.expr) + ';\n' +
+            self._indent() + 'return;\n'
+        )
+
+    def _generate_tail_call(self, func_call_expr):
+        ''' Reassign params and jump to func start.
+
+            Param passed by pointer is pointed to its slot,
+            args can not be pointed to, next iteration
+            overwrites them.
+        '''
+        write = self._write  # shortcut
+        self._generate_expr_dependencies(func_call_expr)
+        param_list = self._func_decl.signature.param_list
+        for param, arg in zip(param_list, func_call_expr.arg_list):
+            if isinstance(arg, ast.Ident) and arg.name == param.name:
+                continue  # param is not changed
+            value = self._generate_arg(arg, by_value=True)
+            if param.name in self._value_params:
+                write(self._indent() + param.name + ' = ' + value + ';\n')
+                continue
+            slot_name = '__tail_' + param.name
+            write(self._indent() + slot_name + ' = ' + value + ';\n')
+            write(self._indent() + param.name + ' = &' + slot_name + ';\n')
+        write(self._indent() + 'goto begin;\n')
+
+    def _generate_var_decl_stmt(self, stmt):
+        write = self._write  # shortcut
+        if stmt.allocate_memory_on_stack:
+            write(
+                self._indent() + stmt.name +
+                ' = ' + '&' + stmt.binded_var_name + ';\n'
+            )
+            self._generate_assign_stmt(stmt)
+            return
+        self._generate_expr(stmt.rvalue_expr)
+        write(self._indent() + stmt.name + ' = ')
+        if isinstance(stmt.rvalue_expr, ast.Ident):
+            write(self._ident_pointer(stmt.rvalue_expr.name))
+        else:
+            prefix_list = stmt.datatype.prefix_list
+            if prefix_list and 'R' in prefix_list:
+                write(stmt.rvalue_expr.binded_var_name)
+            else:
+                write('&' + stmt.rvalue_expr.binded_var_name)
+        write(';\n')
 
     def _generate_stmt(self, stmt):
-        out = ''
         if isinstance(stmt, ast.FuncCall):
-            out += self._generate_func_call_stmt(stmt)
+            self._generate_func_call_stmt(stmt)
         elif isinstance(stmt, ast.VarDecl):
-            if stmt.allocate_memory_on_stack:
-                out += self._indent()
-                out += stmt.name
-                out += ' = '
-                out += '&' + stmt.binded_var_name
-                out += ';\n'
-                out += self._generate_assign_stmt(stmt)
-            else:
-                out += self._generate_expr(stmt.rvalue_expr)
-                out += self._indent()
-                out += stmt.name
-                out += ' = '
-                if isinstance(stmt.rvalue_expr, ast.Ident):
-                    out += stmt.rvalue_expr.name
-                else:
-                    prefix_list = stmt.datatype.prefix_list
-                    if prefix_list and 'R' in prefix_list:
-                        out += stmt.rvalue_expr.binded_var_name
-                    else:
-                        out += '&' + stmt.rvalue_expr.binded_var_name
-                out += ';\n'
+            self._generate_var_decl_stmt(stmt)
         elif isinstance(stmt, ast.Assign):
-            out += self._generate_assign_stmt(stmt)
+            self._generate_assign_stmt(stmt)
         elif isinstance(stmt, ast.If):
-            out += self._generate_if_stmt(stmt)
+            self._generate_if_stmt(stmt)
         elif isinstance(stmt, ast.For):
-            out += self._generate_for_stmt(stmt)
+            self._generate_for_stmt(stmt)
         elif isinstance(stmt, ast.Return):
-            out += self._generate_return_stmt(stmt)
+            self._generate_return_stmt(stmt)
         else:
             raise Exception('Bad stmt type: ' + str(type(stmt)))
-        return out
 
     def _generate_block(self, block):
-        out = ''
         for stmt in block:
-            out += self._generate_stmt(stmt)
-        return out
+            self._generate_stmt(stmt)
+            # do not keep huge funcs in memory
+            if len(self._chunks) > Generator.max_chunk_count:
+                self._flush()
 
     def _generate_local_vars(self):
         fd = self._func_decl  # shortcut
-        out = ''
+        write = self._write  # shortcut
+        indent = self._indent()
         for name, datatype_ in sorted(fd.vars.items()):
-            out += self._indent()
-            out += datatype_.name
-            out += '*'
-            out += ' '
-            out += name
-            out += ';' + '\n'
+            write(indent + datatype_.name + '*' + ' ' + name + ';\n')
         for name, datatype_ in sorted(fd.tmp_vars.items()):
-            out += self._indent()
-            out += datatype_.name
+            write(indent + datatype_.name)
             prefix_list = datatype_.prefix_list
             if prefix_list and 'R' in prefix_list:
-                out += '*'
-            out += ' '
-            out += name
-            out += ';' + '\n'
+                write('*')
+            write(' ' + name + ';\n')
         for name, expr in sorted(fd.constants.items()):
-            out += self._indent()
-            out += datatype.get_expr_datatype(
-                self._ast.ident_list,
-                fd,
-                expr,
-            ).name
-            out += ' '
-            out += name
-            out += ';' + '\n'
-        return out
+            write(
+                indent + datatype.literal_datatype(expr).name +
+                ' ' + name + ';\n'
+            )
+        for param in self._tail_call_slots:
+            write(
+                indent + param.datatype.name +
+                ' __tail_' + param.name + ';\n'
+            )
 
     def _generate_constants_initialization_code(self):
         fd = self._func_decl  # shortcut
-        out = ''
+        write = self._write  # shortcut
         for name, expr in sorted(fd.constants.items()):
-            out += self._indent()
-            out += name
-            out += ' = '
+            write(self._indent() + name + ' = ')
             if isinstance(expr, ast.String):
-                out += '\"' + str(expr.value) + '\"'
+                write('\"' + str(expr.value) + '\"')
             elif isinstance(expr, ast.Number):
-                out += str(expr.value)
+                write(str(expr.value))
             else:
                 raise Exception('Bad type: ' + str(type(expr)))
-            out += ';' + '\n'
-        return out
+            write(';\n')
+
+    def _find_value_params(self, func_decl):
+        ''' Return names of params passed by value.
+
+            Callee gets copy of param, so it can not change
+            var of caller, like other modes do, through param
+            or through var pointing to param.
+        '''
+        value_params = set(
+            param.name for param in func_decl.signature.param_list
+            if self._is_by_value(param.datatype)
+        )
+        if not value_params:
+            return frozenset()
+        alias_names = set(value_params)
+        stmt_list = list(_iter_stmts(func_decl.body))
+        is_changed = True
+        while is_changed:
+            is_changed = False
+            for stmt in stmt_list:
+                if not isinstance(stmt, ast.VarDecl):
+                    continue
+                rvalue_expr = stmt.rvalue_expr
+                if isinstance(rvalue_expr, ast.Ident) and \
+                        rvalue_expr.name in alias_names and \
+                        stmt.name not in alias_names:
+                    alias_names.add(stmt.name)
+                    is_changed = True
+        for stmt in stmt_list:
+            if isinstance(stmt, ast.Assign) and stmt.name in alias_names:
+                raise Exception(
+                    'Can not assign to param passed by value'
+                    ' or to its alias: \'' + stmt.name + '\'',
+                )
+        return frozenset(value_params)
 
     def _generate_func(self, func_decl):
         fd = func_decl  # shortcut
+        write = self._write  # shortcut
         self._func_decl = fd
-        out = ''
-        out += self._generate_func_header(
+        self._value_params = self._find_value_params(fd)
+        tail_call_list = _find_tail_calls(fd.body)
+        self._tail_call_slots = _find_tail_call_slots(
+            fd, tail_call_list, self._value_params)
+        write(self._generate_func_header(
             name=func_decl.name,
             signature=func_decl.signature,
-        )
-        out += ' {\n'
+        ))
+        write(' {\n')
         self._increnent_indent()
-        if fd.vars or fd.tmp_vars or fd.constants:
-            out += self._generate_local_vars()
-            out += '\n'
-            if func_decl.constants:
-                out += self._generate_constants_initialization_code()
-                out += '\n'
-        out += self._generate_block(func_decl.body)
+        if fd.vars or fd.tmp_vars or fd.constants or self._tail_call_slots:
+            self._generate_local_vars()
+            write('\n')
+        if tail_call_list:
+            # constants are initialized again, like in real call
+            write('begin:\n')
+        if func_decl.constants:
+            self._generate_constants_initialization_code()
+            write('\n')
+        self._generate_block(func_decl.body)
         self._decrenent_indent()
-        out += '}\n'
-        return out
+        write('}\n')
 
-    def _generate_class(self, class_decl):
+    def _generate_class_struct(self, class_decl):
         name = class_decl.name  # shortcut
-        out = ''
-        out += 'struct ' + name + ' {\n'
+        write = self._write  # shortcut
+        write('struct ' + name + ' {\n')
         self._increnent_indent()
         for field in class_decl.field_list:
-            out += self._indent()
-            out += field.datatype.name + ' ' + field.name + ';\n'
+            write(
+                self._indent() +
+                field.datatype.name + ' ' + field.name + ';\n'
+            )
         self._decrenent_indent()
-        out += '};\n'
-        out += '\n'
-        out += 'void ' + name + '_init(' + name + '* __result' + ') {\n'
-        out += '  /* todo */\n'
-        out += '}\n'
-        return out
+        write('};\n')
+
+    def _generate_class_init(self, class_decl):
+        name = class_decl.name  # shortcut
+        write = self._write  # shortcut
+        write('void ' + name + '_init(' + name + '* __result' + ') {\n')
+        write('  /* todo */\n')
+        write('}\n')
+
+    def _generate_class(self, class_decl):
+        self._generate_class_struct(class_decl)
+        self._write('\n')
+        self._generate_class_init(class_decl)
 
     def _generate_forward_decls(self):
-        out = ''
+        write = self._write  # shortcut
         for decl in self._ast.decl_list:
             if isinstance(decl, ast.FuncDecl):
-                out += self._generate_func_header(
+                write(self._generate_func_header(
                     name=decl.name,
                     signature=decl.signature,
-                )
-                out += ';\n'
+                ))
+                write(';\n')
             elif isinstance(decl, ast.ClassDecl):
-                out += 'typedef struct '
-                out += decl.name
-                out += ' '
-                out += decl.name
-                out += ';\n'
+                write('typedef struct ' + decl.name + ' ' + decl.name + ';\n')
+                if self._is_header:
+                    write('void ' + decl.name + '_init(')
+                    write(decl.name + '* __result' + ');\n')
             else:
                 raise Exception('Bad type: ' + str(type(decl)))
-        return out
 
     def _generate_imports(self):
         if not self._ast.import_list:
-            return ''
-        out = ''
-        out += '\n'
+            return
+        self._write('\n')
         for import_node in self._ast.import_list:
-            out += '// import: ' + import_node + '\n'
-        return out
+            self._write('// import: ' + import_node + '\n')
 
     def _generate_decl(self, decl):
-        out = ''
         if isinstance(decl, ast.FuncDecl):
-            out += self._generate_func(decl)
+            self._generate_func(decl)
         elif isinstance(decl, ast.ClassDecl):
-            out += self._generate_class(decl)
+            if self._is_separate:
+                # struct is in header
+                self._generate_class_init(decl)
+            else:
+                self._generate_class(decl)
         else:
             raise Exception('Bad decl type: ' + str(type(decl)))
-        return out
 
     def _generate_decls(self):
-        out = ''
         for decl in self._ast.decl_list:
-            out += self._generate_decl(decl)
-            out += '\n'
+            with instrument.phase('generate', decl.name):
+                self._generate_decl(decl)
+            self._write('\n')
+            # only one decl is kept in memory
+            self._flush()
+
+    def write(self, file_):
+        ''' Write generated code to file-like object. '''
+        self._file = file_
+        try:
+            with instrument.phase('generate'):
+                self._generate_imports()
+                self._write('\n')
+                self._generate_forward_decls()
+                self._write('\n')
+                self._flush()
+                self._generate_decls()
+        finally:
+            del self._chunks[:]
+            self._file = None
+
+    def write_header(self, file_, guard_name, include_list=()):
+        ''' Write C header of module for separate compilation.
+
+            include_list - headers of imported modules.
+        '''
+        self._file = file_
+        self._is_header = True
+        write = self._write  # shortcut
+        try:
+            with instrument.phase('generate'):
+                write('#ifndef ' + guard_name + '\n')
+                write('#define ' + guard_name + '\n')
+                write('\n')
+                write('#include "' + Generator.runtime_header_name + '"\n')
+                for include in include_list:
+                    write('#include "' + include + '"\n')
+                write('\n')
+                self._generate_forward_decls()
+                for decl in self._ast.decl_list:
+                    if isinstance(decl, ast.ClassDecl):
+                        write('\n')
+                        self._generate_class_struct(decl)
+                write('\n')
+                write('#endif\n')
+                self._flush()
+        finally:
+            del self._chunks[:]
+            self._is_header = False
+            self._file = None
+
+    def write_source(self, file_, header_name, is_entry=False):
+        ''' Write C source of module for separate compilation.
+
+            Only entry module gets main().
+        '''
+        self._file = file_
+        self._is_separate = True
+        try:
+            with instrument.phase('generate'):
+                self._write('#include "' + header_name + '"\n')
+                self._write('\n')
+                self._flush()
+                self._generate_decls()
+        finally:
+            del self._chunks[:]
+            self._is_separate = False
+            self._file = None
+        if is_entry:
+            file_.write(Generator.full_postfix())
+
+    @staticmethod
+    def runtime_header(pass_by_value=False):
+        ''' Runtime types and prototypes of runtime funcs. '''
+        guard_name = 'MISERY_RUNTIME_H'
+        out = '#ifndef ' + guard_name + '\n'
+        out += '#define ' + guard_name + '\n'
+        out += textwrap.dedent(Generator.runtime_types)
+        out += '\n'
+        out += intrinsics.runtime_prototypes(pass_by_value)
+        out += '\n'
+        out += '#endif\n'
         return out
 
-    def generate(self):
-        out = ''
-        out += self._generate_imports()
+    @staticmethod
+    def runtime_source(pass_by_value=False):
+        ''' Bodies of runtime funcs. '''
+        out = '#include "' + Generator.runtime_header_name + '"\n'
         out += '\n'
-        out += self._generate_forward_decls()
-        out += '\n'
-        out += self._generate_decls()
+        out += intrinsics.runtime_funcs(pass_by_value)
         return out
 
+    @staticmethod
+    def full_prefix(pass_by_value=False):
+        ''' Runtime code, goes before generated code. '''
+        return (
+            textwrap.dedent(Generator.runtime_types) + '\n' +
+            intrinsics.runtime_funcs(pass_by_value)
+        )
+
+    @staticmethod
+    def full_postfix():
+        ''' Program entry point, goes after generated code. '''
+        return textwrap.dedent(Generator.postfix)
+
+    def write_full(self, file_):
+        ''' Write generated code with prefix and postfix. '''
+        file_.write(Generator.full_prefix(self._pass_by_value))
+        self.write(file_)
+        file_.write(Generator.full_postfix())
+
+    def generate(self):
+        out = io.StringIO()
+        self.write(out)
+        return out.getvalue()
+
     def generate_full(self):
-        out = ''
-        out += textwrap.dedent(Generator.prefix)
-        out += self.generate()
-        out += textwrap.dedent(Generator.postfix)
-        return out
+        out = io.StringIO()
+        self.write_full(out)
+        return out.getvalue()
 
 
 # vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
@@ -5,58 +5,13 @@
 from misery import (
     ast,
     datatype,
+    instrument,
+    intrinsics,
     misc,
 )
 
 
-def ident_table(ast_):
-    ''' Build simple ident table. '''
-
-    def standart_funcs():
-        datatype_int = datatype.SimpleDataType('Int')
-        datatype_string = datatype.SimpleDataType('String')
-        std_signature = ast.FuncSignature(
-            return_type=datatype.SimpleDataType('Int'),
-            param_list=[
-                ast.Param(name='a', datatype=datatype_int),
-                ast.Param(name='b', datatype=datatype_int),
-            ],
-        )
-        ident_list = {
-            # Int constructor
-            'Int': ast.FuncSignature(
-                return_type=datatype_int,
-                param_list=[
-                    ast.Param(name='n', datatype=datatype_int),
-                ],
-            ),
-            'printNewLine': ast.FuncSignature(),
-            'print': [
-                ast.FuncSignature(
-                    param_list=[
-                        ast.Param(name='s', datatype=datatype_string),
-                    ],
-                ),
-                ast.FuncSignature(
-                    param_list=[
-                        ast.Param(name='n', datatype=datatype_int),
-                    ],
-                ),
-            ],
-            'allocInt': ast.FuncSignature(
-                return_type=datatype.SimpleDataType(
-                    name='Int',
-                    prefix_list=['R'],
-                ),
-            ),
-            'isEqual': std_signature,
-            'isLess': std_signature,
-            'isGreater': std_signature,
-            'minus': std_signature,
-            'plus': std_signature,
-            'multiply': std_signature,
-        }
-        return ident_list
+def _ident_table(ast_, imported_decl_list):
 
     def create_constructor_func(class_decl):
         return ast.FuncSignature(
@@ -64,7 +19,7 @@ def ident_table(ast_):
         )
 
     ident_list = {}
-    for decl in ast_.decl_list:
+    for decl in misc.tolist(imported_decl_list) + ast_.decl_list:
         if isinstance(decl, ast.FuncDecl):
             if decl.name in ident_list:
                 ident_list[decl.name] = misc.tolist(ident_list[decl.name])
@@ -75,8 +30,17 @@ def ident_table(ast_):
                 ]
         elif isinstance(decl, ast.ClassDecl):
             ident_list[decl.name] = create_constructor_func(decl)
-    ident_list.update(standart_funcs())
+    ident_list.update(intrinsics.ident_list())
     return ident_list
 
 
+def ident_table(ast_, imported_decl_list=None):
+    ''' Build simple ident table.
+
+        imported_decl_list - decls of imported modules.
+    '''
+    with instrument.phase('ident_table'):
+        return _ident_table(ast_, imported_decl_list)
+
+
 # vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
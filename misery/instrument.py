@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for copyright and license details
+
+
+'''
+Instrumentation of compiler phases.
+
+Compiler code marks phases with 'with phase(name):' and reports
+counters with count(name, value). Listeners get callbacks
+for all of them. Without listeners phases cost almost nothing.
+'''
+
+
+import collections
+import contextlib
+import time
+import tracemalloc
+
+
+_listeners = []
+
+
+class Listener(object):
+    ''' Base class of instrumentation listeners.
+
+        detail - name of func decl for per decl phases, else None.
+    '''
+
+    def phase_start(self, name, detail):
+        pass
+
+    def phase_end(self, name, detail):
+        pass
+
+    def count(self, name, value):
+        pass
+
+
+def add_listener(listener):
+    _listeners.append(listener)
+
+
+def remove_listener(listener):
+    _listeners.remove(listener)
+
+
+@contextlib.contextmanager
+def listening(listener):
+    ''' Add listener for time of with block. '''
+    add_listener(listener)
+    try:
+        yield listener
+    finally:
+        remove_listener(listener)
+
+
+@contextlib.contextmanager
+def phase(name, detail=None):
+    if not _listeners:
+        yield
+        return
+    listener_list = list(_listeners)
+    for listener in listener_list:
+        listener.phase_start(name, detail)
+    try:
+        yield
+    finally:
+        for listener in reversed(listener_list):
+            listener.phase_end(name, detail)
+
+
+def count(name, value=1):
+    for listener in _listeners:
+        listener.count(name, value)
+
+
+def is_enabled():
+    ''' Check if anybody listens, to skip costly counting. '''
+    return bool(_listeners)
+
+
+def format_phase_report(phase_list):
+    ''' Format phase times, times of same phases are summed. '''
+    phase_times = collections.OrderedDict()
+    for name, elapsed in phase_list:
+        phase_times[name] = phase_times.get(name, 0.0) + elapsed
+    out = ''
+    for name, elapsed in phase_times.items():
+        out += '%-20s %8.3f s\n' % (name, elapsed)
+    total = sum(phase_times.values())
+    out += '%-20s %8.3f s\n' % ('total', total)
+    return out
+
+
+class PhaseTimer(Listener):
+    ''' Collects wall time of outermost compiler phases. '''
+
+    def __init__(self):
+        self.phase_list = []  # [(name, seconds), ...]
+        self._start_times = []
+
+    def phase_start(self, name, detail):
+        self._start_times.append(time.perf_counter())
+
+    def phase_end(self, name, detail):
+        elapsed = time.perf_counter() - self._start_times.pop()
+        # nested phases are parts of outer ones
+        if not self._start_times:
+            self.phase_list.append((name, elapsed))
+
+    def report(self):
+        return format_phase_report(self.phase_list)
+
+
+class _Stat(object):
+
+    def __init__(self):
+        self.calls = 0
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.peak_memory = 0
+
+
+class _Frame(object):
+    ''' Phase being measured. '''
+
+    def __init__(self, name, detail, start_memory):
+        self.name = name
+        self.detail = detail
+        self.start_wall_time = time.perf_counter()
+        self.start_cpu_time = time.process_time()
+        self.start_memory = start_memory
+        self.peak_memory = start_memory  # absolute
+
+
+class Reporter(Listener):
+    ''' Measures wall time, CPU time and peak traced memory
+        of phases and of phases of every func decl.
+
+        Peak memory is measured with tracemalloc, which is
+        started by reporter if it is not running yet.
+    '''
+
+    def __init__(self, trace_memory=True):
+        self.phases = collections.OrderedDict()  # name: _Stat
+        self.decls = collections.OrderedDict()  # (name, detail): _Stat
+        self.counters = collections.OrderedDict()  # name: value
+        self._stack = []
+        self._trace_memory = trace_memory
+        self._started_tracemalloc = False
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    def close(self):
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def _traced_memory(self):
+        if self._trace_memory:
+            return tracemalloc.get_traced_memory()
+        return 0, 0
+
+    def phase_start(self, name, detail):
+        current_memory, peak_memory = self._traced_memory()
+        if self._stack:
+            outer_frame = self._stack[-1]
+            outer_frame.peak_memory = max(outer_frame.peak_memory, peak_memory)
+        if self._trace_memory:
+            tracemalloc.reset_peak()
+        self._stack.append(_Frame(name, detail, current_memory))
+
+    def phase_end(self, name, detail):
+        _, peak_memory = self._traced_memory()
+        frame = self._stack.pop()
+        frame.peak_memory = max(frame.peak_memory, peak_memory)
+        if self._stack:
+            outer_frame = self._stack[-1]
+            outer_frame.peak_memory = max(
+                outer_frame.peak_memory,
+                frame.peak_memory,
+            )
+        if detail is None:
+            stat = self.phases.setdefault(name, _Stat())
+        else:
+            stat = self.decls.setdefault((name, detail), _Stat())
+        stat.calls += 1
+        stat.wall_time += time.perf_counter() - frame.start_wall_time
+        stat.cpu_time += time.process_time() - frame.start_cpu_time
+        stat.peak_memory = max(
+            stat.peak_memory,
+            frame.peak_memory - frame.start_memory,
+        )
+
+    def count(self, name, value):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def report(self, decl_count=10):
+        ''' Phases, slowest decls and counters. '''
+
+        def format_stat(title, stat):
+            return '%-40s %6d %9.3f %9.3f %9.2f\n' % (
+                title,
+                stat.calls,
+                stat.wall_time,
+                stat.cpu_time,
+                stat.peak_memory / 2.0 ** 20,
+            )
+
+        header = '%-40s %6s %9s %9s %9s\n' % (
+            '', 'calls', 'wall, s', 'cpu, s', 'peak, MB')
+        out = 'phase' + header[len('phase'):]
+        for name, stat in self.phases.items():
+            out += format_stat(name, stat)
+        if self.decls:
+            out += '\n'
+            out += 'slowest decls' + header[len('slowest decls'):]
+            decl_list = sorted(
+                self.decls.items(),
+                key=lambda item: -item[1].wall_time,
+            )
+            for (name, detail), stat in decl_list[:decl_count]:
+                out += format_stat(detail + ': ' + name, stat)
+        if self.counters:
+            out += '\n'
+            for name, value in self.counters.items():
+                out += '%-40s %d\n' % (name, value)
+        return out
+
+
+# vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
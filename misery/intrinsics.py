@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for copyright and license details
+
+
+'''
+Builtin funcs known to compiler.
+
+Every intrinsic is declared once here. Its signature goes to
+ident table, its C code goes to generated code, either inline
+as expression or as out-of-line runtime func, and its value
+can be computed at compile time by optimizer.
+'''
+
+
+from misery import (
+    ast,
+    datatype,
+)
+
+
+def wrap_int(value):
+    ''' Int is 32 bit C int, wrap around like generated code does. '''
+    return (value + 2 ** 31) % 2 ** 32 - 2 ** 31
+
+
+class Intrinsic(object):
+    ''' Builtin func.
+
+        param_list - list of (name, datatype) pairs.
+        c_expr - C code of func with {param_name} placeholders.
+        is_inline - c_expr is written at call site
+            instead of call of runtime func.
+        fold - python func computing result from Int args
+            at compile time, None if func can not be folded.
+        has_side_effects - call can not be removed
+            when its result is not used.
+    '''
+
+    def __init__(
+        self,
+        name,
+        param_list=None,
+        return_type=None,
+        c_expr='',
+        is_inline=False,
+        fold=None,
+        has_side_effects=False,
+    ):
+        self.name = name
+        self.param_list = param_list or []
+        self.return_type = return_type
+        self.c_expr = c_expr
+        self.is_inline = is_inline
+        self.fold = fold
+        self.has_side_effects = has_side_effects
+
+    def signature(self):
+        ''' Return new signature, callers may mark it out. '''
+        return ast.FuncSignature(
+            return_type=self.return_type,
+            param_list=[
+                ast.Param(name=name, datatype=datatype_)
+                for name, datatype_ in self.param_list
+            ],
+        )
+
+    def key(self):
+        return _key(self.name, [
+            datatype_ for _, datatype_ in self.param_list])
+
+    def format_c_expr(self, arg_list):
+        ''' Return c_expr with C code of args put in. '''
+        return self.c_expr.format(**dict(zip(
+            [name for name, _ in self.param_list],
+            arg_list,
+        )))
+
+
+def _key(name, datatype_list):
+    return (name,) + tuple(
+        datatype_.name for datatype_ in datatype_list)
+
+
+def _operator(name, c_operator, fold):
+    ''' Int operator, is inlined. '''
+    return Intrinsic(
+        name=name,
+        param_list=[
+            ('a', datatype.int_datatype),
+            ('b', datatype.int_datatype),
+        ],
+        return_type=datatype.int_datatype,
+        c_expr='({a} ' + c_operator + ' {b})',
+        is_inline=True,
+        fold=fold,
+    )
+
+
+intrinsic_list = [
+    # Int constructor
+    Intrinsic(
+        name='Int',
+        param_list=[('n', datatype.int_datatype)],
+        return_type=datatype.int_datatype,
+        c_expr='{n}',
+        is_inline=True,
+        fold=lambda n: n,
+    ),
+    Intrinsic(
+        name='printNewLine',
+        c_expr='printf("\\n")',
+        has_side_effects=True,
+    ),
+    Intrinsic(
+        name='print',
+        param_list=[('s', datatype.string_datatype)],
+        c_expr='printf("%s", {s})',
+        has_side_effects=True,
+    ),
+    Intrinsic(
+        name='print',
+        param_list=[('n', datatype.int_datatype)],
+        c_expr='printf("%d", {n})',
+        has_side_effects=True,
+    ),
+    Intrinsic(
+        name='allocInt',
+        return_type=datatype.SimpleDataType(
+            name='Int',
+            prefix_list=['R'],
+        ),
+        c_expr='(Int*)calloc(1, sizeof(Int))',
+    ),
+    _operator('isEqual', '==', lambda a, b: int(a == b)),
+    _operator('isLess', '<', lambda a, b: int(a < b)),
+    _operator('isGreater', '>', lambda a, b: int(a > b)),
+    _operator('minus', '-', lambda a, b: wrap_int(a - b)),
+    _operator('plus', '+', lambda a, b: wrap_int(a + b)),
+    _operator('multiply', '*', lambda a, b: wrap_int(a * b)),
+]
+
+_intrinsics = dict(
+    (intrinsic.key(), intrinsic) for intrinsic in intrinsic_list)
+
+
+def find(name, signature):
+    ''' Return intrinsic called with signature or None. '''
+    return _intrinsics.get(_key(name, [
+        param.datatype for param in signature.param_list]))
+
+
+def ident_list():
+    ''' Signatures of all intrinsics for ident table. '''
+    ident_list_ = {}
+    for intrinsic in intrinsic_list:
+        name = intrinsic.name  # shortcut
+        if name not in ident_list_:
+            ident_list_[name] = intrinsic.signature()
+        elif isinstance(ident_list_[name], list):
+            ident_list_[name].append(intrinsic.signature())
+        else:
+            ident_list_[name] = [ident_list_[name], intrinsic.signature()]
+    return ident_list_
+
+
+def _c_type(datatype_, by_value):
+    ''' C type of param, references are always pointers. '''
+    if datatype_.prefix_list and 'R' in datatype_.prefix_list:
+        return datatype_.name + '*'
+    if by_value:
+        return datatype_.name
+    return datatype_.name + '*'
+
+
+def _runtime_func(intrinsic, pass_by_value):
+    ''' Return (prototype, body) of C func of intrinsic. '''
+    param_list = [
+        _c_type(datatype_, pass_by_value) + ' ' + name
+        for name, datatype_ in intrinsic.param_list
+    ]
+    if pass_by_value:
+        arg_list = [name for name, _ in intrinsic.param_list]
+    else:
+        arg_list = ['*' + name for name, _ in intrinsic.param_list]
+    c_expr = intrinsic.format_c_expr(arg_list)
+    return_type = intrinsic.return_type  # shortcut
+    mangled_name = '_'.join(
+        [intrinsic.name] +
+        [datatype_.name for _, datatype_ in intrinsic.param_list]
+    )
+    if not return_type:
+        prototype = 'void ' + mangled_name
+        body = c_expr + ';'
+    elif _c_type(return_type, pass_by_value) == return_type.name:
+        prototype = return_type.name + ' ' + mangled_name
+        body = 'return ' + c_expr + ';'
+    else:
+        prototype = 'void ' + mangled_name
+        param_list.insert(
+            0, _c_type(return_type, pass_by_value) + '* __result')
+        body = '*__result = ' + c_expr + ';'
+    prototype += '(' + (', '.join(param_list) or 'void') + ')'
+    return prototype, body
+
+
+def _runtime_intrinsics():
+    return [
+        intrinsic for intrinsic in intrinsic_list
+        if not intrinsic.is_inline
+    ]
+
+
+def runtime_prototypes(pass_by_value=False):
+    ''' C prototypes of intrinsics that are not inlined. '''
+    out = ''
+    for intrinsic in _runtime_intrinsics():
+        prototype, _ = _runtime_func(intrinsic, pass_by_value)
+        out += prototype + ';\n'
+    return out
+
+
+def runtime_funcs(pass_by_value=False):
+    ''' C code of intrinsics that are not inlined.
+
+        pass_by_value - pass and return Int and String
+            by value, not by pointer.
+    '''
+    out = ''
+    for intrinsic in _runtime_intrinsics():
+        prototype, body = _runtime_func(intrinsic, pass_by_value)
+        out += prototype + ' {\n'
+        out += '  ' + body + '\n'
+        out += '}\n'
+        out += '\n'
+    return out
+
+
+# vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
@@ -7,6 +7,45 @@ Miscellaneous classes and funcs.
 '''
 
 
+import os
+import sys
+
+
+_slots_cache = {}
+
+
+def class_slots(class_):
+    ''' Names from __slots__ declared in class_ and its bases. '''
+    try:
+        return _slots_cache[class_]
+    except KeyError:
+        pass
+    slot_names = []
+    for base in reversed(class_.__mro__):
+        slots = base.__dict__.get('__slots__', ())
+        if isinstance(slots, str):
+            slots = (slots,)
+        for name in slots:
+            if name not in ('__dict__', '__weakref__'):
+                slot_names.append(name)
+    _slots_cache[class_] = tuple(slot_names)
+    return _slots_cache[class_]
+
+
+def object_fields(obj):
+    ''' Return list of (name, value) pairs sorted by name.
+
+        Field schema is taken from __slots__, objects
+        without slots are described by their __dict__.
+    '''
+    fields = {}
+    for name in class_slots(type(obj)):
+        if hasattr(obj, name):
+            fields[name] = getattr(obj, name)
+    fields.update(getattr(obj, '__dict__', {}))
+    return sorted(fields.items())
+
+
 class PrettyPrinter(object):
     ''' Prettyprints values. '''
 
@@ -54,21 +93,20 @@ class PrettyPrinter(object):
             return out
 
         def _print_object(obj, indent_level):
+            fields = object_fields(obj)
             out = ''
             out += str(obj.__class__.__name__) + '('
-            if len(obj.__dict__) == 0:
+            if len(fields) == 0:
                 out += ')'
-            elif len(obj.__dict__) > 1:
+            elif len(fields) > 1:
                 out += '\n'
-                for key in sorted(obj.__dict__.keys()):
-                    value = obj.__dict__[key]
+                for key, value in fields:
                     out += next_indent + key + '='
                     out += self.pretty_print(value, indent_level + 1)
                     out += ',' + '\n'
                 out += indent + ')'
             else:
-                for key in obj.__dict__.keys():
-                    value = obj.__dict__[key]
+                for key, value in fields:
                     out += key + '='
                     out += self.pretty_print(value, indent_level + 1) + ')'
             return out
@@ -130,12 +168,9 @@ def flatten_tree(tree):
 
 
 def get_caller_func_name():
-    import inspect
-    classstack = inspect.stack()
-    assert len(classstack) >= 2
-    caller_func = classstack[2]
-    caller_func_name = caller_func[3]
-    return caller_func_name
+    ''' Name of func that called func calling this one. '''
+    # inspect.stack() reads source files of all frames, very slow
+    return sys._getframe(2).f_code.co_name
 
 
 def remove_quotation_marks(s):
@@ -143,6 +178,17 @@ def remove_quotation_marks(s):
     return s[1:-1]
 
 
+def default_cache_dir():
+    ''' Directory for compiler caches. '''
+    if 'MISERY_CACHE_DIR' in os.environ:
+        return os.environ['MISERY_CACHE_DIR']
+    xdg_cache_home = os.environ.get(
+        'XDG_CACHE_HOME',
+        os.path.join(os.path.expanduser('~'), '.cache'),
+    )
+    return os.path.join(xdg_cache_home, 'misery')
+
+
 def tolist(obj):
     if obj is None:
         obj = []
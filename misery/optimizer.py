@@ -0,0 +1,687 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for copyright and license details
+
+
+'''
+Optimizations of marked out ast.
+
+Passes take ast returned by datatype.mark_out_datatypes
+and return new ast, given ast is left untouched.
+'''
+
+
+from misery import (
+    ast,
+    datatype,
+    instrument,
+    intrinsics,
+)
+
+
+# builtin funcs evaluated at compile time
+_folders = dict(
+    (intrinsic.name, intrinsic.fold)
+    for intrinsic in intrinsics.intrinsic_list
+    if intrinsic.fold
+)
+
+# builtin funcs never change their args
+_pure_funcs = frozenset(
+    intrinsic.name for intrinsic in intrinsics.intrinsic_list)
+
+# builtin funcs that can be removed when their result is not used
+_side_effect_free_funcs = frozenset(
+    intrinsic.name for intrinsic in intrinsics.intrinsic_list
+    if not intrinsic.has_side_effects
+)
+
+
+def _iter_stmts(block):
+    ''' Stmts of block and of all nested blocks. '''
+    for stmt in block:
+        yield stmt
+        if isinstance(stmt, ast.If):
+            for nested_stmt in _iter_stmts(stmt.branch_if):
+                yield nested_stmt
+            if stmt.branch_else:
+                for nested_stmt in _iter_stmts(stmt.branch_else):
+                    yield nested_stmt
+        elif isinstance(stmt, ast.For):
+            for nested_stmt in _iter_stmts(stmt.branch):
+                yield nested_stmt
+
+
+def _iter_exprs(expr):
+    ''' expr and all its subexprs. '''
+    yield expr
+    if isinstance(expr, ast.FuncCall):
+        for arg in expr.arg_list:
+            for subexpr in _iter_exprs(arg):
+                yield subexpr
+
+
+def _stmt_exprs(stmt):
+    if isinstance(stmt, ast.FuncCall):
+        return [stmt]
+    elif isinstance(stmt, (ast.VarDecl, ast.Assign)):
+        return [stmt.rvalue_expr]
+    elif isinstance(stmt, ast.Return):
+        return [stmt.expr]
+    elif isinstance(stmt, (ast.If, ast.For)):
+        return [stmt.condition]
+    else:
+        raise Exception('Bad type: ' + str(type(stmt)))
+
+
+def _find_const_vars(body):
+    ''' Return {var name: value} of vars that always hold one Int.
+
+        Var must be declared once with '::=' and Int literal,
+        be never assigned and be used only as arg of pure builtin
+        funcs or as returned value, so nobody can change it
+        through pointer.
+    '''
+    decl_count = {}
+    values = {}
+    unsafe_names = set()
+    for stmt in _iter_stmts(body):
+        if isinstance(stmt, ast.VarDecl):
+            decl_count[stmt.name] = decl_count.get(stmt.name, 0) + 1
+            rvalue_expr = stmt.rvalue_expr
+            if stmt.allocate_memory_on_stack and \
+                    isinstance(rvalue_expr, ast.Number):
+                values[stmt.name] = rvalue_expr.value
+            elif isinstance(rvalue_expr, ast.Ident):
+                unsafe_names.add(rvalue_expr.name)  # alias
+        elif isinstance(stmt, ast.Assign):
+            unsafe_names.add(stmt.name)
+        for expr in _stmt_exprs(stmt):
+            for subexpr in _iter_exprs(expr):
+                if not isinstance(subexpr, ast.FuncCall):
+                    continue
+                if subexpr.called_expr.name in _pure_funcs:
+                    continue
+                for arg in subexpr.arg_list:
+                    if isinstance(arg, ast.Ident):
+                        unsafe_names.add(arg.name)
+    return dict(
+        (name, value) for name, value in values.items()
+        if decl_count[name] == 1 and name not in unsafe_names
+    )
+
+
+def _is_false(func_call):
+    ''' Check if call of builtin func on constants gives 0. '''
+    folder = _folders.get(func_call.called_expr.name)
+    if folder is None:
+        return False
+    arg_list = func_call.arg_list
+    if not all(isinstance(arg, ast.Number) for arg in arg_list):
+        return False
+    return not folder(*[arg.value for arg in arg_list])
+
+
+class _FuncFolder(object):
+    ''' Folds constants in one func. '''
+
+    def __init__(self, func_decl, const_vars, shared_consts):
+        self._func_decl = func_decl
+        self._const_vars = const_vars
+        self._shared_consts = shared_consts  # value: const name
+        self._const_count = len(func_decl.constants)
+        self.is_changed = False
+
+    def _new_number(self, value, is_shared=True):
+        ''' Return Number binded to constant with value.
+
+            Shared constant is used by all folded exprs with same
+            value, so it is made only for args of pure funcs
+            and for copied values.
+        '''
+        fd = self._func_decl  # shortcut
+        if is_shared and value in self._shared_consts:
+            name = self._shared_consts[value]
+        else:
+            name = 'const_' + str(self._const_count)
+            self._const_count += 1
+            fd.constants[name] = ast.Number(value)
+            if is_shared:
+                self._shared_consts[value] = name
+        number = ast.Number(value)
+        number.binded_var_name = name
+        self.is_changed = True
+        return number
+
+    def _fold_ident(self, ident):
+        if ident.name in self._const_vars:
+            return self._new_number(self._const_vars[ident.name])
+        return ident
+
+    def _fold_args(self, func_call):
+        is_pure = func_call.called_expr.name in _pure_funcs
+        arg_list = []
+        for arg in func_call.arg_list:
+            if isinstance(arg, ast.FuncCall):
+                # func may change its arg, so it gets own constant
+                arg = self._fold_expr(arg, is_shared=is_pure)
+            elif isinstance(arg, ast.Ident) and is_pure:
+                arg = self._fold_ident(arg)
+            arg_list.append(arg)
+        func_call = func_call.copy()
+        func_call.arg_list = arg_list
+        return func_call
+
+    def _fold_expr(self, expr, is_shared=True):
+        ''' Return expr or Number with its value. '''
+        if not isinstance(expr, ast.FuncCall):
+            return expr
+        expr = self._fold_args(expr)
+        folder = _folders.get(expr.called_expr.name)
+        if folder is None:
+            return expr
+        if not all(isinstance(arg, ast.Number) for arg in expr.arg_list):
+            return expr
+        return self._new_number(
+            folder(*[arg.value for arg in expr.arg_list]),
+            is_shared,
+        )
+
+    def _fold_stmt(self, stmt):
+        ''' Return list of stmts replacing stmt. '''
+        if isinstance(stmt, ast.FuncCall):
+            stmt = self._fold_expr(stmt)
+            if isinstance(stmt, ast.Number):
+                return []  # result is not used
+        elif isinstance(stmt, ast.VarDecl):
+            stmt = stmt.copy()
+            if stmt.allocate_memory_on_stack:
+                stmt.rvalue_expr = self._fold_expr(stmt.rvalue_expr)
+            elif isinstance(stmt.rvalue_expr, ast.FuncCall):
+                # var points to call result, call must stay
+                stmt.rvalue_expr = self._fold_args(stmt.rvalue_expr)
+        elif isinstance(stmt, ast.Assign):
+            stmt = stmt.copy()
+            stmt.rvalue_expr = self._fold_expr(stmt.rvalue_expr)
+        elif isinstance(stmt, ast.Return):
+            stmt = stmt.copy()
+            if isinstance(stmt.expr, ast.Ident):
+                stmt.expr = self._fold_ident(stmt.expr)
+            else:
+                stmt.expr = self._fold_expr(stmt.expr)
+        elif isinstance(stmt, ast.If):
+            condition = self._fold_expr(stmt.condition)
+            if isinstance(condition, ast.Number):
+                self.is_changed = True
+                if condition.value:
+                    return self.fold_block(stmt.branch_if)
+                return self.fold_block(stmt.branch_else or [])
+            stmt = stmt.copy()
+            stmt.condition = condition
+            stmt.branch_if = self.fold_block(stmt.branch_if)
+            if stmt.branch_else:
+                stmt.branch_else = self.fold_block(stmt.branch_else)
+        elif isinstance(stmt, ast.For):
+            # loop condition is checked by call result
+            condition = self._fold_args(stmt.condition)
+            if _is_false(condition):
+                self.is_changed = True
+                return []
+            stmt = stmt.copy()
+            stmt.condition = condition
+            stmt.branch = self.fold_block(stmt.branch)
+        else:
+            raise Exception('Bad type: ' + str(type(stmt)))
+        return [stmt]
+
+    def fold_block(self, block):
+        out = []
+        for stmt in block:
+            out.extend(self._fold_stmt(stmt))
+        return out
+
+
+def _remove_unused_locals(func_decl):
+    ''' Drop tmp vars and constants of removed exprs. '''
+    used_names = set()
+    for stmt in _iter_stmts(func_decl.body):
+        if isinstance(stmt, ast.VarDecl) and stmt.allocate_memory_on_stack:
+            used_names.add(stmt.binded_var_name)
+        expr_list = _stmt_exprs(stmt)
+        if isinstance(stmt, ast.Return) and stmt.is_tail_call:
+            # call is done by jump, only args are evaluated
+            expr_list = stmt.expr.arg_list
+        for expr in expr_list:
+            for subexpr in _iter_exprs(expr):
+                if not isinstance(subexpr, ast.Ident):
+                    used_names.add(subexpr.binded_var_name)
+    func_decl.tmp_vars = dict(
+        (name, datatype_) for name, datatype_ in func_decl.tmp_vars.items()
+        if name in used_names
+    )
+    func_decl.constants = dict(
+        (name, expr) for name, expr in func_decl.constants.items()
+        if name in used_names
+    )
+
+
+def _remove_var_decls(block, names):
+    ''' Return block without decls of vars with names. '''
+    out = []
+    for stmt in block:
+        if isinstance(stmt, ast.VarDecl) and stmt.name in names:
+            continue
+        elif isinstance(stmt, ast.If):
+            stmt = stmt.copy()
+            stmt.branch_if = _remove_var_decls(stmt.branch_if, names)
+            if stmt.branch_else:
+                stmt.branch_else = _remove_var_decls(
+                    stmt.branch_else, names)
+        elif isinstance(stmt, ast.For):
+            stmt = stmt.copy()
+            stmt.branch = _remove_var_decls(stmt.branch, names)
+        out.append(stmt)
+    return out
+
+
+def _fold_func(func_decl):
+    func_decl = func_decl.copy()
+    func_decl.constants = dict(func_decl.constants)
+    const_vars = {}
+    shared_consts = {}
+    while True:
+        folder = _FuncFolder(func_decl, const_vars, shared_consts)
+        func_decl.body = folder.fold_block(func_decl.body)
+        new_const_vars = _find_const_vars(func_decl.body)
+        if not folder.is_changed and new_const_vars == const_vars:
+            break
+        const_vars = new_const_vars
+    # all uses of these vars are replaced by constants
+    propagated_names = set(const_vars) - _read_var_names(func_decl.body)
+    if propagated_names:
+        func_decl.body = _remove_var_decls(
+            func_decl.body, propagated_names)
+        func_decl.vars = dict(
+            (name, datatype_)
+            for name, datatype_ in func_decl.vars.items()
+            if name not in propagated_names
+        )
+    _remove_unused_locals(func_decl)
+    return func_decl
+
+
+def fold_constants(ast_):
+    ''' Evaluate builtin arithmetic and comparisons of constants.
+
+        Results are propagated through vars holding
+        constants, ifs with constant conditions are pruned.
+    '''
+    with instrument.phase('fold_constants'):
+        folded_ast = ast_.copy()
+        folded_ast.decl_list = []
+        for decl in ast_.decl_list:
+            if isinstance(decl, ast.FuncDecl):
+                with instrument.phase('fold_constants', decl.name):
+                    decl = _fold_func(decl)
+            folded_ast.decl_list.append(decl)
+        return folded_ast
+
+
+def _param_aliases(func_decl):
+    ''' Names of vars pointing to params. '''
+    param_names = set(
+        param.name for param in func_decl.signature.param_list)
+    alias_names = set()
+    stmt_list = list(_iter_stmts(func_decl.body))
+    is_changed = True
+    while is_changed:
+        is_changed = False
+        for stmt in stmt_list:
+            if not isinstance(stmt, ast.VarDecl):
+                continue
+            if stmt.allocate_memory_on_stack:
+                continue
+            rvalue_expr = stmt.rvalue_expr
+            if isinstance(rvalue_expr, ast.Ident) and \
+                    stmt.name not in alias_names and \
+                    rvalue_expr.name in param_names | alias_names:
+                alias_names.add(stmt.name)
+                is_changed = True
+    return alias_names
+
+
+class _TailCallMarker(object):
+    ''' Marks self calls in tail position of one func.
+
+        Tail call reassigns params and jumps to func start.
+        Params are not passed all at once like in real call, so
+        call is marked only if new values of params do not depend
+        on old ones: arg that is ident must be the same param
+        or local var that does not point to params.
+    '''
+
+    def __init__(self, func_decl):
+        self._func_decl = func_decl
+        self._param_names = set(
+            param.name for param in func_decl.signature.param_list)
+        self._alias_names = _param_aliases(func_decl)
+
+    def _is_self_call(self, expr):
+        fd = self._func_decl  # shortcut
+        if not isinstance(expr, ast.FuncCall):
+            return False
+        if expr.called_expr.name != fd.name:
+            return False
+        return [
+            param.datatype for param in expr.signature.param_list
+        ] == [
+            param.datatype for param in fd.signature.param_list
+        ]
+
+    def _is_tail_call(self, stmt):
+        if not self._is_self_call(stmt.expr):
+            return False
+        param_list = self._func_decl.signature.param_list
+        for param, arg in zip(param_list, stmt.expr.arg_list):
+            if not isinstance(arg, ast.Ident):
+                continue
+            if arg.name == param.name:
+                continue
+            if arg.name in self._param_names | self._alias_names:
+                return False
+        return True
+
+    def _mark_stmt(self, stmt):
+        if isinstance(stmt, ast.Return):
+            if self._is_tail_call(stmt):
+                stmt = stmt.copy()
+                stmt.is_tail_call = True
+        elif isinstance(stmt, ast.If):
+            stmt = stmt.copy()
+            stmt.branch_if = self.mark_block(stmt.branch_if)
+            if stmt.branch_else:
+                stmt.branch_else = self.mark_block(stmt.branch_else)
+        elif isinstance(stmt, ast.For):
+            stmt = stmt.copy()
+            stmt.branch = self.mark_block(stmt.branch)
+        return stmt
+
+    def mark_block(self, block):
+        return [self._mark_stmt(stmt) for stmt in block]
+
+
+def _has_scalar_params(func_decl):
+    return all(
+        datatype.is_scalar(param.datatype)
+        for param in func_decl.signature.param_list
+    )
+
+
+def mark_tail_calls(ast_):
+    ''' Mark returns of self calls that can be done as jumps.
+
+        Only funcs with scalar params are changed,
+        generator copies values of their new params.
+    '''
+    with instrument.phase('mark_tail_calls'):
+        marked_ast = ast_.copy()
+        marked_ast.decl_list = []
+        for decl in ast_.decl_list:
+            if isinstance(decl, ast.FuncDecl) and \
+                    _has_scalar_params(decl):
+                decl = decl.copy()
+                decl.body = _TailCallMarker(decl).mark_block(decl.body)
+            marked_ast.decl_list.append(decl)
+        return marked_ast
+
+
+def _discard_expr(expr):
+    ''' Return stmts keeping side effects of expr
+        which value is not used.
+    '''
+    if not isinstance(expr, ast.FuncCall):
+        return []
+    if expr.called_expr.name not in _side_effect_free_funcs:
+        return [expr]
+    stmt_list = []
+    for arg in expr.arg_list:
+        stmt_list.extend(_discard_expr(arg))
+    return stmt_list
+
+
+def _read_var_names(body):
+    ''' Names of vars used anywhere except their own declaration. '''
+    names = set()
+    for stmt in _iter_stmts(body):
+        if isinstance(stmt, ast.Assign):
+            names.add(stmt.name)
+        for expr in _stmt_exprs(stmt):
+            for subexpr in _iter_exprs(expr):
+                if isinstance(subexpr, ast.Ident):
+                    names.add(subexpr.name)
+    return names
+
+
+class _DeadCodeEliminator(object):
+    ''' Removes dead code of one func. '''
+
+    def __init__(self, dead_var_names):
+        self._dead_var_names = dead_var_names
+        self.is_changed = False
+
+    def _eliminate_stmt(self, stmt):
+        ''' Return list of stmts replacing stmt. '''
+        if isinstance(stmt, ast.FuncCall):
+            stmt_list = _discard_expr(stmt)
+            if stmt_list != [stmt]:
+                self.is_changed = True
+            return stmt_list
+        elif isinstance(stmt, ast.VarDecl):
+            if stmt.name in self._dead_var_names:
+                self.is_changed = True
+                return _discard_expr(stmt.rvalue_expr)
+        elif isinstance(stmt, ast.If):
+            stmt = stmt.copy()
+            stmt.branch_if = self.eliminate_block(stmt.branch_if)
+            if stmt.branch_else:
+                stmt.branch_else = self.eliminate_block(stmt.branch_else)
+        elif isinstance(stmt, ast.For):
+            stmt = stmt.copy()
+            stmt.branch = self.eliminate_block(stmt.branch)
+        return [stmt]
+
+    def eliminate_block(self, block):
+        out = []
+        for stmt in block:
+            out.extend(self._eliminate_stmt(stmt))
+        return out
+
+
+def _eliminate_dead_code_in_func(func_decl):
+    func_decl = func_decl.copy()
+    while True:
+        read_var_names = _read_var_names(func_decl.body)
+        eliminator = _DeadCodeEliminator(
+            set(func_decl.vars) - read_var_names)
+        func_decl.body = eliminator.eliminate_block(func_decl.body)
+        if not eliminator.is_changed:
+            break
+    declared_var_names = set(
+        stmt.name for stmt in _iter_stmts(func_decl.body)
+        if isinstance(stmt, ast.VarDecl)
+    )
+    func_decl.vars = dict(
+        (name, datatype_) for name, datatype_ in func_decl.vars.items()
+        if name in declared_var_names
+    )
+    _remove_unused_locals(func_decl)
+    return func_decl
+
+
+def eliminate_dead_code(ast_):
+    ''' Remove unused vars, calls of builtin funcs without side
+        effects which results are not used and then tmp vars and
+        constants nobody uses.
+    '''
+    with instrument.phase('eliminate_dead_code'):
+        eliminated_ast = ast_.copy()
+        eliminated_ast.decl_list = []
+        for decl in ast_.decl_list:
+            if isinstance(decl, ast.FuncDecl):
+                with instrument.phase('eliminate_dead_code', decl.name):
+                    decl = _eliminate_dead_code_in_func(decl)
+            eliminated_ast.decl_list.append(decl)
+        return eliminated_ast
+
+
+def _is_reference(datatype_):
+    return bool(datatype_.prefix_list) and 'R' in datatype_.prefix_list
+
+
+def _find_pinned_tmps(func_decl):
+    ''' Names of tmp vars living longer than their stmt.
+
+        Var points to tmp var with its value, reference
+        returned by func may point to tmp var of any arg.
+    '''
+    pinned_names = set()
+    for stmt in _iter_stmts(func_decl.body):
+        if isinstance(stmt, ast.VarDecl):
+            if stmt.allocate_memory_on_stack:
+                pinned_names.add(stmt.binded_var_name)
+            elif isinstance(stmt.rvalue_expr, ast.FuncCall):
+                pinned_names.add(stmt.rvalue_expr.binded_var_name)
+        for expr in _stmt_exprs(stmt):
+            for subexpr in _iter_exprs(expr):
+                if not isinstance(subexpr, ast.FuncCall):
+                    continue
+                name = subexpr.binded_var_name
+                if name not in func_decl.tmp_vars or \
+                        not _is_reference(func_decl.tmp_vars[name]):
+                    continue
+                for arg_expr in _iter_exprs(subexpr):
+                    if isinstance(arg_expr, ast.FuncCall):
+                        pinned_names.add(arg_expr.binded_var_name)
+    return pinned_names
+
+
+class _TmpSlotAllocator(object):
+    ''' Puts tmp vars of one func to shared slots.
+
+        Tmp var that is not pinned lives from call giving it
+        till call or stmt using it, all in one stmt, so after
+        that its slot is free for next tmp var of same type.
+        Call result never shares slot with its args.
+    '''
+
+    def __init__(self, func_decl):
+        self._tmp_vars = func_decl.tmp_vars
+        self._pinned_names = _find_pinned_tmps(func_decl)
+        self._free_slots = {}  # datatype: names of free slots
+        self.slots = {}  # slot name: datatype
+
+    def _allocate(self, name):
+        datatype_ = self._tmp_vars[name]
+        if name in self._pinned_names:
+            self.slots[name] = datatype_
+            return name
+        free_slots = self._free_slots.setdefault(datatype_, [])
+        if free_slots:
+            return free_slots.pop()
+        self.slots[name] = datatype_
+        return name
+
+    def _free(self, expr):
+        if not isinstance(expr, ast.FuncCall):
+            return
+        name = expr.binded_var_name
+        if name is None or name in self._pinned_names:
+            return
+        self._free_slots[self.slots[name]].append(name)
+
+    def _allocate_args(self, func_call):
+        func_call = func_call.copy()
+        func_call.arg_list = [
+            self._allocate_expr(arg) for arg in func_call.arg_list]
+        return func_call
+
+    def _free_args(self, func_call):
+        for arg in func_call.arg_list:
+            self._free(arg)
+
+    def _allocate_expr(self, expr):
+        ''' Return copy of expr with tmp vars renamed to slots. '''
+        if not isinstance(expr, ast.FuncCall):
+            return expr
+        expr = self._allocate_args(expr)
+        if expr.binded_var_name is not None:
+            expr.binded_var_name = self._allocate(expr.binded_var_name)
+        self._free_args(expr)
+        return expr
+
+    def _allocate_stmt(self, stmt):
+        if isinstance(stmt, ast.FuncCall):
+            stmt = self._allocate_expr(stmt)
+            self._free(stmt)
+            return stmt
+        stmt = stmt.copy()
+        if isinstance(stmt, ast.VarDecl):
+            if stmt.allocate_memory_on_stack:
+                stmt.binded_var_name = self._allocate(stmt.binded_var_name)
+            stmt.rvalue_expr = self._allocate_expr(stmt.rvalue_expr)
+            self._free(stmt.rvalue_expr)
+        elif isinstance(stmt, ast.Assign):
+            stmt.rvalue_expr = self._allocate_expr(stmt.rvalue_expr)
+            self._free(stmt.rvalue_expr)
+        elif isinstance(stmt, ast.Return):
+            if stmt.is_tail_call:
+                # call is done by jump, only args are evaluated
+                stmt.expr = self._allocate_args(stmt.expr)
+                self._free_args(stmt.expr)
+            else:
+                stmt.expr = self._allocate_expr(stmt.expr)
+                self._free(stmt.expr)
+        elif isinstance(stmt, ast.If):
+            stmt.condition = self._allocate_expr(stmt.condition)
+            self._free(stmt.condition)
+            stmt.branch_if = self.allocate_block(stmt.branch_if)
+            if stmt.branch_else:
+                stmt.branch_else = self.allocate_block(stmt.branch_else)
+        elif isinstance(stmt, ast.For):
+            stmt.condition = self._allocate_expr(stmt.condition)
+            self._free(stmt.condition)
+            stmt.branch = self.allocate_block(stmt.branch)
+        else:
+            raise Exception('Bad type: ' + str(type(stmt)))
+        return stmt
+
+    def allocate_block(self, block):
+        return [self._allocate_stmt(stmt) for stmt in block]
+
+
+def reuse_tmp_slots(ast_):
+    ''' Give tmp vars with not overlapping lifetimes
+        and same type one C var.
+    '''
+    with instrument.phase('reuse_tmp_slots'):
+        allocated_ast = ast_.copy()
+        allocated_ast.decl_list = []
+        for decl in ast_.decl_list:
+            if isinstance(decl, ast.FuncDecl):
+                with instrument.phase('reuse_tmp_slots', decl.name):
+                    allocator = _TmpSlotAllocator(decl)
+                    decl = decl.copy()
+                    decl.body = allocator.allocate_block(decl.body)
+                    decl.tmp_vars = allocator.slots
+            allocated_ast.decl_list.append(decl)
+        return allocated_ast
+
+
+def optimize(ast_):
+    ''' Run all optimization passes. '''
+    ast_ = fold_constants(ast_)
+    ast_ = mark_tail_calls(ast_)
+    ast_ = eliminate_dead_code(ast_)
+    return reuse_tmp_slots(ast_)
+
+
+# vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
@@ -2,6 +2,12 @@
 # See LICENSE file for copyright and license details
 
 
+import hashlib
+import os
+import pickle
+import re
+import sys
+import types
 from ply import (
     yacc,
     lex,
@@ -10,6 +16,7 @@ from misery import (
     ast,
     misc,
     datatype,
+    instrument,
 )
 
 
@@ -54,6 +61,25 @@ def find_column(input_string, lexem_pos):
     return lexem_pos - last_cr_pos
 
 
+def _lex_error_message(input_string, lineno, column):
+    lines = input_string.split('\n')
+    line = lines[lineno - 1]
+    message = (
+        '\n' +
+        (
+            'filename:[%(lineno)d:%(column)d: '
+            'Lexer error: Illegal character...'
+        ) % {
+            'lineno': lineno - 1,
+            'column': column - 1,
+        } +
+        '\n' +
+        '  ' + line + '\n' +
+        '  ' + (' ' * (column)) + '^' + '\n'
+    )
+    return message
+
+
 def make_lexer():
 
     t_ARROW = r'->'
@@ -91,28 +117,342 @@ def make_lexer():
 
     def t_error(t):
         column = find_column(t.lexer.lexdata, t.lexpos)
-        lines = t.lexer.lexdata.split('\n')
-        line = lines[t.lineno - 1]
-        message = (
-            '\n' +
-            (
-                'filename:[%(lineno)d:%(column)d: '
-                'Lexer error: Illegal character...'
-            ) % {
-                'lineno': t.lineno - 1,
-                'column': column - 1,
-            } +
-            '\n' +
-            '  ' + line + '\n' +
-            '  ' + (' ' * (column)) + '^' + '\n'
+        raise Exception(
+            _lex_error_message(t.lexer.lexdata, t.lineno, column),
         )
-        raise Exception(message)
 
     # Build the lexer from my environment and return it
     return lex.lex()
 
 
-def make_parser():
+_IDENT_START = 0
+_DIGIT = 1
+_MINUS = 2
+_NEWLINE = 3
+_SPACE = 4
+_HASH = 5
+_QUOTE = 6
+_COLON = 7
+_PUNCT = 8
+_OTHER = 9
+
+
+_punct_tokens = {
+    '=': 'ASSIGN',
+    '(': 'LPAREN',
+    ')': 'RPAREN',
+    '{': 'LCURLY',
+    '}': 'RCURLY',
+    '<': 'LT',
+    '>': 'GT',
+    ',': 'COMMA',
+}
+
+
+def _make_char_classes():
+    char_classes = {}
+    for char in 'abcdefghijklmnopqrstuvwxyz':
+        char_classes[char] = _IDENT_START
+        char_classes[char.upper()] = _IDENT_START
+    char_classes['_'] = _IDENT_START
+    for char in '0123456789':
+        char_classes[char] = _DIGIT
+    char_classes['-'] = _MINUS
+    char_classes['\n'] = _NEWLINE
+    char_classes[' '] = _SPACE
+    char_classes['\t'] = _SPACE
+    char_classes['#'] = _HASH
+    char_classes['"'] = _QUOTE
+    char_classes[':'] = _COLON
+    for char in _punct_tokens.keys():
+        char_classes[char] = _PUNCT
+    return char_classes
+
+
+_char_classes = _make_char_classes()
+
+_ident_re = re.compile(r'[a-zA-Z_][a-zA-Z0-9_]*')
+
+_number_re = re.compile(r'-?\d+')
+
+_spaces_re = re.compile(r'[ \t]+')
+
+_newlines_re = re.compile(r'\n[\n \t]*')
+
+
+def _scan(input_string):
+    ''' Split input_string to tokens in one pass.
+
+        Returns (token_list, error_message). Each token is a tuple
+        (type, value, lineno, lexpos, column). On illegal character
+        scanning stops and error_message is set.
+    '''
+    token_list = []
+    append = token_list.append
+    get_char_class = _char_classes.get
+    get_reserved = reserved.get
+    punct_tokens = _punct_tokens
+    ident_match = _ident_re.match
+    spaces_match = _spaces_re.match
+    intern = sys.intern
+    end = len(input_string)
+    pos = 0
+    lineno = 1
+    line_start = 0
+    while pos < end:
+        char = input_string[pos]
+        char_class = get_char_class(char, _OTHER)
+        if char_class == _SPACE:
+            pos = spaces_match(input_string, pos).end()
+        elif char_class == _IDENT_START:
+            stop = ident_match(input_string, pos).end()
+            value = input_string[pos:stop]
+            type_ = get_reserved(value)
+            if type_ is None:
+                type_ = 'IDENT'
+                value = intern(value)
+            append((type_, value, lineno, pos, pos - line_start))
+            pos = stop
+        elif char_class == _PUNCT:
+            append((punct_tokens[char], char, lineno, pos, pos - line_start))
+            pos += 1
+        elif char_class == _NEWLINE:
+            # newlines together with following indentation
+            stop = _newlines_re.match(input_string, pos).end()
+            lineno += input_string.count('\n', pos, stop)
+            line_start = input_string.rfind('\n', pos, stop) + 1
+            pos = stop
+        elif char_class == _COLON:
+            if input_string.startswith('::=', pos):
+                type_, value = 'DOUBLECOLONASSIGN', '::='
+            elif input_string.startswith(':=', pos):
+                type_, value = 'COLONASSIGN', ':='
+            else:
+                type_, value = 'COLON', ':'
+            append((type_, value, lineno, pos, pos - line_start))
+            pos += len(value)
+        elif char_class == _QUOTE:
+            stop = input_string.find('"', pos + 1) + 1
+            if stop == 0:
+                break
+            value = input_string[pos:stop]
+            append(('STRING', value, lineno, pos, pos - line_start))
+            last_newline_pos = input_string.rfind('\n', pos, stop)
+            if last_newline_pos != -1:
+                # strings do not change lineno, as in PLY lexer
+                line_start = last_newline_pos + 1
+            pos = stop
+        elif char_class == _HASH:
+            pos = input_string.find('\n', pos)
+            if pos == -1:
+                pos = end
+        else:
+            if char_class == _MINUS and input_string.startswith('->', pos):
+                append(('ARROW', '->', lineno, pos, pos - line_start))
+                pos += 2
+                continue
+            match = _number_re.match(input_string, pos)
+            if not match:
+                break
+            value = int(match.group())
+            append(('NUMBER', value, lineno, pos, pos - line_start))
+            pos = match.end()
+    if pos < end:
+        return token_list, _lex_error_message(
+            input_string,
+            lineno,
+            pos - line_start,
+        )
+    return token_list, None
+
+
+def scan(input_string):
+    ''' Return list of (type, value, lineno, lexpos, column) tuples. '''
+    token_list, error_message = _scan(input_string)
+    if error_message:
+        raise Exception(error_message)
+    return token_list
+
+
+class Token(object):
+    ''' Compact token, compatible with ply.lex.LexToken. '''
+
+    __slots__ = ('type', 'value', 'lineno', 'lexpos', 'column', 'lexer')
+
+    def __init__(self, type_, value, lineno, lexpos, column):
+        self.type = type_
+        self.value = value
+        self.lineno = lineno
+        self.lexpos = lexpos
+        self.column = column
+
+    def __repr__(self):
+        return 'Token(%s,%r,%d,%d)' % (
+            self.type,
+            self.value,
+            self.lineno,
+            self.lexpos,
+        )
+
+
+class FastLexer(object):
+    ''' Hand-written lexer with the interface of make_lexer() lexer.
+
+        Input is scanned at once by _scan(), lexer error is raised
+        when parser asks for token at illegal character position.
+    '''
+
+    def __init__(self):
+        self.lexdata = ''
+        self.lexpos = 0
+        self.lineno = 1
+        self._token_list = []
+        self._index = 0
+        self._error_message = None
+
+    def input(self, input_string):
+        self.lexdata = input_string
+        self.lexpos = 0
+        self.lineno = 1
+        self._token_list, self._error_message = _scan(input_string)
+        self._index = 0
+
+    def token(self):
+        if self._index < len(self._token_list):
+            type_, value, lineno, lexpos, column = \
+                self._token_list[self._index]
+            self._index += 1
+            self.lineno = lineno
+            self.lexpos = lexpos
+            return Token(type_, value, lineno, lexpos, column)
+        if self._error_message:
+            raise Exception(self._error_message)
+        return None
+
+    def clone(self):
+        return FastLexer()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        token = self.token()
+        if token is None:
+            raise StopIteration
+        return token
+
+
+def _parse_error_message(input_string, value, lineno, column):
+    toklen = len(str(value))
+    lines = input_string.split('\n')
+    line = lines[lineno - 1]
+    message = (
+        '\n' +
+        (
+            'filename:%(lineno)d:%(column)d: '
+            'Parser error: unexpected token '
+        ) % {
+            'lineno': lineno - 1,
+            'column': column - 1,
+        } +
+        '\n' +
+        '  ' + line + '\n' +
+        '  ' + (' ' * column) + ('^' * toklen) + '\n'
+    )
+    return message
+
+
+def _end_of_input_error_message():
+    return '\nfilename: Parser error: unexpected end of input\n'
+
+
+class _GrammarModule(object):
+    ''' Namespace with grammar rules for yacc() reflection. '''
+
+    def __init__(self, rules):
+        self.__dict__.update(rules)
+        self.tokens = tokens
+
+
+def grammar_hash(rules):
+    ''' Hash of grammar rules, tokens and yacc table version. '''
+    hasher = hashlib.sha1()
+    hasher.update(yacc.__tabversion__.encode('utf-8'))
+    hasher.update(' '.join(tokens).encode('utf-8'))
+    for name in sorted(rules.keys()):
+        hasher.update(name.encode('utf-8'))
+        hasher.update((rules[name].__doc__ or '').encode('utf-8'))
+    return hasher.hexdigest()
+
+
+def _load_tables(filename):
+    ''' Return LR tables pickled by yacc as table module.
+
+        None is returned if file is missing, broken
+        or written by other version of yacc.
+    '''
+    tables = types.ModuleType('parsetab')
+    tables.__file__ = filename
+    try:
+        with open(filename, 'rb') as file_:
+            # same order as in yacc.LRTable.pickle_table
+            tables._tabversion = pickle.load(file_)
+            tables._lr_method = pickle.load(file_)
+            tables._lr_signature = pickle.load(file_)
+            tables._lr_action = pickle.load(file_)
+            tables._lr_goto = pickle.load(file_)
+            tables._lr_productions = pickle.load(file_)
+    except Exception:
+        return None
+    if tables._tabversion != yacc.__tabversion__:
+        return None
+    return tables
+
+
+def _make_cached_parser(module, cache_dir):
+    ''' Build parser in optimized mode, load LR tables from cache_dir. '''
+    options = {
+        'module': module,
+        'debug': False,
+        'write_tables': False,
+        'optimize': True,
+        'errorlog': yacc.NullLogger(),
+    }
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+    except OSError:
+        return yacc.yacc(**options)
+    rules = dict(
+        (name, value) for name, value in module.__dict__.items()
+        if name.startswith('p_')
+    )
+    filename = os.path.join(
+        cache_dir,
+        'parsetab-' + grammar_hash(rules) + '.pickle',
+    )
+    tables = _load_tables(filename)
+    if tables is not None:
+        try:
+            return yacc.yacc(tabmodule=tables, **options)
+        except Exception:
+            pass  # broken tables, rebuild them
+    tmp_filename = filename + '.' + str(os.getpid()) + '.tmp'
+    parser = yacc.yacc(picklefile=tmp_filename, **options)
+    try:
+        os.replace(tmp_filename, filename)
+    except OSError:
+        pass
+    return parser
+
+
+def make_parser(cache_dir=None):
+    ''' Build parser.
+
+        Without cache_dir tables are written to parsetab.py as usual.
+        With cache_dir parser is built in optimized no-write mode
+        and LR tables are cached in cache_dir keyed by grammar hash.
+    '''
 
     def p_module(p):
         'module : import_section decl_list'
@@ -345,26 +685,299 @@ def make_parser():
         p[0] = p[1]
 
     def p_error(p):
-        toklen = len(str(p.value))
+        if p is None:
+            raise Exception(_end_of_input_error_message())
         column = find_column(p.lexer.lexdata, p.lexpos)
-        lines = p.lexer.lexdata.split('\n')
-        line = lines[p.lineno - 1]
-        message = (
-            '\n' +
-            (
-                'filename:%(lineno)d:%(column)d: '
-                'Parser error: unexpected token '
-            ) % {
-                'lineno': p.lineno - 1,
-                'column': column - 1,
-            } +
-            '\n' +
-            '  ' + line + '\n' +
-            '  ' + (' ' * column) + ('^' * toklen) + '\n'
+        raise Exception(
+            _parse_error_message(p.lexer.lexdata, p.value, p.lineno, column),
         )
-        raise Exception(message)
 
-    parser = yacc.yacc()
-    return parser
+    rules = dict(
+        (name, value) for name, value in locals().items()
+        if name.startswith('p_')
+    )
+    module = _GrammarModule(rules)
+    if cache_dir is None:
+        return yacc.yacc(module=module)
+    return _make_cached_parser(module, cache_dir)
+
+
+class Session(object):
+    ''' Lexer and parser built once and shared by many compilations. '''
+
+    def __init__(self, cache_dir=None):
+        if cache_dir is None:
+            cache_dir = misc.default_cache_dir()
+        self.cache_dir = cache_dir
+        self._lexer = make_lexer()
+        self._parser = make_parser(cache_dir=cache_dir)
+
+    def make_lexer(self):
+        ''' Return fresh lexer, cloned from prebuilt one. '''
+        return self._lexer.clone()
+
+    def parse(self, input_string, lexer=None):
+        if lexer is None:
+            lexer = self.make_lexer()
+        return self._parser.parse(input_string, lexer=lexer)
+
+
+class _DescentParser(object):
+    ''' Recursive descent parser, builds the same AST as make_parser().
+
+        Works on scan() tuples directly, no tables are needed.
+    '''
+
+    _decl_start = ('FUNC', 'CLASS', 'CONST')
+    _expr_start = ('IDENT', 'STRING', 'NUMBER')
+    _stmt_start = ('IDENT', 'STRING', 'NUMBER', 'LCURLY', 'IF', 'FOR')
+
+    def __init__(self, input_string):
+        self._input_string = input_string
+        with instrument.phase('lex'):
+            self._token_list, self._lex_error_message = _scan(input_string)
+        self._type_list = [token[0] for token in self._token_list]
+        if self._lex_error_message:
+            self._type_list.append('$error')
+        else:
+            self._type_list.append('$end')
+        self._pos = 0
+
+    def _type(self):
+        return self._type_list[self._pos]
+
+    def _error(self):
+        if self._pos == len(self._token_list):
+            if self._lex_error_message:
+                raise Exception(self._lex_error_message)
+            raise Exception(_end_of_input_error_message())
+        type_, value, lineno, lexpos, column = self._token_list[self._pos]
+        raise Exception(_parse_error_message(
+            self._input_string,
+            value,
+            lineno,
+            column,
+        ))
+
+    def _expect(self, type_):
+        ''' Consume token of given type, return its value. '''
+        if self._type_list[self._pos] != type_:
+            self._error()
+        value = self._token_list[self._pos][1]
+        self._pos += 1
+        return value
+
+    def _accept(self, type_):
+        ''' Consume token if it has given type. '''
+        if self._type_list[self._pos] == type_:
+            self._pos += 1
+            return True
+        return False
+
+    def parse_module(self):
+        import_list = None
+        if self._accept('IMPORT'):
+            self._expect('LCURLY')
+            import_list = []
+            while self._type() == 'IDENT':
+                import_list.append(self._expect('IDENT'))
+            self._expect('RCURLY')
+        decl_list = self._decl_list()
+        if self._type() != '$end':
+            self._error()
+        return ast.Module(import_list=import_list, decl_list=decl_list)
+
+    def _decl_list(self):
+        decl_list = []
+        while self._type() in self._decl_start:
+            decl_list.append(self._decl())
+        return decl_list
+
+    def _decl(self):
+        if self._accept('FUNC'):
+            name = self._expect('IDENT')
+            signature = self._func_signature()
+            return ast.FuncDecl(
+                name=name,
+                signature=signature,
+                body=self._block(),
+            )
+        elif self._accept('CLASS'):
+            name = self._expect('IDENT')
+            self._expect('LCURLY')
+            field_list = []
+            if self._accept('STORE'):
+                self._expect('LCURLY')
+                field_list.append(self._field())
+                while self._type() == 'IDENT':
+                    field_list.append(self._field())
+                self._expect('RCURLY')
+            decl_list = []
+            if self._accept('BIND'):
+                self._expect('LCURLY')
+                decl_list = self._decl_list()
+                self._expect('RCURLY')
+            self._expect('RCURLY')
+            return ast.ClassDecl(
+                name=name,
+                field_list=field_list,
+                decl_list=decl_list,
+            )
+        else:
+            self._expect('CONST')
+            name = self._expect('IDENT')
+            datatype_ = self._datatype()
+            self._expect('COLONASSIGN')
+            return ast.ConstDecl(
+                name=name,
+                datatype=datatype_,
+                expr=self._expr(),
+            )
+
+    def _func_signature(self):
+        generic_param_list = None
+        if self._accept('LT'):
+            generic_param_list = [self._expect('IDENT')]
+            self._expect('GT')
+        param_list = []
+        if self._accept('LPAREN'):
+            # first param is optional, same as in LALR grammar
+            if self._type() == 'IDENT':
+                param_list.append(self._param())
+            while self._accept('COMMA'):
+                param_list.append(self._param())
+            self._expect('RPAREN')
+        return_type = None
+        if self._accept('ARROW'):
+            return_type = self._datatype()
+        return ast.FuncSignature(
+            param_list=param_list,
+            generic_param_list=generic_param_list,
+            return_type=return_type,
+        )
+
+    def _datatype(self):
+        name = self._expect('IDENT')
+        if self._accept('COLON'):
+            return datatype.SimpleDataType(
+                name=self._expect('IDENT'),
+                prefix_list=list(name),
+            )
+        return datatype.SimpleDataType(name=name)
+
+    def _field(self):
+        name = self._expect('IDENT')
+        return ast.Field(name=name, datatype=self._datatype())
+
+    def _param(self):
+        name = self._expect('IDENT')
+        return ast.Param(name=name, datatype=self._datatype())
+
+    def _block(self):
+        self._expect('LCURLY')
+        stmt_list = []
+        while self._type() in self._stmt_start:
+            stmt_list.append(self._stmt())
+        if self._accept('RETURN'):
+            if self._type() == 'RCURLY':
+                stmt_list.append(ast.Return(expr=None))
+            else:
+                stmt_list.append(ast.Return(expr=self._expr()))
+        self._expect('RCURLY')
+        return stmt_list
+
+    def _stmt(self):
+        type_ = self._type()
+        if type_ == 'LCURLY':
+            return self._block()
+        elif type_ == 'IF':
+            self._pos += 1
+            condition = self._expr()
+            branch_if = self._block()
+            if self._accept('ELSE'):
+                return ast.If(
+                    condition=condition,
+                    branch_if=branch_if,
+                    branch_else=self._block(),
+                )
+            return ast.If(condition=condition, branch_if=branch_if)
+        elif type_ == 'FOR':
+            self._pos += 1
+            condition = self._expr()
+            return ast.For(condition=condition, branch=self._block())
+        elif type_ == 'IDENT':
+            next_type = self._type_list[self._pos + 1]
+            if next_type == 'COLONASSIGN':
+                name = self._expect('IDENT')
+                self._pos += 1
+                return ast.VarDecl(name=name, expr=self._expr())
+            elif next_type == 'DOUBLECOLONASSIGN':
+                name = self._expect('IDENT')
+                self._pos += 1
+                return ast.VarDecl(
+                    name=name,
+                    expr=self._expr(),
+                    allocate_memory_on_stack=True,
+                )
+            elif next_type == 'ASSIGN':
+                name = self._expect('IDENT')
+                self._pos += 1
+                return ast.Assign(name=name, expr=self._expr())
+        expr = self._expr()
+        if not isinstance(expr, ast.FuncCall):
+            self._error()
+        return expr
+
+    def _expr(self):
+        type_ = self._type()
+        if type_ == 'IDENT':
+            expr = ast.Ident(name=self._expect('IDENT'))
+        elif type_ == 'NUMBER':
+            expr = ast.Number(value=self._expect('NUMBER'))
+        elif type_ == 'STRING':
+            expr = ast.String(
+                value=misc.remove_quotation_marks(self._expect('STRING')),
+            )
+        else:
+            self._error()
+        while self._accept('LPAREN'):
+            arg_list = []
+            while self._type() in self._expr_start:
+                arg_list.append(self._expr())
+            self._expect('RPAREN')
+            expr = ast.FuncCall(expr=expr, arg_list=arg_list)
+        return expr
+
+
+_session = None
+
+
+def get_session(cache_dir=None):
+    ''' Return process-wide Session, create it on first call.
+
+        Session with other cache_dir replaces current one,
+        None means cache dir of current Session or default one.
+    '''
+    global _session
+    if _session is None or (
+            cache_dir is not None and cache_dir != _session.cache_dir):
+        _session = Session(cache_dir=cache_dir)
+    return _session
+
+
+def parse(input_string, backend='ply'):
+    ''' Parse input_string to ast.Module.
+
+        backend: 'ply' - LALR parser from shared Session,
+                 'descent' - hand-written recursive descent parser.
+    '''
+    with instrument.phase('parse'):
+        if backend == 'ply':
+            return get_session().parse(input_string)
+        elif backend == 'descent':
+            return _DescentParser(input_string).parse_module()
+        else:
+            raise Exception('Bad parser backend: ' + str(backend))
+
 
 # vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
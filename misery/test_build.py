@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for copyright and license details
+
+
+''' Test 'build' module. '''
+
+
+import os
+import subprocess
+import tempfile
+import unittest
+from misery import (
+    build,
+    driver,
+    instrument,
+    parse,
+    testutil,
+)
+
+
+def setUpModule():
+    testutil.use_tmp_cache_dir()
+
+
+_MODULES = {
+    'main': '''
+        import { math }
+        func start {
+          print(triple(plus(1 2)))
+          printNewLine()
+        }
+    ''',
+    'math': '''
+        import { base }
+        func triple (n Int) -> Int {
+          return multiply(n one())
+        }
+    ''',
+    'base': '''
+        func one -> Int {
+          return 3
+        }
+    ''',
+}
+
+
+class TestInterfaceFingerprint(unittest.TestCase):
+
+    def _fingerprint(self, input_string):
+        return build.interface_fingerprint(parse.parse(input_string))
+
+    def test_func_body_is_not_interface(self):
+        self.assertEqual(
+            self._fingerprint('func f -> Int { return 1 }'),
+            self._fingerprint('func f -> Int { return 2 }'),
+        )
+
+    def test_signature_is_interface(self):
+        self.assertNotEqual(
+            self._fingerprint('func f -> Int { return 1 }'),
+            self._fingerprint('func f (n Int) -> Int { return 1 }'),
+        )
+
+
+class TestBuilder(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp_dir.cleanup)
+        self._src_dir = self._path('src')
+        self._lib_dir = self._path('lib')
+        os.mkdir(self._src_dir)
+        os.mkdir(self._lib_dir)
+        self._write_module('main', _MODULES['main'])
+        self._write_module('math', _MODULES['math'])
+        self._write_module('base', _MODULES['base'], self._lib_dir)
+
+    def _path(self, file_name):
+        return os.path.join(self._tmp_dir.name, file_name)
+
+    def _write_module(self, name, source, dir_name=None):
+        file_name = os.path.join(dir_name or self._src_dir, name + '.mis')
+        with open(file_name, 'w') as file_:
+            file_.write(source)
+
+    def _build(self):
+        ''' Return names of rebuilt modules. '''
+        builder = build.Builder(
+            self._path('build'),
+            search_path=[self._lib_dir],
+        )
+        builder.build(os.path.join(self._src_dir, 'main.mis'))
+        return builder.rebuilt_module_names
+
+    def test_first_build_translates_modules_in_import_order(self):
+        self.assertEqual(['base', 'math', 'main'], self._build())
+
+    def test_nothing_changed(self):
+        self._build()
+        self.assertEqual([], self._build())
+
+    def test_func_body_changed(self):
+        self._build()
+        self._write_module(
+            'base',
+            _MODULES['base'].replace('3', '4'),
+            self._lib_dir,
+        )
+        self.assertEqual(['base'], self._build())
+
+    def test_interface_changed(self):
+        self._build()
+        self._write_module(
+            'base',
+            _MODULES['base'] + 'func two -> Int { return 2 }\n',
+            self._lib_dir,
+        )
+        # 'main' does not import 'base'
+        self.assertEqual(['base', 'math'], self._build())
+
+    def test_unchanged_imports_are_not_parsed(self):
+        self._build()
+        self._write_module(
+            'math',
+            _MODULES['math'].replace('n one()', 'one() n'),
+        )
+        builder = build.Builder(
+            self._path('build'),
+            search_path=[self._lib_dir],
+        )
+        with instrument.listening(instrument.PhaseTimer()) as timer:
+            builder.build(os.path.join(self._src_dir, 'main.mis'))
+        self.assertEqual(['math'], builder.rebuilt_module_names)
+        phase_names = [name for name, _ in timer.phase_list]
+        self.assertEqual(1, phase_names.count('parse'))
+
+    def test_missing_fragment_is_rebuilt(self):
+        self._build()
+        os.remove(os.path.join(self._path('build'), 'math.part.c'))
+        self.assertEqual(['math'], self._build())
+
+    def test_missing_module_error(self):
+        self._write_module('math', 'import { nothing }')
+        self.assertRaisesRegex(
+            Exception,
+            'Can not find module: \'nothing\'',
+            self._build,
+        )
+
+    def test_import_cycle_error(self):
+        self._write_module('base', 'import { math }', self._lib_dir)
+        self.assertRaisesRegex(
+            Exception,
+            'Import cycle: math -> base -> math',
+            self._build,
+        )
+
+    def test_same_func_in_two_imported_modules_error(self):
+        self._write_module(
+            'main',
+            _MODULES['main'].replace('{ math }', '{ math base }'),
+        )
+        self._write_module(
+            'math',
+            _MODULES['math'] + 'func twice (n Int) -> Int { return n }\n',
+        )
+        self._write_module(
+            'base',
+            _MODULES['base'] + 'func twice (n Int) -> Int { return n }\n',
+            self._lib_dir,
+        )
+        self.assertRaisesRegex(
+            Exception,
+            'Func \'twice\\(Int\\)\' is declared in modules'
+            ' \'base\' and \'math\'',
+            self._build,
+        )
+
+    def test_local_func_same_as_imported_error(self):
+        self._write_module(
+            'math',
+            _MODULES['math'] + 'func one -> Int { return 1 }\n',
+        )
+        self.assertRaisesRegex(
+            Exception,
+            'Func \'one\\(\\)\' is declared in modules'
+            ' \'base\' and \'math\'',
+            self._build,
+        )
+
+    def test_overloaded_funcs_in_two_modules(self):
+        self._write_module(
+            'base',
+            _MODULES['base'] + 'func one (n Int) -> Int { return n }\n',
+            self._lib_dir,
+        )
+        self.assertEqual(['base', 'math', 'main'], self._build())
+
+    def test_compile_and_run(self):
+        exe_file_name = self._path('main')
+        result = driver.compile_file(
+            os.path.join(self._src_dir, 'main.mis'),
+            exe_file_name,
+            driver.Options(
+                build_dir=self._path('build'),
+                search_path=[self._lib_dir],
+            ),
+        )
+        self.assertIsNone(result.error)
+        out = subprocess.check_output(
+            [exe_file_name],
+            universal_newlines=True,
+        )
+        self.assertEqual('9\n', out)
+
+
+class TestSeparateBuilder(TestBuilder):
+    ''' Same rebuild rules, every module has own object. '''
+
+    def _builder(self, cflags=None, pass_by_value=False):
+        return build.Builder(
+            self._path('build'),
+            search_path=[self._lib_dir],
+            separate=True,
+            cc='tcc',
+            cflags=cflags,
+            pass_by_value=pass_by_value,
+        )
+
+    def _build(self):
+        builder = self._builder()
+        builder.build_executable(
+            os.path.join(self._src_dir, 'main.mis'),
+            self._path('main'),
+        )
+        return builder.rebuilt_module_names
+
+    def _run(self):
+        return subprocess.check_output(
+            [self._path('main')],
+            universal_newlines=True,
+        )
+
+    def _separate_path(self, file_name):
+        return os.path.join(self._path('build'), 'separate', file_name)
+
+    def test_missing_fragment_is_rebuilt(self):
+        self._build()
+        os.remove(self._separate_path('math.o'))
+        self.assertEqual(['math'], self._build())
+
+    def test_unchanged_imports_are_not_parsed(self):
+        pass  # same code as in combined mode
+
+    def test_run(self):
+        self._build()
+        self.assertEqual('9\n', self._run())
+        self._write_module(
+            'base',
+            _MODULES['base'].replace('3', '4'),
+            self._lib_dir,
+        )
+        self.assertEqual(['base'], self._build())
+        self.assertEqual('12\n', self._run())
+
+    def test_pass_by_value(self):
+        self._build()
+        builder = self._builder(pass_by_value=True)
+        builder.build_executable(
+            os.path.join(self._src_dir, 'main.mis'),
+            self._path('main'),
+        )
+        self.assertEqual(
+            ['base', 'math', 'main'],
+            builder.rebuilt_module_names,
+        )
+        self.assertEqual('9\n', self._run())
+
+    def test_only_entry_module_has_main(self):
+        self._build()
+        for name, has_main in [('main', True), ('math', False)]:
+            with open(self._separate_path(name + '.c')) as file_:
+                self.assertEqual(has_main, 'main(void)' in file_.read())
+
+    def test_header(self):
+        self._build()
+        with open(self._separate_path('math.h')) as file_:
+            self.assertEqual(
+                '#ifndef MISERY_MATH_H\n'
+                '#define MISERY_MATH_H\n'
+                '\n'
+                '#include "misery_runtime.h"\n'
+                '#include "base.h"\n'
+                '\n'
+                'void triple_Int(Int* __result, Int* n);\n'
+                '\n'
+                '#endif\n',
+                file_.read(),
+            )
+
+    def test_compile_error_is_not_cached(self):
+        builder = self._builder(cflags=['-no-such-flag'])
+        self.assertRaisesRegex(
+            Exception,
+            'C compiler error',
+            builder.build_executable,
+            os.path.join(self._src_dir, 'main.mis'),
+            self._path('main'),
+        )
+        # other flags, other objects
+        self.assertEqual(['base', 'math', 'main'], self._build())
+
+
+# vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for copyright and license details
+
+
+''' Test 'cache' module. '''
+
+
+import os
+import tempfile
+import unittest
+from misery import (
+    cache,
+)
+
+
+class TestCacheKey(unittest.TestCase):
+
+    def test_same_input_same_key(self):
+        self.assertEqual(
+            cache.cache_key('func start {}', 'O1'),
+            cache.cache_key('func start {}', 'O1'),
+        )
+
+    def test_key_depends_on_source(self):
+        self.assertNotEqual(
+            cache.cache_key('func start {}'),
+            cache.cache_key('func start { }'),
+        )
+
+    def test_key_depends_on_options(self):
+        self.assertNotEqual(
+            cache.cache_key('func start {}', 'O1'),
+            cache.cache_key('func start {}', 'O2'),
+        )
+
+    def test_parts_are_not_mixed(self):
+        self.assertNotEqual(
+            cache.cache_key('b', 'a'),
+            cache.cache_key('', 'ab'),
+        )
+
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp_dir.cleanup)
+        self._cache_dir = os.path.join(self._tmp_dir.name, 'cache')
+
+    def _set_use_time(self, cache_, key, use_time):
+        file_name = os.path.join(cache_.cache_dir, key + '.c')
+        os.utime(file_name, (use_time, use_time))
+
+    def test_miss(self):
+        cache_ = cache.Cache(self._cache_dir)
+        self.assertIsNone(cache_.get('key'))
+
+    def test_put_and_get(self):
+        cache_ = cache.Cache(self._cache_dir)
+        cache_.put('key', 'int x;\n')
+        self.assertEqual('int x;\n', cache_.get('key'))
+        self.assertEqual(['key.c'], os.listdir(self._cache_dir))
+
+    def test_other_process_sees_entry(self):
+        cache.Cache(self._cache_dir).put('key', 'int x;\n')
+        self.assertEqual('int x;\n', cache.Cache(self._cache_dir).get('key'))
+
+    def test_least_recently_used_are_evicted(self):
+        cache_ = cache.Cache(self._cache_dir, max_size=25)
+        cache_.put('a', 10 * 'a')
+        cache_.put('b', 10 * 'b')
+        self._set_use_time(cache_, 'a', 1000)
+        self._set_use_time(cache_, 'b', 2000)
+        cache_.get('a')  # 'a' is used after 'b'
+        cache_.put('c', 10 * 'c')
+        self.assertEqual(10 * 'a', cache_.get('a'))
+        self.assertIsNone(cache_.get('b'))
+        self.assertEqual(10 * 'c', cache_.get('c'))
+        self.assertLessEqual(cache_.size(), 25)
+
+    def test_bad_cache_dir_is_ignored(self):
+        file_name = os.path.join(self._tmp_dir.name, 'file')
+        open(file_name, 'w').close()
+        cache_ = cache.Cache(file_name)
+        cache_.put('key', 'int x;\n')
+        self.assertIsNone(cache_.get('key'))
+
+
+# vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
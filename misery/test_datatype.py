@@ -5,6 +5,8 @@
 ''' Test 'datatype' module. '''
 
 
+import copy
+import pickle
 import unittest
 from misery import (
     misc,
@@ -13,6 +15,159 @@ from misery import (
 )
 
 
+class TestSimpleDataType(unittest.TestCase):
+
+    def test_interned(self):
+        self.assertIs(
+            datatype.SimpleDataType('Int'),
+            datatype.SimpleDataType('Int'),
+        )
+        self.assertIs(
+            datatype.SimpleDataType('Int', prefix_list=['R']),
+            datatype.SimpleDataType(name='Int', prefix_list=('R',)),
+        )
+
+    def test_prefix_makes_new_datatype(self):
+        self.assertIsNot(
+            datatype.SimpleDataType('Int'),
+            datatype.SimpleDataType('Int', prefix_list=['R']),
+        )
+
+    def test_base(self):
+        int_datatype = datatype.SimpleDataType('Int')
+        ref_datatype = datatype.SimpleDataType('Int', prefix_list=['R'])
+        self.assertIs(int_datatype, int_datatype.base)
+        self.assertIs(int_datatype, ref_datatype.base)
+
+    def test_immutable(self):
+        int_datatype = datatype.SimpleDataType('Int')
+
+        def change_name():
+            int_datatype.name = 'String'
+        self.assertRaises(AttributeError, change_name)
+
+    def test_copy_keeps_identity(self):
+        int_datatype = datatype.SimpleDataType('Int', prefix_list=['R'])
+        self.assertIs(int_datatype, copy.copy(int_datatype))
+        self.assertIs(int_datatype, copy.deepcopy(int_datatype))
+        self.assertIs(
+            int_datatype,
+            pickle.loads(pickle.dumps(int_datatype)),
+        )
+
+    def test_dict_key(self):
+        datatype_names = {
+            datatype.SimpleDataType('Int'): 'Int',
+            datatype.SimpleDataType('String'): 'String',
+        }
+        self.assertEqual(
+            'Int',
+            datatype_names[datatype.SimpleDataType('Int')],
+        )
+
+
+def _signature(*datatype_names):
+    return ast.FuncSignature(
+        param_list=[
+            ast.Param(name='p' + str(i), datatype=datatype.SimpleDataType(n))
+            for i, n in enumerate(datatype_names)
+        ],
+    )
+
+
+class TestFindFuncSignature(unittest.TestCase):
+
+    def setUp(self):
+        self.func_decl = ast.FuncDecl(
+            name='start',
+            signature=ast.FuncSignature(),
+        )
+
+    def test_all_args_are_checked(self):
+        int_string_signature = _signature('Int', 'String')
+        int_int_signature = _signature('Int', 'Int')
+        ident_list = {'f': [int_string_signature, int_int_signature]}
+        func_call = ast.FuncCall(
+            expr=ast.Ident('f'),
+            arg_list=[ast.Number(1), ast.Number(2)],
+        )
+        real_signature = datatype.find_func_signature(
+            ident_list,
+            self.func_decl,
+            func_call,
+        )
+        self.assertIs(int_int_signature, real_signature)
+
+    def test_no_matching_signature(self):
+        ident_list = {'f': [_signature('Int', 'String')]}
+        func_call = ast.FuncCall(
+            expr=ast.Ident('f'),
+            arg_list=[ast.Number(1), ast.Number(2)],
+        )
+        self.assertRaisesRegexp(
+            Exception,
+            'Can not find matching signature',
+            datatype.find_func_signature,
+            ident_list,
+            self.func_decl,
+            func_call,
+        )
+
+    def test_first_signature_wins(self):
+        signature_1 = _signature('Int')
+        signature_2 = _signature('Int')
+        index = datatype.OverloadIndex({'f': [signature_1, signature_2]})
+        real_signature = index.find('f', [datatype.int_datatype])
+        self.assertIs(signature_1, real_signature)
+
+    def test_prefix_is_ignored(self):
+        signature = _signature('Int')
+        index = datatype.OverloadIndex({'f': signature})
+        ref_datatype = datatype.SimpleDataType('Int', prefix_list=['R'])
+        self.assertIs(signature, index.find('f', [ref_datatype]))
+
+    def test_index_is_built_once_per_ident_list(self):
+        ident_list = {'f': [_signature('Int')]}
+        func_call = ast.FuncCall(
+            expr=ast.Ident('f'),
+            arg_list=[ast.Number(1)],
+        )
+        built_index_list = []
+
+        class OverloadIndexMock(datatype.OverloadIndex):
+
+            def __init__(self, ident_list):
+                built_index_list.append(self)
+                super(OverloadIndexMock, self).__init__(ident_list)
+
+        real_overload_index = datatype.OverloadIndex
+        datatype.OverloadIndex = OverloadIndexMock
+        try:
+            for ident_list_ in (ident_list, ident_list, dict(ident_list)):
+                datatype.find_func_signature(
+                    ident_list_,
+                    self.func_decl,
+                    func_call,
+                )
+        finally:
+            datatype.OverloadIndex = real_overload_index
+        self.assertEqual(2, len(built_index_list))
+
+    def test_signature_is_memoized(self):
+        ident_list = {'f': [_signature('Int')]}
+        resolver = datatype.TypeResolver(ident_list)
+        func_call = ast.FuncCall(
+            expr=ast.Ident('f'),
+            arg_list=[ast.Number(1)],
+        )
+        signature = resolver.func_signature(self.func_decl, func_call)
+        ident_list['f'] = [_signature('Int')]
+        self.assertIs(
+            signature,
+            resolver.func_signature(self.func_decl, func_call),
+        )
+
+
 class TestMarkOutDatatypes(unittest.TestCase):
 
     def test_simple_func_decl(self):
@@ -42,6 +197,56 @@ class TestMarkOutDatatypes(unittest.TestCase):
         input_ast.decl_list.append('hi')
         self.assertEquals(len(real_output.decl_list), 0)
 
+    def test_input_ast_is_not_changed(self):
+        input_ast = ast.Module(
+            decl_list=[
+                ast.FuncDecl(
+                    name='start',
+                    signature=ast.FuncSignature(),
+                    body=[
+                        ast.VarDecl(
+                            name='testVar',
+                            expr=ast.Number(666),
+                        ),
+                    ],
+                )
+            ]
+        )
+        expected_input_ast = misc.pretty_print(input_ast)
+        datatype.mark_out_datatypes(input_ast)
+        misc.assert_equal(
+            self,
+            expected_input_ast,
+            misc.pretty_print(input_ast),
+        )
+
+    def test_not_annotated_nodes_are_shared(self):
+        signature = ast.FuncSignature(
+            param_list=[
+                ast.Param(
+                    name='n',
+                    datatype=datatype.SimpleDataType('Int'),
+                ),
+            ],
+        )
+        number = ast.Number(1)
+        input_ast = ast.Module(
+            decl_list=[
+                ast.FuncDecl(
+                    name='start',
+                    signature=signature,
+                    body=[
+                        ast.VarDecl(name='testVar', expr=number),
+                    ],
+                )
+            ]
+        )
+        real_output = datatype.mark_out_datatypes(input_ast)
+        start_func = real_output.decl_list[0]
+        self.assertIs(signature, start_func.signature)
+        self.assertIs(number, start_func.constants['const_0'])
+        self.assertIsNot(number, start_func.body[0].rvalue_expr)
+
     def test_simple_integer_var_decl(self):
         input_ast = ast.Module(
             decl_list=[
@@ -157,6 +362,7 @@ class TestMarkOutDatatypes(unittest.TestCase):
             }
             var_decl = expected_start_func.body[0]
             var_decl.rvalue_expr.binded_var_name = 'tmp_0'
+            var_decl.rvalue_expr.signature = std_ident_list['plusInt']
             arg_list = var_decl.rvalue_expr.arg_list
             arg_list[0].binded_var_name = 'const_0'
             arg_list[1].binded_var_name = 'const_1'
@@ -0,0 +1,500 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for copyright and license details
+
+
+''' Test 'driver' module. '''
+
+
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+from misery import (
+    driver,
+    testutil,
+)
+
+
+def setUpModule():
+    testutil.use_tmp_cache_dir()
+
+
+_PROGRAM = '''
+func start {
+  print(plus(1 2))
+  printNewLine()
+}
+'''
+
+
+class TestDriver(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp_dir.cleanup)
+        self._input_file_name = self._path('prog.mis')
+        with open(self._input_file_name, 'w') as file_:
+            file_.write(_PROGRAM)
+
+    def _path(self, file_name):
+        return os.path.join(self._tmp_dir.name, file_name)
+
+    def _main(self, args):
+        ''' Run driver, return (exit code, stderr). '''
+        err = io.StringIO()
+        with contextlib.redirect_stderr(err):
+            exit_code = driver.main(args)
+        return exit_code, err.getvalue()
+
+    def test_write_c(self):
+        out = io.StringIO()
+        driver.write_c(_PROGRAM, out)
+        self.assertIn('void start(void) {\n', out.getvalue())
+        self.assertIn('Int main(void) {\n', out.getvalue())
+
+    def test_parser_backends_give_same_c(self):
+        ply_out = io.StringIO()
+        driver.write_c(_PROGRAM, ply_out, parser_backend='ply')
+        descent_out = io.StringIO()
+        driver.write_c(_PROGRAM, descent_out, parser_backend='descent')
+        self.assertEqual(ply_out.getvalue(), descent_out.getvalue())
+
+    def test_emit_c(self):
+        c_file_name = self._path('out.c')
+        exit_code, _ = self._main(
+            ['-S', self._input_file_name, '-o', c_file_name])
+        self.assertEqual(0, exit_code)
+        with open(c_file_name) as file_:
+            self.assertIn('void start(void) {\n', file_.read())
+
+    def test_optimize(self):
+        c_file_name = self._path('out.c')
+        exit_code, _ = self._main(
+            ['-S', '-O', self._input_file_name, '-o', c_file_name])
+        self.assertEqual(0, exit_code)
+        with open(c_file_name) as file_:
+            self.assertNotIn(' + ', file_.read())
+
+    def test_optimize_changes_output_key(self):
+        self.assertNotEqual(
+            driver.Options().output_key(),
+            driver.Options(optimize=True).output_key(),
+        )
+
+    def test_pass_by_value(self):
+        exe_file_name = self._path('prog')
+        exit_code, err = self._main(
+            [self._input_file_name, '-o', exe_file_name, '--pass-by-value'])
+        self.assertEqual((0, ''), (exit_code, err))
+        out = subprocess.check_output(
+            [exe_file_name],
+            universal_newlines=True,
+        )
+        self.assertEqual('3\n', out)
+
+    def test_pass_by_value_changes_output_key(self):
+        self.assertNotEqual(
+            driver.Options().output_key(),
+            driver.Options(pass_by_value=True).output_key(),
+        )
+
+    def test_compile_and_run(self):
+        exe_file_name = self._path('prog')
+        exit_code, err = self._main(
+            [self._input_file_name, '-o', exe_file_name])
+        self.assertEqual((0, ''), (exit_code, err))
+        out = subprocess.check_output(
+            [exe_file_name],
+            universal_newlines=True,
+        )
+        self.assertEqual('3\n', out)
+        self.assertEqual(['prog', 'prog.mis'], sorted(
+            os.listdir(self._tmp_dir.name)))
+
+    def test_separate(self):
+        exe_file_name = self._path('prog')
+        exit_code, err = self._main([
+            self._input_file_name,
+            '-o', exe_file_name,
+            '--separate',
+            '--build-dir', self._path('build'),
+        ])
+        self.assertEqual((0, ''), (exit_code, err))
+        out = subprocess.check_output(
+            [exe_file_name],
+            universal_newlines=True,
+        )
+        self.assertEqual('3\n', out)
+
+    def test_keep_c(self):
+        exit_code, _ = self._main([
+            self._input_file_name,
+            '-o', self._path('prog'),
+            '--keep-c',
+        ])
+        self.assertEqual(0, exit_code)
+        self.assertTrue(os.path.isfile(self._path('prog.c')))
+
+    def test_time_phases(self):
+        exit_code, err = self._main(
+            ['-S', self._input_file_name, '--time-phases'])
+        self.assertEqual(0, exit_code)
+        for phase in ('read', 'parse', 'ident_table',
+                      'mark_out_datatypes', 'generate', 'total'):
+            self.assertRegex(err, '(?m)^' + phase + r' +\d+\.\d+ s$')
+
+    def test_report(self):
+        exit_code, err = self._main(
+            ['-S', self._input_file_name, '--report'])
+        self.assertEqual(0, exit_code)
+        self.assertRegex(err, '(?m)^phase +calls')
+        self.assertRegex(err, '(?m)^mark_out_datatypes +1 ')
+        self.assertRegex(err, '(?m)^start: generate +1 ')
+        self.assertRegex(err, r'(?m)^tmp vars +\d+$')
+
+    def test_compile_error(self):
+        exit_code, err = self._main([
+            self._input_file_name,
+            '-o', self._path('prog'),
+            '--cflags=-no-such-flag',
+        ])
+        self.assertEqual(1, exit_code)
+        self.assertIn(
+            'misery: error: ' + self._input_file_name +
+            ': C compiler error:',
+            err,
+        )
+
+    def test_bad_program_error(self):
+        with open(self._input_file_name, 'w') as file_:
+            file_.write('func start { badFunc() }')
+        exit_code, err = self._main(['-S', self._input_file_name])
+        self.assertEqual(1, exit_code)
+        self.assertIn(
+            'misery: error: ' + self._input_file_name +
+            ': no func: \'badFunc\'',
+            err,
+        )
+
+    def test_cache(self):
+        options = driver.Options(
+            emit_c=True,
+            use_cache=True,
+            cache_dir=self._path('cache'),
+        )
+        c_file_name = self._path('out.c')
+        result_list = []
+        for _ in range(2):
+            result = driver.compile_file(
+                self._input_file_name,
+                c_file_name,
+                options,
+            )
+            self.assertTrue(result.ok)
+            with open(c_file_name) as file_:
+                result_list.append((
+                    [name for name, _ in result.phase_list],
+                    file_.read(),
+                ))
+        (cold_phases, cold_c_code), (warm_phases, warm_c_code) = result_list
+        self.assertIn('parse', cold_phases)
+        self.assertEqual(['read', 'cache'], warm_phases)
+        self.assertEqual(cold_c_code, warm_c_code)
+
+    def test_output_with_many_inputs_error(self):
+        with self.assertRaises(SystemExit):
+            self._main(['a.mis', 'b.mis', '-o', 'out'])
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp_dir.cleanup)
+        self._input_file_names = []
+        for index, body in enumerate([
+            'print(1)',
+            'badFunc()',
+            'print(3)',
+        ]):
+            file_name = os.path.join(
+                self._tmp_dir.name,
+                'prog%d.mis' % index,
+            )
+            with open(file_name, 'w') as file_:
+                file_.write('func start { ' + body + ' }')
+            self._input_file_names.append(file_name)
+
+    def test_compile_files(self):
+        options = driver.Options(emit_c=True)
+        result_list = driver.compile_files(
+            self._input_file_names,
+            options,
+            jobs=2,
+        )
+        self.assertEqual(
+            self._input_file_names,
+            [result.input_file_name for result in result_list],
+        )
+        self.assertEqual(
+            [True, False, True],
+            [result.ok for result in result_list],
+        )
+        self.assertEqual('no func: \'badFunc\'', result_list[1].error)
+        self.assertIn(
+            'parse',
+            [name for name, _ in result_list[0].phase_list],
+        )
+        for result in (result_list[0], result_list[2]):
+            self.assertTrue(os.path.isfile(result.output_file_name))
+
+    def test_parallel_result_is_same_as_serial(self):
+        options = driver.Options(emit_c=True)
+        serial_output = []
+        for result in driver.compile_files(
+            self._input_file_names,
+            options,
+            jobs=1,
+        ):
+            if result.ok:
+                with open(result.output_file_name) as file_:
+                    serial_output.append(file_.read())
+        parallel_output = []
+        for result in driver.compile_files(
+            self._input_file_names,
+            options,
+            jobs=3,
+        ):
+            if result.ok:
+                with open(result.output_file_name) as file_:
+                    parallel_output.append(file_.read())
+        self.assertEqual(serial_output, parallel_output)
+
+    def test_main(self):
+        err = io.StringIO()
+        with contextlib.redirect_stderr(err):
+            exit_code = driver.main(
+                ['-S', '-j', '2', '--time-phases'] + self._input_file_names)
+        self.assertEqual(1, exit_code)
+        err = err.getvalue()
+        self.assertEqual(1, err.count('misery: error: '))
+        self.assertIn(self._input_file_names[2], err)
+        self.assertRegex(err, r'(?m)^wall +\d+\.\d+ s$')
+
+
+def _has_tcc_run():
+    ''' Check that tcc is real tcc, which can run C code. '''
+    try:
+        out = subprocess.check_output(
+            ['tcc', '-v'],
+            stderr=subprocess.STDOUT,
+            universal_newlines=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return False
+    return out.startswith('tcc version')
+
+
+class TestCompileSource(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp_dir.cleanup)
+        self._exe_file_name = os.path.join(self._tmp_dir.name, 'prog')
+
+    def _compile(self, input_string, options=None):
+        return driver.compile_source(
+            input_string,
+            options,
+            output_file_name=self._exe_file_name,
+        )
+
+    def test_executable(self):
+        result = self._compile(_PROGRAM)
+        self.assertIsNone(result.error)
+        self.assertEqual([], result.diagnostics)
+        # no temporary files
+        self.assertEqual(['prog'], os.listdir(self._tmp_dir.name))
+        out = subprocess.check_output(
+            [self._exe_file_name],
+            universal_newlines=True,
+        )
+        self.assertEqual('3\n', out)
+
+    def test_tail_call_in_constant_stack(self):
+        result = self._compile(textwrap.dedent('''
+            func count (n Int) -> Int {
+              if isEqual(n 0) {
+                return n
+              }
+              return count(minus(n 1))
+            }
+            func start {
+              print(count(100000000))
+              printNewLine()
+            }
+        '''), driver.Options(optimize=True))
+        self.assertIsNone(result.error)
+        out = subprocess.check_output(
+            [self._exe_file_name],
+            universal_newlines=True,
+        )
+        self.assertEqual('0\n', out)
+
+    def test_phases(self):
+        result = self._compile(_PROGRAM)
+        self.assertEqual(
+            ['parse', 'ident_table', 'mark_out_datatypes', 'generate', 'cc'],
+            [name for name, _ in result.phase_list],
+        )
+
+    def test_emit_c(self):
+        result = self._compile(_PROGRAM, driver.Options(emit_c=True))
+        self.assertIsNone(result.error)
+        with open(self._exe_file_name) as file_:
+            self.assertIn('Int main(void) {\n', file_.read())
+
+    def test_misery_error(self):
+        result = self._compile('func start { badFunc() }')
+        self.assertFalse(result.ok)
+        self.assertEqual(1, len(result.diagnostics))
+        diagnostic = result.diagnostics[0]
+        self.assertEqual('misery', diagnostic.source)
+        self.assertEqual('error', diagnostic.severity)
+        self.assertEqual('no func: \'badFunc\'', diagnostic.message)
+        self.assertIsNone(diagnostic.line)
+
+    def test_parse_error_position(self):
+        result = self._compile('func start {\n  print(1 2))\n}\n')
+        diagnostic = result.diagnostics[0]
+        self.assertEqual('misery', diagnostic.source)
+        self.assertIsNotNone(diagnostic.line)
+        self.assertIsNotNone(diagnostic.column)
+
+    def test_c_compiler_error(self):
+        result = self._compile(
+            _PROGRAM,
+            driver.Options(cflags=['-no-such-flag']),
+        )
+        self.assertFalse(result.ok)
+        self.assertTrue(result.error.startswith('C compiler error'))
+        self.assertEqual('cc', result.diagnostics[0].source)
+
+    def test_run_needs_tcc(self):
+        result = driver.compile_source(
+            _PROGRAM,
+            driver.Options(cc='gcc'),
+            run=True,
+        )
+        self.assertEqual(
+            'Only tcc can run program without executable',
+            result.error,
+        )
+
+    @unittest.skipUnless(_has_tcc_run(), 'needs real tcc')
+    def test_run(self):
+        result = driver.compile_source(_PROGRAM, run=True)
+        self.assertIsNone(result.error)
+        self.assertEqual('3\n', result.stdout)
+        self.assertEqual(0, result.returncode)
+
+
+class TestPipeInput(unittest.TestCase):
+
+    def _popen(self, code):
+        return subprocess.Popen(
+            [sys.executable, '-c', code],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+
+    def test_output_is_read_while_input_is_written(self):
+        ''' Output bigger than pipe buffer does not block writing. '''
+        proc = self._popen(
+            'import sys\n'
+            'for line in sys.stdin:\n'
+            '    sys.stdout.write(line)\n'
+            '    sys.stdout.flush()\n'
+        )
+        line_list = ['line ' + str(i) + '\n' for i in range(100000)]
+
+        def write_input(file_):
+            for line in line_list:
+                file_.write(line)
+        stdout, stderr = driver._pipe_input(proc, write_input, 'cc')
+        self.assertEqual(''.join(line_list), stdout)
+        self.assertEqual('', stderr)
+
+    def test_proc_exits_before_input_is_written(self):
+        proc = self._popen('import sys; sys.stderr.write("bad flag")')
+
+        def write_input(file_):
+            for _ in range(1000):
+                file_.write('x' * 1000 + '\n')
+        stdout, stderr = driver._pipe_input(proc, write_input, 'cc')
+        self.assertEqual('bad flag', stderr)
+
+    def test_proc_is_killed_on_error(self):
+        proc = self._popen('import sys; sys.stdin.read()')
+
+        def write_input(file_):
+            raise Exception('generator error')
+        self.assertRaisesRegex(
+            Exception,
+            'generator error',
+            driver._pipe_input,
+            proc,
+            write_input,
+            'cc',
+        )
+        self.assertIsNotNone(proc.returncode)
+
+
+class TestParseDiagnostics(unittest.TestCase):
+
+    def test_gcc(self):
+        diagnostic_list = driver.parse_diagnostics(
+            'cc',
+            '<stdin>: In function \'start\':\n'
+            '<stdin>:12:5: warning: implicit declaration\n'
+            '<stdin>:14:3: error: expected \';\' before \'}\' token\n',
+        )
+        self.assertEqual(
+            [
+                ('warning', 12, 5, 'implicit declaration'),
+                ('error', 14, 3, 'expected \';\' before \'}\' token'),
+            ],
+            [
+                (d.severity, d.line, d.column, d.message)
+                for d in diagnostic_list
+            ],
+        )
+
+    def test_tcc(self):
+        diagnostic = driver.parse_diagnostics(
+            'cc',
+            '<stdin>:7: error: \'x\' undeclared\n',
+        )[0]
+        self.assertEqual(
+            ('error', 7, None, '\'x\' undeclared'),
+            (
+                diagnostic.severity,
+                diagnostic.line,
+                diagnostic.column,
+                diagnostic.message,
+            ),
+        )
+
+    def test_text_without_position(self):
+        diagnostic_list = driver.parse_diagnostics('misery', 'bad thing\n')
+        self.assertEqual(1, len(diagnostic_list))
+        self.assertEqual('bad thing', diagnostic_list[0].message)
+
+
+# vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
@@ -5,1020 +5,1176 @@
 ''' Funcal tests. '''
 
 
-import unittest
-import subprocess
+import concurrent.futures
+import hashlib
 import os
+import shutil
+import subprocess
 import sys
+import tempfile
 import textwrap
+import threading
+import unittest
 from misery import (
     misc,
-    generator,
-    parse,
-    datatype,
-    ident_table,
+    driver,
+    testutil,
 )
 
 
+_translate_lock = threading.Lock()
+
+
 def get_generator(input_mis_code):
-    ast_ = parse.make_parser().parse(
-        input_mis_code,
-        lexer=parse.make_lexer(),
-    )
-    ast_.ident_list = ident_table.ident_table(ast_)
-    ast_ = datatype.mark_out_datatypes(ast_=ast_)
-    generator_ = generator.Generator(ast_=ast_)
-    return generator_
+    return driver.translate(input_mis_code, parser_backend='ply')
 
 
 def translate_mis_to_c(input_mis_code):
     ''' Helper func, compiles program in Mis to program in C. '''
-    real_output = get_generator(input_mis_code).generate()
+    with _translate_lock:
+        real_output = get_generator(input_mis_code).generate()
     return real_output
 
 
-def translate_mis_to_c_and_write_to_file(input_mis_code, filename='out.c'):
-    ''' Translate to full C version and write to file. '''
-    with open(filename, 'w') as f:
-        f.write(get_generator(input_mis_code).generate_full())
-
-
-def try_to_compile_and_run_file(
-    test_case,
-    c_file_name,
-    input_mis_code,
-    expected_stdout,
-):
-    # translate mis to ANSI C and write to file
-    translate_mis_to_c_and_write_to_file(
-        input_mis_code=input_mis_code,
-        filename=c_file_name,
-    )
+def translate_mis_to_full_c(input_mis_code):
+    ''' Helper func, compiles program in Mis to full program in C. '''
+    with _translate_lock:
+        real_output = get_generator(input_mis_code).generate_full()
+    return real_output
 
-    if sys.platform == 'win32':
-        exe_file_name = c_file_name.replace('.c', '.exe')
-    else:
-        exe_file_name = c_file_name.replace('.c', '')
 
-    # compile c code with c compiler
-    compiler_proc = subprocess.Popen(
-        ['tcc', c_file_name, '-o', exe_file_name],
+class _RunResult(object):
+
+    def __init__(self, compiler_err='', out='', err=''):
+        self.compiler_err = compiler_err
+        self.out = out
+        self.err = err
+
+
+class ExeCache(object):
+    ''' Executables of compiled C programs.
+
+        Executable is keyed by sha1 of compiler path, compiler flags
+        and C code, so compiler is not run again for unchanged code.
+        Every compilation has own temporary dir in cache_dir,
+        renaming of ready executable to cache_dir is atomic.
+    '''
+
+    def __init__(self, cache_dir, cc='tcc', cflags=None):
+        self.cache_dir = cache_dir
+        self.cc = cc
+        self.cflags = list(cflags or [])
+        self.compile_count = 0
+        self._lock = threading.Lock()
+
+    def key(self, c_code):
+        hasher = hashlib.sha1()
+        cc_path = shutil.which(self.cc) or self.cc
+        for part in [cc_path] + self.cflags + [c_code]:
+            hasher.update(part.encode('utf-8'))
+            hasher.update(b'\0')
+        return hasher.hexdigest()
+
+    def compile(self, c_code):
+        ''' Return (exe_file_name, compiler_err).
+
+            exe_file_name is None if compilation failed.
+        '''
+        exe_file_name = os.path.join(self.cache_dir, self.key(c_code))
+        if sys.platform == 'win32':
+            exe_file_name += '.exe'
+        if os.path.isfile(exe_file_name):
+            return exe_file_name, ''
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=self.cache_dir) as tmp_dir:
+            c_file_name = os.path.join(tmp_dir, 'out.c')
+            with open(c_file_name, 'w') as file_:
+                file_.write(c_code)
+            tmp_exe_file_name = os.path.join(
+                tmp_dir,
+                os.path.basename(exe_file_name),
+            )
+            with self._lock:
+                self.compile_count += 1
+            compiler_proc = subprocess.run(
+                [self.cc] + self.cflags +
+                [c_file_name, '-o', tmp_exe_file_name],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                universal_newlines=True,
+            )
+            if compiler_proc.returncode != 0 or compiler_proc.stdout:
+                return None, compiler_proc.stdout
+            os.replace(tmp_exe_file_name, exe_file_name)
+        return exe_file_name, ''
+
+
+# persistent cache is opt-in, by default it lives only for test run
+_EXE_CACHE_DIR_VAR = 'MISERY_TEST_EXE_CACHE_DIR'
+
+_exe_cache = None
+
+
+def setUpModule():
+    global _exe_cache
+    testutil.use_tmp_cache_dir()
+    cache_dir = os.environ.get(_EXE_CACHE_DIR_VAR)
+    if not cache_dir:
+        cache_dir = os.path.join(testutil.tmp_dir(), 'exe')
+    _exe_cache = ExeCache(cache_dir)
+
+
+def compile_and_run(c_code, exe_cache=None):
+    ''' Compile full C program and run it, return _RunResult. '''
+    if exe_cache is None:
+        exe_cache = _exe_cache
+    exe_file_name, compiler_err = exe_cache.compile(c_code)
+    if exe_file_name is None:
+        return _RunResult(compiler_err=compiler_err)
+    proc = subprocess.run(
+        [exe_file_name],
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
         universal_newlines=True,
     )
-    compiler_out, compiler_err = compiler_proc.communicate()
-    assert os.path.isfile(c_file_name)
-    os.remove(c_file_name)
-    assert compiler_out == ''
-    test_case.assertEqual(
-        compiler_err, '',
-        'ANSI C compiler error:\n' + compiler_err,
-    )
-
-    # run compiler program and check its output
-    if sys.platform == 'win32':
-        cmd = [exe_file_name]
-    else:
-        cmd = ['./' + exe_file_name]
-    proc = subprocess.Popen(
-        cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        universal_newlines=True,
-    )
-    out, err = proc.communicate()
-    assert os.path.isfile(exe_file_name)
-    if out != '':
-        misc.assert_equal(test_case, '\n', out[-1])
-    os.remove(exe_file_name)
-    misc.assert_equal(test_case, expected_stdout, out)
-    test_case.assertEqual(err, '', 'Compiled prog error:\n' + err)
-
-
-def check_translation(
-    test_case,
-    input_mis_code,
-    expected_c_code,
-    expected_stdout='',
-):
-    ''' Small helper func. '''
-    real_output = translate_mis_to_c(textwrap.dedent(input_mis_code))
-    misc.assert_equal(test_case, textwrap.dedent(expected_c_code), real_output)
-    c_file_name = misc.get_caller_func_name().replace('test_', '') + '_out.c'
-    try_to_compile_and_run_file(
-        test_case,
-        c_file_name,
-        input_mis_code,
-        expected_stdout,
-    )
-
-
-class TestTranslator(unittest.TestCase):
-
-    def test_var_decl_with_integer_literal(self):
-        check_translation(
-            test_case=self,
-            input_mis_code='''
-                func start {
-                  testVar ::= 1
-                  testVar = 2
-                }
-            ''',
-            expected_c_code='''
-                void start(void);
-
-                void start(void) {
-                  Int* testVar;
-                  Int tmp_0;
-                  Int const_0;
-                  Int const_1;
-
-                  const_0 = 1;
-                  const_1 = 2;
-
-                  testVar = &tmp_0;
-                  *testVar = const_0;
-                  *testVar = const_1;
-                }
-
-            ''',
-        )
-
-    def test_integer_var_decl_with_constructor(self):
-        check_translation(
-            test_case=self,
-            input_mis_code='''
-                func start {
-                  testVar := Int(1)
-                  print(testVar)
-                  printNewLine()
-                }
-            ''',
-            expected_c_code='''
-                void start(void);
-
-                void start(void) {
-                  Int* testVar;
-                  Int tmp_0;
-                  Int const_0;
-
-                  const_0 = 1;
-
-                  Int_Int_init(&tmp_0, &const_0);
-                  testVar = &tmp_0;
-                  print_Int(testVar);
-                  printNewLine();
-                }
-
-            ''',
-            expected_stdout='1\n',
-        )
-
-    def test_class(self):
-        check_translation(
-            test_case=self,
-            input_mis_code='''
-                class MyClass {
-                  store {
-                    field1 Int
-                    field2 Int
-                  }
-                }
-                func start {
-                  t := MyClass()
-                }
-            ''',
-            expected_c_code='''
-                typedef struct MyClass MyClass;
-                void start(void);
-
-                struct MyClass {
-                  Int field1;
-                  Int field2;
-                };
-
-                void MyClass_init(MyClass* __result) {
-                  /* todo */
-                }
-
-                void start(void) {
-                  MyClass* t;
-                  MyClass tmp_0;
-
-                  MyClass_init(&tmp_0);
-                  t = &tmp_0;
-                }
-
-            ''',
-        )
-
-    def test_class_as_func_arg(self):
-        check_translation(
-            test_case=self,
-            input_mis_code='''
-                class MyClass {
-                  store {
-                    field1 Int
-                    field2 Int
-                  }
-                }
-                func someFunc (x MyClass) -> MyClass{
-                  return x
-                }
-                func start {
-                  t := MyClass()
-                  t2 := someFunc(t)
-                }
-            ''',
-            expected_c_code='''
-                typedef struct MyClass MyClass;
-                void someFunc_MyClass(MyClass* __result, MyClass* x);
-                void start(void);
-
-                struct MyClass {
-                  Int field1;
-                  Int field2;
-                };
-
-                void MyClass_init(MyClass* __result) {
-                  /* todo */
-                }
-
-                void someFunc_MyClass(MyClass* __result, MyClass* x) {
-                  *__result = *x;
-                  return;
-                }
-
-                void start(void) {
-                  MyClass* t;
-                  MyClass* t2;
-                  MyClass tmp_0;
-                  MyClass tmp_1;
-
-                  MyClass_init(&tmp_0);
-                  t = &tmp_0;
-                  someFunc_MyClass(&tmp_1, t);
-                  t2 = &tmp_1;
-                }
-
-            ''',
-        )
-
-    def test_var_decl_with_string_literal(self):
-        check_translation(
-            test_case=self,
-            input_mis_code='''
-                func start {
-                  testVar ::= "some string"
-                }
-            ''',
-            expected_c_code='''
-                void start(void);
-
-                void start(void) {
-                  String* testVar;
-                  String tmp_0;
-                  String const_0;
-
-                  const_0 = "some string";
-
-                  testVar = &tmp_0;
-                  *testVar = const_0;
-                }
-
-            ''',
-        )
-
-    def test_print_string_literal(self):
-        check_translation(
-            test_case=self,
-            input_mis_code='''
-                func start {
-                  print("hello")
-                  printNewLine()
-                }
-            ''',
-            expected_c_code='''
-                void start(void);
-
-                void start(void) {
-                  String const_0;
-
-                  const_0 = "hello";
-
-                  print_String(&const_0);
-                  printNewLine();
-                }
-
-            ''',
-            expected_stdout='hello\n',
-        )
-
-    def test_print_string_var(self):
-        check_translation(
-            test_case=self,
-            input_mis_code='''
-                func start {
-                  testVar ::= "print this to console, please"
-                  print(testVar)
-                  printNewLine()
-                }
-            ''',
-            expected_c_code='''
-                void start(void);
-
-                void start(void) {
-                  String* testVar;
-                  String tmp_0;
-                  String const_0;
-
-                  const_0 = "print this to console, please";
-
-                  testVar = &tmp_0;
-                  *testVar = const_0;
-                  print_String(testVar);
-                  printNewLine();
-                }
-
-            ''',
-            expected_stdout='print this to console, please\n',
-        )
-
-    def test_basic_assignment_of_integer_literal(self):
-        check_translation(
-            test_case=self,
-            input_mis_code='''
-                func start {
-                  testVar ::= 1 testVar = 2
-                }
-            ''',
-            expected_c_code='''
-                void start(void);
-
-                void start(void) {
-                  Int* testVar;
-                  Int tmp_0;
-                  Int const_0;
-                  Int const_1;
-
-                  const_0 = 1;
-                  const_1 = 2;
-
-                  testVar = &tmp_0;
-                  *testVar = const_0;
-                  *testVar = const_1;
-                }
-
-            ''',
-        )
-
-    def test_simple_loop_from_1_to_5(self):
-        check_translation(
-            test_case=self,
-            input_mis_code='''
-                func start {
-                  i ::= 0
-                  for isLess(i 5) {
-                    print(i)
-                    printNewLine()
-                    i = plus(i 1)
-                  }
-                }
-            ''',
-            expected_c_code='''
-                void start(void);
-
-                void start(void) {
-                  Int* i;
-                  Int tmp_0;
-                  Int tmp_1;
-                  Int tmp_2;
-                  Int const_0;
-                  Int const_1;
-                  Int const_2;
-
-                  const_0 = 0;
-                  const_1 = 5;
-                  const_2 = 1;
-
-                  i = &tmp_0;
-                  *i = const_0;
-                  while (1) {
-                    isLess_Int_Int(&tmp_1, i, &const_1);
-                    if (!tmp_1) {
-                      break;
-                    }
-                    print_Int(i);
-                    printNewLine();
-                    plus_Int_Int(&tmp_2, i, &const_2);
-                    *i = tmp_2;
-                  }
-                }
-
-            ''',
-            expected_stdout=(
-                '0\n'
-                '1\n'
-                '2\n'
-                '3\n'
-                '4\n'
-            ),
-        )
-
-    def test_var_decl_with_func_call_returning_string(self):
-        check_translation(
-            test_case=self,
-            input_mis_code='''
-                func someString -> String {
-                  return "hi"
-                }
-                func start {
-                  s ::= someString()
-                  print(s)
-                  printNewLine()
-                }
-            ''',
-            expected_c_code='''
-                void someString(String* __result);
-                void start(void);
-
-                void someString(String* __result) {
-                  String const_0;
-
-                  const_0 = "hi";
-
-                  *__result = const_0;
-                  return;
-                }
-
-                void start(void) {
-                  String* s;
-                  String tmp_0;
-                  String tmp_1;
+    return _RunResult(out=proc.stdout, err=proc.stderr)
 
-                  s = &tmp_0;
-                  someString(&tmp_1);
-                  *s = tmp_1;
-                  print_String(s);
-                  printNewLine();
-                }
 
-            ''',
-            expected_stdout='hi\n',
-        )
+def _translate_and_run(input_mis_code):
+    c_code = translate_mis_to_full_c(input_mis_code)
+    return compile_and_run(c_code)
 
-    def test_nested_func_calls_with_strings(self):
-        check_translation(
-            test_case=self,
-            input_mis_code='''
-                func someString -> String {
-                  return "hi"
-                }
-                func start {
-                  print(someString())
-                  printNewLine()
-                }
-            ''',
-            expected_c_code='''
-                void someString(String* __result);
-                void start(void);
 
-                void someString(String* __result) {
-                  String const_0;
+class _Case(object):
+    ''' Program of test with expected output. '''
 
-                  const_0 = "hi";
+    def __init__(self, input_mis_code, expected_c_code, expected_stdout):
+        self.input_mis_code = textwrap.dedent(input_mis_code)
+        self.expected_c_code = textwrap.dedent(expected_c_code)
+        self.expected_stdout = expected_stdout
 
-                  *__result = const_0;
-                  return;
-                }
 
-                void start(void) {
-                  String tmp_0;
+def _case(input_mis_code, expected_c_code, expected_stdout=''):
+    ''' Make test method checking translation of program.
 
-                  someString(&tmp_0);
-                  print_String(&tmp_0);
-                  printNewLine();
-                }
+        Case is attached to method, so programs of all tests
+        are known before tests are run.
+    '''
+    case = _Case(input_mis_code, expected_c_code, expected_stdout)
 
-            ''',
-            expected_stdout='hi\n',
-        )
+    def test(test_case):
+        check_translation(test_case, case)
+    test.case = case
+    return test
 
-    def test_var_decl_with_func_call_returning_integer(self):
-        check_translation(
-            test_case=self,
-            input_mis_code='''
-                func someNumber -> Int {
-                  return 99
-                }
-                func start {
-                  testVar ::= someNumber()
-                }
-            ''',
-            expected_c_code='''
-                void someNumber(Int* __result);
-                void start(void);
-
-                void someNumber(Int* __result) {
-                  Int const_0;
 
-                  const_0 = 99;
+class _Prefetcher(object):
+    ''' Compiles and runs programs of all cases of class concurrently.
 
-                  *__result = const_0;
-                  return;
-                }
-
-                void start(void) {
-                  Int* testVar;
-                  Int tmp_0;
-                  Int tmp_1;
+        Programs are taken from cases of test methods,
+        they are run in thread pool and tests take results from it.
+    '''
 
-                  testVar = &tmp_0;
-                  someNumber(&tmp_1);
-                  *testVar = tmp_1;
-                }
+    def __init__(self):
+        self._executor = None
+        self._futures = {}  # input_mis_code: future
 
-            ''',
+    def start(self, test_case_class):
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=os.cpu_count() or 1,
         )
+        loader = unittest.TestLoader()
+        for name in loader.getTestCaseNames(test_case_class):
+            case = getattr(test_case_class, name).case
+            self._futures[case.input_mis_code] = self._executor.submit(
+                _translate_and_run,
+                case.input_mis_code,
+            )
+
+    def stop(self):
+        if self._executor is not None:
+            for future in self._futures.values():
+                future.cancel()
+            self._executor.shutdown()
+            self._executor = None
+        self._futures.clear()
+
+    def run(self, input_mis_code):
+        ''' Return _RunResult of program. '''
+        future = self._futures.pop(input_mis_code, None)
+        if future is not None:
+            return future.result()
+        return _translate_and_run(input_mis_code)
+
+
+_prefetcher = _Prefetcher()
+
+
+def check_translation(test_case, case):
+    ''' Small helper func. '''
+    real_output = translate_mis_to_c(case.input_mis_code)
+    misc.assert_equal(test_case, case.expected_c_code, real_output)
+    result = _prefetcher.run(case.input_mis_code)
+    test_case.assertEqual(
+        result.compiler_err, '',
+        'ANSI C compiler error:\n' + result.compiler_err,
+    )
+    if result.out != '':
+        misc.assert_equal(test_case, '\n', result.out[-1])
+    misc.assert_equal(test_case, case.expected_stdout, result.out)
+    test_case.assertEqual(
+        result.err, '',
+        'Compiled prog error:\n' + result.err,
+    )
 
-    def test_simple_func_1(self):
-        check_translation(
-            test_case=self,
-            input_mis_code='''
-                func start {
-                  print(minus(666 99))
-                  printNewLine()
-                }
-            ''',
-            expected_c_code='''
-                void start(void);
-
-                void start(void) {
-                  Int tmp_0;
-                  Int const_0;
-                  Int const_1;
-
-                  const_0 = 666;
-                  const_1 = 99;
-
-                  minus_Int_Int(&tmp_0, &const_0, &const_1);
-                  print_Int(&tmp_0);
-                  printNewLine();
-                }
-
-            ''',
-            expected_stdout='567\n',
-        )
-
-    def test_simple_func_2(self):
-        check_translation(
-            test_case=self,
-            input_mis_code='''
-                func someNumber -> Int {
-                  return 99
-                }
-                func start {
-                  print(minus(666 someNumber()))
-                  printNewLine()
-                }
-            ''',
-            expected_c_code='''
-                void someNumber(Int* __result);
-                void start(void);
-
-                void someNumber(Int* __result) {
-                  Int const_0;
-
-                  const_0 = 99;
-
-                  *__result = const_0;
-                  return;
-                }
-
-                void start(void) {
-                  Int tmp_0;
-                  Int tmp_1;
-                  Int const_0;
 
-                  const_0 = 666;
+class TestExeCache(unittest.TestCase):
 
-                  someNumber(&tmp_0);
-                  minus_Int_Int(&tmp_1, &const_0, &tmp_0);
-                  print_Int(&tmp_1);
-                  printNewLine();
-                }
+    _c_code = textwrap.dedent('''
+        #include <stdio.h>
 
-            ''',
-            expected_stdout='567\n',
-        )
+        int main(void) {
+          printf("hi\\n");
+          return 0;
+        }
+    ''')
 
-    def test_simple_func_3(self):
-        check_translation(
-            test_case=self,
-            input_mis_code='''
-                func someNumber -> Int {
-                  return minus(100 1)
-                }
-                func start {
-                  print(
-                    minus(666 someNumber())
-                  )
-                  printNewLine()
-                }
-            ''',
-            expected_c_code='''
-                void someNumber(Int* __result);
-                void start(void);
-
-                void someNumber(Int* __result) {
-                  Int tmp_0;
-                  Int const_0;
-                  Int const_1;
-
-                  const_0 = 100;
-                  const_1 = 1;
-
-                  minus_Int_Int(&tmp_0, &const_0, &const_1);
-                  *__result = tmp_0;
-                  return;
-                }
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
 
-                void start(void) {
-                  Int tmp_0;
-                  Int tmp_1;
-                  Int const_0;
+    def tearDown(self):
+        self._tmp_dir.cleanup()
 
-                  const_0 = 666;
+    def test_same_code_is_compiled_once(self):
+        exe_cache = ExeCache(self._tmp_dir.name)
+        for _ in range(2):
+            result = compile_and_run(self._c_code, exe_cache=exe_cache)
+            self.assertEqual('', result.compiler_err)
+            self.assertEqual('hi\n', result.out)
+        self.assertEqual(1, exe_cache.compile_count)
 
-                  someNumber(&tmp_0);
-                  minus_Int_Int(&tmp_1, &const_0, &tmp_0);
-                  print_Int(&tmp_1);
-                  printNewLine();
-                }
-
-            ''',
-            expected_stdout='567\n',
+    def test_flags_are_in_key(self):
+        exe_cache = ExeCache(self._tmp_dir.name)
+        other_exe_cache = ExeCache(self._tmp_dir.name, cflags=['-g'])
+        self.assertNotEqual(
+            exe_cache.key(self._c_code),
+            other_exe_cache.key(self._c_code),
         )
 
-    def test_simple_func_4(self):
-        check_translation(
-            test_case=self,
-            input_mis_code='''
-                func someNumber (xxx Int) -> Int {
-                  return minus(100 xxx)
-                }
-                func start {
-                  print(
-                    minus(666 someNumber(1))
-                  )
-                  printNewLine()
-                }
-            ''',
-            expected_c_code='''
-                void someNumber_Int(Int* __result, Int* xxx);
-                void start(void);
-
-                void someNumber_Int(Int* __result, Int* xxx) {
-                  Int tmp_0;
-                  Int const_0;
-
-                  const_0 = 100;
 
-                  minus_Int_Int(&tmp_0, &const_0, xxx);
-                  *__result = tmp_0;
-                  return;
-                }
+class TestTranslator(unittest.TestCase):
 
-                void start(void) {
-                  Int tmp_0;
-                  Int tmp_1;
-                  Int const_0;
-                  Int const_1;
+    @classmethod
+    def setUpClass(cls):
+        _prefetcher.start(cls)
+
+    @classmethod
+    def tearDownClass(cls):
+        _prefetcher.stop()
+
+    test_var_decl_with_integer_literal = _case(
+        input_mis_code='''
+            func start {
+              testVar ::= 1
+              testVar = 2
+            }
+        ''',
+        expected_c_code='''
+            void start(void);
+
+            void start(void) {
+              Int* testVar;
+              Int tmp_0;
+              Int const_0;
+              Int const_1;
+
+              const_0 = 1;
+              const_1 = 2;
+
+              testVar = &tmp_0;
+              *testVar = const_0;
+              *testVar = const_1;
+            }
+
+        ''',
+    )
 
-                  const_0 = 666;
-                  const_1 = 1;
+    test_integer_var_decl_with_constructor = _case(
+        input_mis_code='''
+            func start {
+              testVar := Int(1)
+              print(testVar)
+              printNewLine()
+            }
+        ''',
+        expected_c_code='''
+            void start(void);
+
+            void start(void) {
+              Int* testVar;
+              Int tmp_0;
+              Int const_0;
+
+              const_0 = 1;
+
+              tmp_0 = const_0;
+              testVar = &tmp_0;
+              print_Int(testVar);
+              printNewLine();
+            }
+
+        ''',
+        expected_stdout='1\n',
+    )
 
-                  someNumber_Int(&tmp_0, &const_1);
-                  minus_Int_Int(&tmp_1, &const_0, &tmp_0);
-                  print_Int(&tmp_1);
-                  printNewLine();
-                }
+    test_class = _case(
+        input_mis_code='''
+            class MyClass {
+              store {
+                field1 Int
+                field2 Int
+              }
+            }
+            func start {
+              t := MyClass()
+            }
+        ''',
+        expected_c_code='''
+            typedef struct MyClass MyClass;
+            void start(void);
+
+            struct MyClass {
+              Int field1;
+              Int field2;
+            };
+
+            void MyClass_init(MyClass* __result) {
+              /* todo */
+            }
+
+            void start(void) {
+              MyClass* t;
+              MyClass tmp_0;
+
+              MyClass_init(&tmp_0);
+              t = &tmp_0;
+            }
+
+        ''',
+    )
 
-            ''',
-            expected_stdout='567\n',
-        )
+    test_class_as_func_arg = _case(
+        input_mis_code='''
+            class MyClass {
+              store {
+                field1 Int
+                field2 Int
+              }
+            }
+            func someFunc (x MyClass) -> MyClass{
+              return x
+            }
+            func start {
+              t := MyClass()
+              t2 := someFunc(t)
+            }
+        ''',
+        expected_c_code='''
+            typedef struct MyClass MyClass;
+            void someFunc_MyClass(MyClass* __result, MyClass* x);
+            void start(void);
+
+            struct MyClass {
+              Int field1;
+              Int field2;
+            };
+
+            void MyClass_init(MyClass* __result) {
+              /* todo */
+            }
+
+            void someFunc_MyClass(MyClass* __result, MyClass* x) {
+              *__result = *x;
+              return;
+            }
+
+            void start(void) {
+              MyClass* t;
+              MyClass* t2;
+              MyClass tmp_0;
+              MyClass tmp_1;
+
+              MyClass_init(&tmp_0);
+              t = &tmp_0;
+              someFunc_MyClass(&tmp_1, t);
+              t2 = &tmp_1;
+            }
+
+        ''',
+    )
 
-    def test_some_bug(self):
-        ''' Process factorial func. '''
-        check_translation(
-            test_case=self,
-            input_mis_code='''
-                func start {
-                    print(fac())
-                    printNewLine()
-                    fac()
-                }
-                func fac -> Int {
-                    return 1
-                }
-            ''',
-            expected_c_code='''
-                void start(void);
-                void fac(Int* __result);
-
-                void start(void) {
-                  Int tmp_0;
-                  Int tmp_1;
-
-                  fac(&tmp_0);
-                  print_Int(&tmp_0);
-                  printNewLine();
-                  fac(&tmp_1);
-                }
+    test_var_decl_with_string_literal = _case(
+        input_mis_code='''
+            func start {
+              testVar ::= "some string"
+            }
+        ''',
+        expected_c_code='''
+            void start(void);
 
-                void fac(Int* __result) {
-                  Int const_0;
+            void start(void) {
+              String* testVar;
+              String tmp_0;
+              String const_0;
 
-                  const_0 = 1;
+              const_0 = "some string";
 
-                  *__result = const_0;
-                  return;
-                }
+              testVar = &tmp_0;
+              *testVar = const_0;
+            }
 
-            ''',
-            expected_stdout='1\n',
-        )
+        ''',
+    )
 
-    def test_two_vars_for_one_memory_location(self):
-        ''' Try to create two variables for one memory location. '''
-        check_translation(
-            test_case=self,
-            input_mis_code='''
-                func start {
-                    a := Int(1)
-                    print(a)
-                    printNewLine()
-                    b := a
-                    print(b)
-                    printNewLine()
-                    b = 2
-                    print(a)
-                    printNewLine()
-                }
-            ''',
-            expected_c_code='''
-                void start(void);
-
-                void start(void) {
-                  Int* a;
-                  Int* b;
-                  Int tmp_0;
-                  Int const_0;
-                  Int const_1;
-
-                  const_0 = 1;
-                  const_1 = 2;
-
-                  Int_Int_init(&tmp_0, &const_0);
-                  a = &tmp_0;
-                  print_Int(a);
-                  printNewLine();
-                  b = a;
-                  print_Int(b);
-                  printNewLine();
-                  *b = const_1;
-                  print_Int(a);
-                  printNewLine();
-                }
+    test_print_string_literal = _case(
+        input_mis_code='''
+            func start {
+              print("hello")
+              printNewLine()
+            }
+        ''',
+        expected_c_code='''
+            void start(void);
 
-            ''',
-            expected_stdout=(
-                '1\n'
-                '1\n'
-                '2\n'
-            ),
-        )
+            void start(void) {
+              String const_0;
 
-    def test_func_overloading_1(self):
-        check_translation(
-            test_case=self,
-            input_mis_code='''
-                func pr(n Int) {
-                  print(n)
-                }
-                func pr(s String) {
-                  print(s)
-                }
-                func start {
-                  pr(1)
-                  printNewLine()
-                  pr("str")
-                  printNewLine()
-                }
-            ''',
-            expected_c_code='''
-                void pr_Int(Int* n);
-                void pr_String(String* s);
-                void start(void);
-
-                void pr_Int(Int* n) {
-                  print_Int(n);
-                }
+              const_0 = "hello";
 
-                void pr_String(String* s) {
-                  print_String(s);
-                }
+              print_String(&const_0);
+              printNewLine();
+            }
 
-                void start(void) {
-                  Int const_0;
-                  String const_1;
+        ''',
+        expected_stdout='hello\n',
+    )
 
-                  const_0 = 1;
-                  const_1 = "str";
+    test_print_string_var = _case(
+        input_mis_code='''
+            func start {
+              testVar ::= "print this to console, please"
+              print(testVar)
+              printNewLine()
+            }
+        ''',
+        expected_c_code='''
+            void start(void);
+
+            void start(void) {
+              String* testVar;
+              String tmp_0;
+              String const_0;
+
+              const_0 = "print this to console, please";
+
+              testVar = &tmp_0;
+              *testVar = const_0;
+              print_String(testVar);
+              printNewLine();
+            }
+
+        ''',
+        expected_stdout='print this to console, please\n',
+    )
 
-                  pr_Int(&const_0);
-                  printNewLine();
-                  pr_String(&const_1);
-                  printNewLine();
-                }
+    test_basic_assignment_of_integer_literal = _case(
+        input_mis_code='''
+            func start {
+              testVar ::= 1 testVar = 2
+            }
+        ''',
+        expected_c_code='''
+            void start(void);
+
+            void start(void) {
+              Int* testVar;
+              Int tmp_0;
+              Int const_0;
+              Int const_1;
+
+              const_0 = 1;
+              const_1 = 2;
+
+              testVar = &tmp_0;
+              *testVar = const_0;
+              *testVar = const_1;
+            }
+
+        ''',
+    )
 
-            ''',
-            expected_stdout=(
-                '1\n'
-                'str\n'
-            ),
-        )
+    test_simple_loop_from_1_to_5 = _case(
+        input_mis_code='''
+            func start {
+              i ::= 0
+              for isLess(i 5) {
+                print(i)
+                printNewLine()
+                i = plus(i 1)
+              }
+            }
+        ''',
+        expected_c_code='''
+            void start(void);
+
+            void start(void) {
+              Int* i;
+              Int tmp_0;
+              Int tmp_1;
+              Int tmp_2;
+              Int const_0;
+              Int const_1;
+              Int const_2;
+
+              const_0 = 0;
+              const_1 = 5;
+              const_2 = 1;
+
+              i = &tmp_0;
+              *i = const_0;
+              while (1) {
+                tmp_1 = (*i < const_1);
+                if (!tmp_1) {
+                  break;
+                }
+                print_Int(i);
+                printNewLine();
+                tmp_2 = (*i + const_2);
+                *i = tmp_2;
+              }
+            }
+
+        ''',
+        expected_stdout=(
+            '0\n'
+            '1\n'
+            '2\n'
+            '3\n'
+            '4\n'
+        ),
+    )
 
-    def test_return_reference_1(self):
-        ''' Return reference to allocated on heap memory. '''
-        check_translation(
-            test_case=self,
-            input_mis_code='''
-                func start {
-                  a := allocInt()
-                  print(a)
-                  printNewLine()
-                  a = 1
-                  print(a)
-                  printNewLine()
-                }
-            ''',
-            expected_c_code='''
-                void start(void);
-
-                void start(void) {
-                  Int* a;
-                  Int* tmp_0;
-                  Int const_0;
-
-                  const_0 = 1;
-
-                  allocInt(&tmp_0);
-                  a = tmp_0;
-                  print_Int(a);
-                  printNewLine();
-                  *a = const_0;
-                  print_Int(a);
-                  printNewLine();
-                }
+    test_var_decl_with_func_call_returning_string = _case(
+        input_mis_code='''
+            func someString -> String {
+              return "hi"
+            }
+            func start {
+              s ::= someString()
+              print(s)
+              printNewLine()
+            }
+        ''',
+        expected_c_code='''
+            void someString(String* __result);
+            void start(void);
+
+            void someString(String* __result) {
+              String const_0;
+
+              const_0 = "hi";
+
+              *__result = const_0;
+              return;
+            }
+
+            void start(void) {
+              String* s;
+              String tmp_0;
+              String tmp_1;
+
+              s = &tmp_0;
+              someString(&tmp_1);
+              *s = tmp_1;
+              print_String(s);
+              printNewLine();
+            }
+
+        ''',
+        expected_stdout='hi\n',
+    )
 
-            ''',
-            expected_stdout=(
-                '0\n'
-                '1\n'
-            ),
-        )
+    test_nested_func_calls_with_strings = _case(
+        input_mis_code='''
+            func someString -> String {
+              return "hi"
+            }
+            func start {
+              print(someString())
+              printNewLine()
+            }
+        ''',
+        expected_c_code='''
+            void someString(String* __result);
+            void start(void);
+
+            void someString(String* __result) {
+              String const_0;
+
+              const_0 = "hi";
+
+              *__result = const_0;
+              return;
+            }
+
+            void start(void) {
+              String tmp_0;
+
+              someString(&tmp_0);
+              print_String(&tmp_0);
+              printNewLine();
+            }
+
+        ''',
+        expected_stdout='hi\n',
+    )
 
-    def test_fib_1(self):
-        ''' Process fib func. '''
-        check_translation(
-            test_case=self,
-            input_mis_code='''
-                func start {
-                  print(fib(10))
-                  printNewLine()
-                }
-                func fib (n Int) -> Int {
-                  if isLess(n 2) {
-                    return n
-                  } else {
-                    return plus (
-                      fib(minus(n 1))
-                      fib(minus(n 2))
-                    )
-                  }
-                }
-            ''',
-            expected_c_code='''
-                void start(void);
-                void fib_Int(Int* __result, Int* n);
+    test_var_decl_with_func_call_returning_integer = _case(
+        input_mis_code='''
+            func someNumber -> Int {
+              return 99
+            }
+            func start {
+              testVar ::= someNumber()
+            }
+        ''',
+        expected_c_code='''
+            void someNumber(Int* __result);
+            void start(void);
+
+            void someNumber(Int* __result) {
+              Int const_0;
+
+              const_0 = 99;
+
+              *__result = const_0;
+              return;
+            }
+
+            void start(void) {
+              Int* testVar;
+              Int tmp_0;
+              Int tmp_1;
+
+              testVar = &tmp_0;
+              someNumber(&tmp_1);
+              *testVar = tmp_1;
+            }
+
+        ''',
+    )
 
-                void start(void) {
-                  Int tmp_0;
-                  Int const_0;
+    test_comparison_operators = _case(
+        input_mis_code='''
+            func start {
+              print(isGreater(2 1))
+              print(isGreater(1 2))
+              print(isLess(1 2))
+              printNewLine()
+            }
+        ''',
+        expected_c_code='''
+            void start(void);
+
+            void start(void) {
+              Int tmp_0;
+              Int tmp_1;
+              Int tmp_2;
+              Int const_0;
+              Int const_1;
+              Int const_2;
+              Int const_3;
+              Int const_4;
+              Int const_5;
+
+              const_0 = 2;
+              const_1 = 1;
+              const_2 = 1;
+              const_3 = 2;
+              const_4 = 1;
+              const_5 = 2;
+
+              tmp_0 = (const_0 > const_1);
+              print_Int(&tmp_0);
+              tmp_1 = (const_2 > const_3);
+              print_Int(&tmp_1);
+              tmp_2 = (const_4 < const_5);
+              print_Int(&tmp_2);
+              printNewLine();
+            }
+
+        ''',
+        expected_stdout='101\n',
+    )
 
-                  const_0 = 10;
+    test_simple_func_1 = _case(
+        input_mis_code='''
+            func start {
+              print(minus(666 99))
+              printNewLine()
+            }
+        ''',
+        expected_c_code='''
+            void start(void);
+
+            void start(void) {
+              Int tmp_0;
+              Int const_0;
+              Int const_1;
+
+              const_0 = 666;
+              const_1 = 99;
+
+              tmp_0 = (const_0 - const_1);
+              print_Int(&tmp_0);
+              printNewLine();
+            }
+
+        ''',
+        expected_stdout='567\n',
+    )
 
-                  fib_Int(&tmp_0, &const_0);
-                  print_Int(&tmp_0);
-                  printNewLine();
-                }
+    test_simple_func_2 = _case(
+        input_mis_code='''
+            func someNumber -> Int {
+              return 99
+            }
+            func start {
+              print(minus(666 someNumber()))
+              printNewLine()
+            }
+        ''',
+        expected_c_code='''
+            void someNumber(Int* __result);
+            void start(void);
+
+            void someNumber(Int* __result) {
+              Int const_0;
+
+              const_0 = 99;
+
+              *__result = const_0;
+              return;
+            }
+
+            void start(void) {
+              Int tmp_0;
+              Int tmp_1;
+              Int const_0;
+
+              const_0 = 666;
+
+              someNumber(&tmp_0);
+              tmp_1 = (const_0 - tmp_0);
+              print_Int(&tmp_1);
+              printNewLine();
+            }
+
+        ''',
+        expected_stdout='567\n',
+    )
 
-                void fib_Int(Int* __result, Int* n) {
-                  Int tmp_0;
-                  Int tmp_1;
-                  Int tmp_2;
-                  Int tmp_3;
-                  Int tmp_4;
-                  Int tmp_5;
-                  Int const_0;
-                  Int const_1;
-                  Int const_2;
-
-                  const_0 = 2;
-                  const_1 = 1;
-                  const_2 = 2;
-
-                  isLess_Int_Int(&tmp_0, n, &const_0);
-                  if (tmp_0) {
-                    *__result = *n;
-                    return;
-                  } else {
-                    minus_Int_Int(&tmp_1, n, &const_1);
-                    fib_Int(&tmp_2, &tmp_1);
-                    minus_Int_Int(&tmp_3, n, &const_2);
-                    fib_Int(&tmp_4, &tmp_3);
-                    plus_Int_Int(&tmp_5, &tmp_2, &tmp_4);
-                    *__result = tmp_5;
-                    return;
-                  }
-                }
+    test_simple_func_3 = _case(
+        input_mis_code='''
+            func someNumber -> Int {
+              return minus(100 1)
+            }
+            func start {
+              print(
+                minus(666 someNumber())
+              )
+              printNewLine()
+            }
+        ''',
+        expected_c_code='''
+            void someNumber(Int* __result);
+            void start(void);
+
+            void someNumber(Int* __result) {
+              Int tmp_0;
+              Int const_0;
+              Int const_1;
+
+              const_0 = 100;
+              const_1 = 1;
+
+              tmp_0 = (const_0 - const_1);
+              *__result = tmp_0;
+              return;
+            }
+
+            void start(void) {
+              Int tmp_0;
+              Int tmp_1;
+              Int const_0;
+
+              const_0 = 666;
+
+              someNumber(&tmp_0);
+              tmp_1 = (const_0 - tmp_0);
+              print_Int(&tmp_1);
+              printNewLine();
+            }
+
+        ''',
+        expected_stdout='567\n',
+    )
 
-            ''',
-            expected_stdout='55\n',
-        )
+    test_simple_func_4 = _case(
+        input_mis_code='''
+            func someNumber (xxx Int) -> Int {
+              return minus(100 xxx)
+            }
+            func start {
+              print(
+                minus(666 someNumber(1))
+              )
+              printNewLine()
+            }
+        ''',
+        expected_c_code='''
+            void someNumber_Int(Int* __result, Int* xxx);
+            void start(void);
+
+            void someNumber_Int(Int* __result, Int* xxx) {
+              Int tmp_0;
+              Int const_0;
+
+              const_0 = 100;
+
+              tmp_0 = (const_0 - *xxx);
+              *__result = tmp_0;
+              return;
+            }
+
+            void start(void) {
+              Int tmp_0;
+              Int tmp_1;
+              Int const_0;
+              Int const_1;
+
+              const_0 = 666;
+              const_1 = 1;
+
+              someNumber_Int(&tmp_0, &const_1);
+              tmp_1 = (const_0 - tmp_0);
+              print_Int(&tmp_1);
+              printNewLine();
+            }
+
+        ''',
+        expected_stdout='567\n',
+    )
 
-    def test_factorial_1(self):
-        ''' Process factorial func. '''
-        check_translation(
-            test_case=self,
-            input_mis_code='''
-                func start {
-                  print(fac(3))
-                  printNewLine()
-                }
-                func fac (n Int) -> Int {
-                  if isEqual(n 0) {
-                    return 1
-                  }
-                  return multiply(
-                    fac(minus(n 1))
-                    n
-                  )
-                }
-            ''',
-            expected_c_code='''
-                void start(void);
-                void fac_Int(Int* __result, Int* n);
+    # Process factorial func.
+    test_some_bug = _case(
+        input_mis_code='''
+            func start {
+                print(fac())
+                printNewLine()
+                fac()
+            }
+            func fac -> Int {
+                return 1
+            }
+        ''',
+        expected_c_code='''
+            void start(void);
+            void fac(Int* __result);
+
+            void start(void) {
+              Int tmp_0;
+              Int tmp_1;
+
+              fac(&tmp_0);
+              print_Int(&tmp_0);
+              printNewLine();
+              fac(&tmp_1);
+            }
+
+            void fac(Int* __result) {
+              Int const_0;
+
+              const_0 = 1;
+
+              *__result = const_0;
+              return;
+            }
+
+        ''',
+        expected_stdout='1\n',
+    )
 
-                void start(void) {
-                  Int tmp_0;
-                  Int const_0;
+    # Try to create two variables for one memory location.
+    test_two_vars_for_one_memory_location = _case(
+        input_mis_code='''
+            func start {
+                a := Int(1)
+                print(a)
+                printNewLine()
+                b := a
+                print(b)
+                printNewLine()
+                b = 2
+                print(a)
+                printNewLine()
+            }
+        ''',
+        expected_c_code='''
+            void start(void);
+
+            void start(void) {
+              Int* a;
+              Int* b;
+              Int tmp_0;
+              Int const_0;
+              Int const_1;
+
+              const_0 = 1;
+              const_1 = 2;
+
+              tmp_0 = const_0;
+              a = &tmp_0;
+              print_Int(a);
+              printNewLine();
+              b = a;
+              print_Int(b);
+              printNewLine();
+              *b = const_1;
+              print_Int(a);
+              printNewLine();
+            }
+
+        ''',
+        expected_stdout=(
+            '1\n'
+            '1\n'
+            '2\n'
+        ),
+    )
 
-                  const_0 = 3;
+    test_func_overloading_1 = _case(
+        input_mis_code='''
+            func pr(n Int) {
+              print(n)
+            }
+            func pr(s String) {
+              print(s)
+            }
+            func start {
+              pr(1)
+              printNewLine()
+              pr("str")
+              printNewLine()
+            }
+        ''',
+        expected_c_code='''
+            void pr_Int(Int* n);
+            void pr_String(String* s);
+            void start(void);
+
+            void pr_Int(Int* n) {
+              print_Int(n);
+            }
+
+            void pr_String(String* s) {
+              print_String(s);
+            }
+
+            void start(void) {
+              Int const_0;
+              String const_1;
+
+              const_0 = 1;
+              const_1 = "str";
+
+              pr_Int(&const_0);
+              printNewLine();
+              pr_String(&const_1);
+              printNewLine();
+            }
+
+        ''',
+        expected_stdout=(
+            '1\n'
+            'str\n'
+        ),
+    )
 
-                  fac_Int(&tmp_0, &const_0);
-                  print_Int(&tmp_0);
-                  printNewLine();
-                }
+    # Return reference to allocated on heap memory.
+    test_return_reference_1 = _case(
+        input_mis_code='''
+            func start {
+              a := allocInt()
+              print(a)
+              printNewLine()
+              a = 1
+              print(a)
+              printNewLine()
+            }
+        ''',
+        expected_c_code='''
+            void start(void);
+
+            void start(void) {
+              Int* a;
+              Int* tmp_0;
+              Int const_0;
+
+              const_0 = 1;
+
+              allocInt(&tmp_0);
+              a = tmp_0;
+              print_Int(a);
+              printNewLine();
+              *a = const_0;
+              print_Int(a);
+              printNewLine();
+            }
+
+        ''',
+        expected_stdout=(
+            '0\n'
+            '1\n'
+        ),
+    )
 
-                void fac_Int(Int* __result, Int* n) {
-                  Int tmp_0;
-                  Int tmp_1;
-                  Int tmp_2;
-                  Int tmp_3;
-                  Int const_0;
-                  Int const_1;
-                  Int const_2;
-
-                  const_0 = 0;
-                  const_1 = 1;
-                  const_2 = 1;
-
-                  isEqual_Int_Int(&tmp_0, n, &const_0);
-                  if (tmp_0) {
-                    *__result = const_1;
-                    return;
-                  }
-                  minus_Int_Int(&tmp_1, n, &const_2);
-                  fac_Int(&tmp_2, &tmp_1);
-                  multiply_Int_Int(&tmp_3, &tmp_2, n);
-                  *__result = tmp_3;
-                  return;
-                }
+    # Process fib func.
+    test_fib_1 = _case(
+        input_mis_code='''
+            func start {
+              print(fib(10))
+              printNewLine()
+            }
+            func fib (n Int) -> Int {
+              if isLess(n 2) {
+                return n
+              } else {
+                return plus (
+                  fib(minus(n 1))
+                  fib(minus(n 2))
+                )
+              }
+            }
+        ''',
+        expected_c_code='''
+            void start(void);
+            void fib_Int(Int* __result, Int* n);
+
+            void start(void) {
+              Int tmp_0;
+              Int const_0;
+
+              const_0 = 10;
+
+              fib_Int(&tmp_0, &const_0);
+              print_Int(&tmp_0);
+              printNewLine();
+            }
+
+            void fib_Int(Int* __result, Int* n) {
+              Int tmp_0;
+              Int tmp_1;
+              Int tmp_2;
+              Int tmp_3;
+              Int tmp_4;
+              Int tmp_5;
+              Int const_0;
+              Int const_1;
+              Int const_2;
+
+              const_0 = 2;
+              const_1 = 1;
+              const_2 = 2;
+
+              tmp_0 = (*n < const_0);
+              if (tmp_0) {
+                *__result = *n;
+                return;
+              } else {
+                tmp_1 = (*n - const_1);
+                fib_Int(&tmp_2, &tmp_1);
+                tmp_3 = (*n - const_2);
+                fib_Int(&tmp_4, &tmp_3);
+                tmp_5 = (tmp_2 + tmp_4);
+                *__result = tmp_5;
+                return;
+              }
+            }
+
+        ''',
+        expected_stdout='55\n',
+    )
 
-            ''',
-            expected_stdout='6\n',
-        )
+    # Process factorial func.
+    test_factorial_1 = _case(
+        input_mis_code='''
+            func start {
+              print(fac(3))
+              printNewLine()
+            }
+            func fac (n Int) -> Int {
+              if isEqual(n 0) {
+                return 1
+              }
+              return multiply(
+                fac(minus(n 1))
+                n
+              )
+            }
+        ''',
+        expected_c_code='''
+            void start(void);
+            void fac_Int(Int* __result, Int* n);
+
+            void start(void) {
+              Int tmp_0;
+              Int const_0;
+
+              const_0 = 3;
+
+              fac_Int(&tmp_0, &const_0);
+              print_Int(&tmp_0);
+              printNewLine();
+            }
+
+            void fac_Int(Int* __result, Int* n) {
+              Int tmp_0;
+              Int tmp_1;
+              Int tmp_2;
+              Int tmp_3;
+              Int const_0;
+              Int const_1;
+              Int const_2;
+
+              const_0 = 0;
+              const_1 = 1;
+              const_2 = 1;
+
+              tmp_0 = (*n == const_0);
+              if (tmp_0) {
+                *__result = const_1;
+                return;
+              }
+              tmp_1 = (*n - const_2);
+              fac_Int(&tmp_2, &tmp_1);
+              tmp_3 = (tmp_2 * *n);
+              *__result = tmp_3;
+              return;
+            }
+
+        ''',
+        expected_stdout='6\n',
+    )
 
 # vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
@@ -13,9 +13,15 @@ from misery import (
     generator,
     datatype,
     ident_table,
+    parse,
+    testutil,
 )
 
 
+def setUpModule():
+    testutil.use_tmp_cache_dir()
+
+
 def check_translation(test_case, input_ast, expected_output):
     ''' Small helper func. '''
     input_ast.ident_list = ident_table.ident_table(input_ast)
@@ -92,7 +98,7 @@ class TestGenerator(unittest.TestCase):
                   const_0 = 1;
                   const_1 = 2;
 
-                  plus_Int_Int(&tmp_0, &const_0, &const_1);
+                  tmp_0 = (const_0 + const_1);
                   print_Int(&tmp_0);
                 }
 
@@ -145,8 +151,8 @@ class TestGenerator(unittest.TestCase):
                   const_1 = 2;
                   const_2 = 3;
 
-                  plus_Int_Int(&tmp_0, &const_1, &const_2);
-                  plus_Int_Int(&tmp_1, &const_0, &tmp_0);
+                  tmp_0 = (const_1 + const_2);
+                  tmp_1 = (const_0 + tmp_0);
                   print_Int(&tmp_1);
                 }
 
@@ -175,6 +181,27 @@ class TestGenerator(unittest.TestCase):
         real_output = generator_.generate_full()
         self.assertNotEqual('', real_output)
 
+    def test_uses_marked_out_signatures(self):
+        ''' Generator does not resolve func calls again. '''
+        input_ast = ast.Module(
+            decl_list=[
+                ast.FuncDecl(
+                    name='start',
+                    signature=ast.FuncSignature(),
+                    body=[
+                        ast.FuncCall(
+                            expr=ast.Ident('printNewLine'),
+                        ),
+                    ],
+                ),
+            ]
+        )
+        input_ast.ident_list = ident_table.ident_table(input_ast)
+        marked_out_ast = datatype.mark_out_datatypes(input_ast)
+        marked_out_ast.ident_list = {}
+        generator_ = generator.Generator(marked_out_ast)
+        self.assertIn('  printNewLine();\n', generator_.generate())
+
     def test_multiply_func_params(self):
         check_translation(
             test_case=self,
@@ -186,11 +213,11 @@ class TestGenerator(unittest.TestCase):
                             param_list=[
                                 ast.Param(
                                     name='n1',
-                                    datatype=ast.Ident('Int')
+                                    datatype=datatype.SimpleDataType('Int'),
                                 ),
                                 ast.Param(
                                     name='n2',
-                                    datatype=ast.Ident('Int')
+                                    datatype=datatype.SimpleDataType('Int'),
                                 ),
                             ],
                         ),
@@ -320,4 +347,65 @@ class TestGenerator(unittest.TestCase):
         )
 
 
+class TestPassByValue(unittest.TestCase):
+
+    def _generate(self, input_mis_code):
+        ast_ = parse.parse(textwrap.dedent(input_mis_code))
+        ast_.ident_list = ident_table.ident_table(ast_)
+        ast_ = datatype.mark_out_datatypes(ast_)
+        return generator.Generator(ast_, pass_by_value=True).generate()
+
+    def test_return_value(self):
+        misc.assert_equal(
+            self,
+            textwrap.dedent('''
+                Int inc_Int(Int n);
+
+                Int inc_Int(Int n) {
+                  Int tmp_0;
+                  Int const_0;
+
+                  const_0 = 1;
+
+                  tmp_0 = (n + const_0);
+                  return tmp_0;
+                }
+
+            '''),
+            self._generate('''
+                func inc (n Int) -> Int {
+                  return plus(n 1)
+                }
+            '''),
+        )
+
+    def test_var_is_passed_by_value(self):
+        c_code = self._generate('''
+            func start {
+              a ::= 1
+              print(a)
+            }
+        ''')
+        self.assertIn('  print_Int(*a);\n', c_code)
+
+    def test_assign_to_param_error(self):
+        self.assertRaisesRegex(
+            Exception,
+            'Can not assign to param passed by value'
+            ' or to its alias: \'m\'',
+            self._generate,
+            '''
+                func change (n Int) {
+                  m := n
+                  m = 2
+                }
+            ''',
+        )
+
+    def test_runtime_header(self):
+        header = generator.Generator.runtime_header(pass_by_value=True)
+        self.assertIn('void print_Int(Int n);\n', header)
+        self.assertNotIn('plus_Int_Int', header)
+
+
 # vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
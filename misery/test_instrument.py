@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for copyright and license details
+
+
+''' Test 'instrument' module. '''
+
+
+import unittest
+from misery import (
+    instrument,
+)
+
+
+class _Recorder(instrument.Listener):
+
+    def __init__(self):
+        self.event_list = []
+
+    def phase_start(self, name, detail):
+        self.event_list.append(('start', name, detail))
+
+    def phase_end(self, name, detail):
+        self.event_list.append(('end', name, detail))
+
+    def count(self, name, value):
+        self.event_list.append(('count', name, value))
+
+
+class TestListener(unittest.TestCase):
+
+    def test_events(self):
+        with instrument.listening(_Recorder()) as recorder:
+            with instrument.phase('outer'):
+                with instrument.phase('inner', 'f'):
+                    instrument.count('x', 2)
+        self.assertEqual(
+            [
+                ('start', 'outer', None),
+                ('start', 'inner', 'f'),
+                ('count', 'x', 2),
+                ('end', 'inner', 'f'),
+                ('end', 'outer', None),
+            ],
+            recorder.event_list,
+        )
+
+    def test_listener_is_removed(self):
+        with instrument.listening(_Recorder()) as recorder:
+            self.assertTrue(instrument.is_enabled())
+        self.assertFalse(instrument.is_enabled())
+        with instrument.phase('outer'):
+            instrument.count('x')
+        self.assertEqual([], recorder.event_list)
+
+    def test_phase_ends_on_error(self):
+        with instrument.listening(_Recorder()) as recorder:
+            with self.assertRaises(ZeroDivisionError):
+                with instrument.phase('bad'):
+                    1 / 0
+        self.assertEqual(('end', 'bad', None), recorder.event_list[-1])
+
+
+class TestPhaseTimer(unittest.TestCase):
+
+    def test_only_outermost_phases_are_recorded(self):
+        with instrument.listening(instrument.PhaseTimer()) as timer:
+            with instrument.phase('parse'):
+                with instrument.phase('lex'):
+                    pass
+            with instrument.phase('generate'):
+                pass
+        self.assertEqual(
+            ['parse', 'generate'],
+            [name for name, _ in timer.phase_list],
+        )
+
+    def test_phase_is_recorded_on_error(self):
+        with instrument.listening(instrument.PhaseTimer()) as timer:
+            with self.assertRaises(ZeroDivisionError):
+                with instrument.phase('bad'):
+                    1 / 0
+        self.assertEqual(['bad'], [name for name, _ in timer.phase_list])
+
+    def test_report(self):
+        report = instrument.format_phase_report(
+            [('parse', 1.0), ('cc', 0.5), ('parse', 1.0)])
+        self.assertEqual(
+            'parse                   2.000 s\n'
+            'cc                      0.500 s\n'
+            'total                   2.500 s\n',
+            report,
+        )
+
+
+class TestReporter(unittest.TestCase):
+
+    def _report(self):
+        reporter = instrument.Reporter()
+        try:
+            with instrument.listening(reporter):
+                with instrument.phase('generate'):
+                    for name in ('f', 'g'):
+                        with instrument.phase('generate', name):
+                            instrument.count('tmp vars', 3)
+                            [0] * 10000
+        finally:
+            reporter.close()
+        return reporter
+
+    def test_phases(self):
+        reporter = self._report()
+        self.assertEqual(['generate'], list(reporter.phases))
+        self.assertEqual(1, reporter.phases['generate'].calls)
+
+    def test_decls(self):
+        reporter = self._report()
+        self.assertEqual(
+            [('generate', 'f'), ('generate', 'g')],
+            list(reporter.decls),
+        )
+        stat = reporter.decls[('generate', 'f')]
+        self.assertGreater(stat.peak_memory, 0)
+        self.assertGreaterEqual(
+            reporter.phases['generate'].peak_memory,
+            stat.peak_memory,
+        )
+
+    def test_counters(self):
+        self.assertEqual({'tmp vars': 6}, dict(self._report().counters))
+
+    def test_report(self):
+        report = self._report().report()
+        self.assertRegex(report, '(?m)^generate +1 ')
+        self.assertRegex(report, '(?m)^f: generate +1 ')
+        self.assertRegex(report, '(?m)^tmp vars +6$')
+
+
+# vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for copyright and license details
+
+
+''' Test 'intrinsics' module. '''
+
+
+import unittest
+from misery import (
+    ast,
+    datatype,
+    intrinsics,
+)
+
+
+class TestIntrinsics(unittest.TestCase):
+
+    def test_ident_list(self):
+        ident_list = intrinsics.ident_list()
+        self.assertIsInstance(ident_list['plus'], ast.FuncSignature)
+        self.assertEqual(2, len(ident_list['print']))
+
+    def test_ident_list_gives_new_signatures(self):
+        self.assertIsNot(
+            intrinsics.ident_list()['plus'],
+            intrinsics.ident_list()['plus'],
+        )
+
+    def test_find(self):
+        signature = ast.FuncSignature(
+            param_list=[
+                ast.Param(name='x', datatype=datatype.int_datatype),
+                ast.Param(name='y', datatype=datatype.int_datatype),
+            ],
+        )
+        intrinsic = intrinsics.find('isGreater', signature)
+        self.assertEqual('(2 > 1)', intrinsic.format_c_expr(['2', '1']))
+        self.assertEqual(1, intrinsic.fold(2, 1))
+        self.assertIsNone(intrinsics.find('someFunc', signature))
+
+    def test_find_overload(self):
+        signature = ast.FuncSignature(
+            param_list=[
+                ast.Param(name='s', datatype=datatype.string_datatype),
+            ],
+        )
+        intrinsic = intrinsics.find('print', signature)
+        self.assertEqual('printf("%s", s)', intrinsic.format_c_expr(['s']))
+
+    def test_wrap_int(self):
+        self.assertEqual(-2 ** 31, intrinsics.wrap_int(2 ** 31))
+
+    def test_runtime_funcs(self):
+        runtime_funcs = intrinsics.runtime_funcs()
+        self.assertIn(
+            'void print_Int(Int* n) {\n'
+            '  printf("%d", *n);\n'
+            '}\n',
+            runtime_funcs,
+        )
+        self.assertIn(
+            'void allocInt(Int** __result) {\n'
+            '  *__result = (Int*)calloc(1, sizeof(Int));\n'
+            '}\n',
+            runtime_funcs,
+        )
+        self.assertNotIn('plus', runtime_funcs)
+
+    def test_runtime_funcs_by_value(self):
+        runtime_funcs = intrinsics.runtime_funcs(pass_by_value=True)
+        self.assertIn('void print_Int(Int n) {\n', runtime_funcs)
+        self.assertIn('void allocInt(Int** __result) {\n', runtime_funcs)
+
+    def test_runtime_prototypes_match_funcs(self):
+        prototypes = intrinsics.runtime_prototypes()
+        self.assertIn('void printNewLine(void);\n', prototypes)
+        runtime_funcs = intrinsics.runtime_funcs()
+        for prototype in prototypes.splitlines():
+            self.assertIn(prototype[:-len(';')] + ' {\n', runtime_funcs)
+
+
+# vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
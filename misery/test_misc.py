@@ -7,6 +7,7 @@
 
 import unittest
 from misery import (
+    ast,
     misc,
 )
 
@@ -172,6 +173,56 @@ class TestPrettyPrinter(unittest.TestCase):
         real_output = misc.pretty_print(input_data)
         self.assertEqual(expected_output, real_output)
 
+    def test_object_with_slots(self):
+        ''' Print object with fields declared in __slots__. '''
+        class BaseClass(object):
+            __slots__ = ('field2',)
+
+        class TestClass(BaseClass):
+            __slots__ = ('field1',)
+
+            def __init__(self):
+                self.field1 = 1
+                self.field2 = 'hi'
+        input_data = TestClass()
+        expected_output = (
+            'TestClass(\n'
+            '    field1=1,\n'
+            '    field2=\"hi\",\n'
+            ')'
+        )
+        real_output = misc.pretty_print(input_data)
+        self.assertEqual(expected_output, real_output)
+
+    def test_ast_node(self):
+        ''' Print ast node. '''
+        input_data = ast.Ident(name='x')
+        expected_output = 'Ident(name=\"x\")'
+        real_output = misc.pretty_print(input_data)
+        self.assertEqual(expected_output, real_output)
+
+
+class TestObjectFields(unittest.TestCase):
+    ''' Test misc.object_fields func. '''
+
+    def test_ast_nodes_have_no_dict(self):
+        ''' Ast nodes store fields in slots only. '''
+        node = ast.FuncCall(expr=ast.Ident('f'))
+        self.assertFalse(hasattr(node, '__dict__'))
+        expected_output = [
+            ('arg_list', []),
+            ('binded_var_name', None),
+            ('called_expr', node.called_expr),
+            ('signature', None),
+        ]
+        self.assertEqual(expected_output, misc.object_fields(node))
+
+    def test_diff_ast_nodes(self):
+        ''' Diff shows changed node field. '''
+        real_output = misc.diff(ast.Number(1), ast.Number(2))
+        self.assertIn('-    value=1,', real_output)
+        self.assertIn('+    value=2,', real_output)
+
 
 class TestCaseMock:
 
@@ -282,5 +333,4 @@ class TestTolist(unittest.TestCase):
         )
 
 
-
 # vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
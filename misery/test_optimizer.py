@@ -0,0 +1,551 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for copyright and license details
+
+
+''' Test 'optimizer' module. '''
+
+
+import textwrap
+import unittest
+from misery import (
+    datatype,
+    driver,
+    ident_table,
+    misc,
+    optimizer,
+    parse,
+    testutil,
+)
+
+
+def setUpModule():
+    testutil.use_tmp_cache_dir()
+
+
+def _optimized_c(input_mis_code, pass_by_value=False):
+    generator_ = driver.translate(
+        textwrap.dedent(input_mis_code),
+        optimize=True,
+        pass_by_value=pass_by_value,
+    )
+    return generator_.generate()
+
+
+class TestFoldConstants(unittest.TestCase):
+
+    def test_nested_calls(self):
+        misc.assert_equal(
+            self,
+            textwrap.dedent('''
+                void start(void);
+
+                void start(void) {
+                  Int const_4;
+
+                  const_4 = 14;
+
+                  print_Int(&const_4);
+                }
+
+            '''),
+            _optimized_c('''
+                func start {
+                  print(plus(2 multiply(3 4)))
+                }
+            '''),
+        )
+
+    def test_int_wraps_around(self):
+        c_code = _optimized_c('''
+            func start {
+              print(plus(2147483647 1))
+            }
+        ''')
+        self.assertIn('= -2147483648;', c_code)
+        self.assertNotIn(' + ', c_code)
+
+    def test_comparison(self):
+        c_code = _optimized_c('''
+            func start {
+              print(isEqual(minus(5 2) 3))
+            }
+        ''')
+        self.assertIn('= 1;', c_code)
+        self.assertNotIn(' == ', c_code)
+
+    def test_is_greater(self):
+        c_code = _optimized_c('''
+            func start {
+              print(isGreater(2 1))
+            }
+        ''')
+        self.assertIn('= 1;', c_code)
+        self.assertNotIn(' > ', c_code)
+
+    def test_unused_call_result(self):
+        c_code = _optimized_c('''
+            func start {
+              plus(1 2)
+            }
+        ''')
+        self.assertNotIn(' + ', c_code)
+
+    def test_var_with_call_result_is_kept(self):
+        c_code = _optimized_c('''
+            func start {
+              a := plus(1 2)
+              print(a)
+            }
+        ''')
+        self.assertIn(' + ', c_code)
+
+    def test_given_ast_is_not_changed(self):
+        ast_ = parse.parse('func start { print(plus(1 2)) }')
+        ast_.ident_list = ident_table.ident_table(ast_)
+        ast_ = datatype.mark_out_datatypes(ast_)
+        optimizer.optimize(ast_)
+        func_decl = ast_.decl_list[0]
+        self.assertEqual(['tmp_0'], list(func_decl.tmp_vars))
+        self.assertEqual(2, len(func_decl.constants))
+        plus_call = func_decl.body[0].arg_list[0]
+        self.assertEqual('plus', plus_call.called_expr.name)
+
+
+class TestPropagateConstants(unittest.TestCase):
+
+    def test_var(self):
+        misc.assert_equal(
+            self,
+            textwrap.dedent('''
+                void start(void);
+
+                void start(void) {
+                  Int const_6;
+
+                  const_6 = 6;
+
+                  print_Int(&const_6);
+                }
+
+            '''),
+            _optimized_c('''
+                func start {
+                  a ::= 5
+                  if isLess(a 3) {
+                    print(1)
+                  } else {
+                    print(plus(a 1))
+                  }
+                }
+            '''),
+        )
+
+    def test_constant_is_shared(self):
+        misc.assert_equal(
+            self,
+            textwrap.dedent('''
+                void start(void);
+
+                void start(void) {
+                  Int const_1;
+
+                  const_1 = 3;
+
+                  print_Int(&const_1);
+                  print_Int(&const_1);
+                }
+
+            '''),
+            _optimized_c('''
+                func start {
+                  a ::= 3
+                  print(a)
+                  print(a)
+                }
+            '''),
+        )
+
+    def test_arg_of_user_func_has_own_constant(self):
+        c_code = _optimized_c('''
+            func change (n Int) {
+              n = 2
+            }
+            func start {
+              change(plus(1 1))
+              print(plus(1 1))
+            }
+        ''')
+        self.assertIn('change_Int(&const_4);', c_code)
+        self.assertIn('print_Int(&const_5);', c_code)
+
+    def test_chain_of_vars(self):
+        c_code = _optimized_c('''
+            func start {
+              a ::= plus(1 2)
+              b ::= multiply(a a)
+              print(minus(b 1))
+            }
+        ''')
+        self.assertIn('= 8;', c_code)
+        self.assertNotIn(' * ', c_code)
+        self.assertNotIn(' - ', c_code)
+
+    def test_assigned_var(self):
+        c_code = _optimized_c('''
+            func start {
+              a ::= 1
+              a = 2
+              print(plus(a 1))
+            }
+        ''')
+        self.assertIn(' + ', c_code)
+
+    def test_var_passed_to_func(self):
+        c_code = _optimized_c('''
+            func change (n Int) {
+              n = 2
+            }
+            func start {
+              a ::= 1
+              change(a)
+              print(plus(a 1))
+            }
+        ''')
+        self.assertIn(' + ', c_code)
+
+    def test_aliased_var(self):
+        c_code = _optimized_c('''
+            func start {
+              a ::= 1
+              b := a
+              b = 2
+              print(plus(a 1))
+            }
+        ''')
+        self.assertIn(' + ', c_code)
+
+
+class TestPruneBranches(unittest.TestCase):
+
+    def test_if_true(self):
+        c_code = _optimized_c('''
+            func start {
+              if isLess(1 2) {
+                print("yes")
+              } else {
+                print("no")
+              }
+            }
+        ''')
+        self.assertNotIn('if (', c_code)
+        self.assertIn('"yes"', c_code)
+        self.assertNotIn('"no"', c_code)
+
+    def test_if_false_without_else(self):
+        c_code = _optimized_c('''
+            func start {
+              if isEqual(1 2) {
+                print("yes")
+              }
+              printNewLine()
+            }
+        ''')
+        self.assertNotIn('if (', c_code)
+        self.assertNotIn('"yes"', c_code)
+
+    def test_false_loop(self):
+        c_code = _optimized_c('''
+            func start {
+              for isLess(2 1) {
+                print(1)
+              }
+            }
+        ''')
+        self.assertNotIn('while', c_code)
+
+    def test_loop_with_changed_var(self):
+        c_code = _optimized_c('''
+            func start {
+              i ::= 0
+              for isLess(i 3) {
+                i = plus(i 1)
+              }
+            }
+        ''')
+        self.assertIn('tmp_1 = (*i < const_1);', c_code)
+
+
+class TestMarkTailCalls(unittest.TestCase):
+
+    def test_self_call(self):
+        misc.assert_equal(
+            self,
+            textwrap.dedent('''
+                void count_Int(Int* __result, Int* n);
+
+                void count_Int(Int* __result, Int* n) {
+                  Int tmp_0;
+                  Int const_0;
+                  Int const_1;
+                  Int __tail_n;
+
+                begin:
+                  const_0 = 0;
+                  const_1 = 1;
+
+                  tmp_0 = (*n == const_0);
+                  if (tmp_0) {
+                    *__result = *n;
+                    return;
+                  }
+                  tmp_0 = (*n - const_1);
+                  __tail_n = tmp_0;
+                  n = &__tail_n;
+                  goto begin;
+                }
+
+            '''),
+            _optimized_c('''
+                func count (n Int) -> Int {
+                  if isEqual(n 0) {
+                    return n
+                  }
+                  return count(minus(n 1))
+                }
+            '''),
+        )
+
+    def test_pass_by_value(self):
+        c_code = _optimized_c('''
+            func count (n Int) -> Int {
+              if isEqual(n 0) {
+                return n
+              }
+              return count(minus(n 1))
+            }
+        ''', pass_by_value=True)
+        self.assertIn('  n = tmp_0;\n  goto begin;\n', c_code)
+        self.assertNotIn('__tail_n', c_code)
+
+    def test_unchanged_param_has_no_slot(self):
+        c_code = _optimized_c('''
+            func f (n Int, m Int) -> Int {
+              if isEqual(n 0) {
+                return m
+              }
+              return f(minus(n 1) m)
+            }
+        ''')
+        self.assertIn('goto begin;', c_code)
+        self.assertNotIn('__tail_m', c_code)
+
+    def test_local_var_arg(self):
+        c_code = _optimized_c('''
+            func f (n Int, m Int) -> Int {
+              if isEqual(n 0) {
+                return m
+              }
+              a ::= plus(m n)
+              return f(minus(n 1) a)
+            }
+        ''')
+        self.assertIn('__tail_m = *a;', c_code)
+
+    def test_call_of_other_func(self):
+        c_code = _optimized_c('''
+            func g (n Int) -> Int {
+              return n
+            }
+            func f (n Int) -> Int {
+              return g(minus(n 1))
+            }
+        ''')
+        self.assertNotIn('goto', c_code)
+
+    def test_swapped_params(self):
+        c_code = _optimized_c('''
+            func f (n Int, m Int) -> Int {
+              if isEqual(n 0) {
+                return m
+              }
+              return f(m n)
+            }
+        ''')
+        self.assertNotIn('goto', c_code)
+
+    def test_param_alias(self):
+        c_code = _optimized_c('''
+            func f (n Int) -> Int {
+              if isEqual(n 0) {
+                return n
+              }
+              a := n
+              return f(a)
+            }
+        ''')
+        self.assertNotIn('goto', c_code)
+
+    def test_given_ast_is_not_changed(self):
+        ast_ = parse.parse(textwrap.dedent('''
+            func f (n Int) -> Int {
+              return f(n)
+            }
+        '''))
+        ast_.ident_list = ident_table.ident_table(ast_)
+        ast_ = datatype.mark_out_datatypes(ast_)
+        marked_ast = optimizer.mark_tail_calls(ast_)
+        self.assertTrue(marked_ast.decl_list[0].body[0].is_tail_call)
+        self.assertFalse(ast_.decl_list[0].body[0].is_tail_call)
+
+
+class TestEliminateDeadCode(unittest.TestCase):
+
+    def test_unused_vars(self):
+        misc.assert_equal(
+            self,
+            textwrap.dedent('''
+                void side_Int(Int* __result, Int* n);
+                void start(void);
+
+                void side_Int(Int* __result, Int* n) {
+                  print_Int(n);
+                  *__result = *n;
+                  return;
+                }
+
+                void start(void) {
+                  Int tmp_1;
+                  Int const_1;
+                  Int const_2;
+
+                  const_1 = 2;
+                  const_2 = 3;
+
+                  side_Int(&tmp_1, &const_1);
+                  side_Int(&tmp_1, &const_2);
+                }
+
+            '''),
+            _optimized_c('''
+                func side (n Int) -> Int {
+                  print(n)
+                  return n
+                }
+                func start {
+                  a ::= plus(1 side(2))
+                  b := side(3)
+                  c := b
+                }
+            '''),
+        )
+
+    def test_unused_result_of_builtin_func(self):
+        c_code = _optimized_c('''
+            func f (n Int) {
+              multiply(n plus(n 2))
+              print(n)
+            }
+        ''')
+        self.assertNotIn('tmp_', c_code)
+        self.assertNotIn('const_', c_code)
+
+    def test_assigned_alias_is_kept(self):
+        c_code = _optimized_c('''
+            func start {
+              a ::= 1
+              b := a
+              b = 2
+              print(a)
+            }
+        ''')
+        self.assertIn('  b = a;\n', c_code)
+
+    def test_given_ast_is_not_changed(self):
+        ast_ = parse.parse('func start { a ::= 1 }')
+        ast_.ident_list = ident_table.ident_table(ast_)
+        ast_ = datatype.mark_out_datatypes(ast_)
+        eliminated_ast = optimizer.eliminate_dead_code(ast_)
+        self.assertEqual([], eliminated_ast.decl_list[0].body)
+        self.assertEqual({}, eliminated_ast.decl_list[0].vars)
+        self.assertEqual(1, len(ast_.decl_list[0].body))
+        self.assertEqual(['a'], list(ast_.decl_list[0].vars))
+
+
+class TestReuseTmpSlots(unittest.TestCase):
+
+    def test_tmps_of_different_stmts(self):
+        misc.assert_equal(
+            self,
+            textwrap.dedent('''
+                void f_Int(Int* n);
+
+                void f_Int(Int* n) {
+                  Int tmp_0;
+                  Int tmp_2;
+                  Int const_0;
+                  Int const_1;
+
+                  const_0 = 1;
+                  const_1 = 2;
+
+                  tmp_0 = (*n + const_0);
+                  print_Int(&tmp_0);
+                  tmp_0 = (*n * const_1);
+                  tmp_2 = (*n - tmp_0);
+                  print_Int(&tmp_2);
+                }
+
+            '''),
+            _optimized_c('''
+                func f (n Int) {
+                  print(plus(n 1))
+                  print(minus(n multiply(n 2)))
+                }
+            '''),
+        )
+
+    def test_var_tmp_is_pinned(self):
+        c_code = _optimized_c('''
+            func f (n Int) {
+              a := plus(n 1)
+              b ::= minus(n 1)
+              print(multiply(a b))
+            }
+        ''')
+        self.assertIn('  a = &tmp_0;\n', c_code)
+        self.assertIn('  b = &tmp_1;\n', c_code)
+        self.assertIn('  tmp_2 = (*n - const_1);\n', c_code)
+        self.assertIn('  tmp_2 = (*a * *b);\n', c_code)
+
+    def test_reference_result_pins_args(self):
+        c_code = _optimized_c('''
+            func ref (n Int) -> R:Int {
+              return allocInt()
+            }
+            func f (n Int) {
+              print(ref(plus(n 1)))
+              print(plus(n 2))
+            }
+        ''')
+        self.assertIn('  ref_Int(&tmp_1, &tmp_0);\n', c_code)
+        self.assertIn('  tmp_2 = (*n + const_1);\n', c_code)
+
+    def test_given_ast_is_not_changed(self):
+        ast_ = parse.parse(textwrap.dedent('''
+            func f (n Int) {
+              print(plus(n 1))
+              print(plus(n 2))
+            }
+        '''))
+        ast_.ident_list = ident_table.ident_table(ast_)
+        ast_ = datatype.mark_out_datatypes(ast_)
+        allocated_ast = optimizer.reuse_tmp_slots(ast_)
+        self.assertEqual(['tmp_0'], list(allocated_ast.decl_list[0].tmp_vars))
+        self.assertEqual(2, len(ast_.decl_list[0].tmp_vars))
+        self.assertEqual(
+            'tmp_1',
+            ast_.decl_list[0].body[1].arg_list[0].binded_var_name,
+        )
+
+
+# vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab:
@@ -5,15 +5,23 @@
 ''' Test parse module. '''
 
 
+import os
+import shutil
+import tempfile
 import unittest
 from misery import (
     ast,
     datatype,
     misc,
     parse,
+    testutil,
 )
 
 
+def setUpModule():
+    testutil.use_tmp_cache_dir()
+
+
 def _std_module():
     ''' Return basic ast.
         Usage:
@@ -31,33 +39,33 @@ def _std_module():
 
 
 def _parse(input_string):
-    return parse.make_parser().parse(
-        input_string,
-        lexer=parse.make_lexer(),
-    )
+    return parse.get_session().parse(input_string)
 
 
 class TestParser(unittest.TestCase):
-    ''' Test parse.make_parser() func. '''
+    ''' Test LALR parser of parse.Session. '''
+
+    def _parse(self, input_string):
+        return _parse(input_string)
 
     def test_empty_module(self):
         ''' Parse empty string. '''
         input_string = ''
-        real_ast = _parse(input_string)
+        real_ast = self._parse(input_string)
         expected_ast = ast.Module()
         misc.assert_equal(self, expected_ast, real_ast)
 
     def test_empty_import(self):
         ''' Parse empty import stmt. '''
         input_string = 'import {}'
-        real_ast = _parse(input_string)
+        real_ast = self._parse(input_string)
         expected_ast = ast.Module()
         misc.assert_equal(self, expected_ast, real_ast)
 
     def test_simple_import(self):
         ''' Parse import stmt. '''
         input_string = 'import {module1}'
-        real_ast = _parse(input_string)
+        real_ast = self._parse(input_string)
         expected_ast = ast.Module(
             import_list=['module1'],
         )
@@ -66,7 +74,7 @@ class TestParser(unittest.TestCase):
     def test_simple_import_2(self):
         ''' Parse import stmt with two modules. '''
         input_string = 'import {module1 module2}'
-        real_ast = _parse(input_string)
+        real_ast = self._parse(input_string)
         expected_ast = ast.Module(
             import_list=['module1', 'module2'],
         )
@@ -82,7 +90,7 @@ class TestParser(unittest.TestCase):
             '  }\n'
             '}\n'
         )
-        real_ast = _parse(input_string)
+        real_ast = self._parse(input_string)
         expected_ast = ast.Module(
             decl_list=[
                 ast.ClassDecl(
@@ -112,7 +120,7 @@ class TestParser(unittest.TestCase):
               }
             }
         '''
-        real_ast = _parse(input_string)
+        real_ast = self._parse(input_string)
         expected_ast = ast.Module(
             decl_list=[
                 ast.ClassDecl(
@@ -135,7 +143,7 @@ class TestParser(unittest.TestCase):
     def test_const_decl(self):
         ''' Parse constant decl. '''
         input_string = 'const importantIdent Int := 10'
-        real_ast = _parse(input_string)
+        real_ast = self._parse(input_string)
         expected_ast = ast.Module(
             decl_list=[
                 ast.ConstDecl(
@@ -150,7 +158,7 @@ class TestParser(unittest.TestCase):
     def test_simple_func(self):
         ''' Parse minimal fnction decl. '''
         input_string = 'func testfunc2 {}'
-        real_ast = _parse(input_string)
+        real_ast = self._parse(input_string)
         expected_ast = ast.Module(
             decl_list=[
                 ast.FuncDecl(
@@ -164,7 +172,7 @@ class TestParser(unittest.TestCase):
     def test_simple_func_with_return_value(self):
         ''' Parse func that returns Int. '''
         input_string = 'func testfunc2 -> Int {}'
-        real_ast = _parse(input_string)
+        real_ast = self._parse(input_string)
         expected_ast = ast.Module(
             decl_list=[
                 ast.FuncDecl(
@@ -180,7 +188,7 @@ class TestParser(unittest.TestCase):
     def test_simple_func_with_param(self):
         ''' Parse func that takes one param. '''
         input_string = 'func testfunc (param ParamType) {}'
-        real_ast = _parse(input_string)
+        real_ast = self._parse(input_string)
         signature = ast.FuncSignature(
             param_list=[
                 ast.Param(
@@ -202,7 +210,7 @@ class TestParser(unittest.TestCase):
     def test_simple_func_with_2_params(self):
         ''' Parse func that takes two params. '''
         input_string = 'func testfunc (par1 ParamType, par2 ParamType) {}'
-        real_ast = _parse(input_string)
+        real_ast = self._parse(input_string)
         signature = ast.FuncSignature(
             param_list=[
                 ast.Param(
@@ -228,7 +236,7 @@ class TestParser(unittest.TestCase):
     def test_func_body_2_empty_blocks(self):
         ''' Parse fnction with empty blocks. '''
         input_string = 'func start { {} {} }'
-        real_ast = _parse(input_string)
+        real_ast = self._parse(input_string)
         expected_ast = _std_module()
         expected_ast.decl_list[0].body = [[], []]
         misc.assert_equal(self, expected_ast, real_ast)
@@ -236,7 +244,7 @@ class TestParser(unittest.TestCase):
     def test_simple_func_call(self):
         ''' Parse simple func call. '''
         input_string = 'func start { fname2() }'
-        real_ast = _parse(input_string)
+        real_ast = self._parse(input_string)
         expected_ast = _std_module()
         funccall = ast.FuncCall(
             expr=ast.Ident('fname2'),
@@ -247,7 +255,7 @@ class TestParser(unittest.TestCase):
     def test_var_decl_without_initialization(self):
         ''' Parse var decl stmt. '''
         input_string = 'func start { testVar := Int() }'
-        real_ast = _parse(input_string)
+        real_ast = self._parse(input_string)
         expected_ast = _std_module()
         var = ast.VarDecl(
             name='testVar',
@@ -261,7 +269,7 @@ class TestParser(unittest.TestCase):
     def test_var_decl_with_type_and_initialization(self):
         ''' Parse var decl stmt with initiaization. '''
         input_string = 'func start { testVar := Int(666) }'
-        real_ast = _parse(input_string)
+        real_ast = self._parse(input_string)
         expected_ast = _std_module()
         var = ast.VarDecl(
             name='testVar',
@@ -280,7 +288,7 @@ class TestParser(unittest.TestCase):
             initiaization and without explicit  type.
         '''
         input_string = 'func start { testVar := 666 }'
-        real_ast = _parse(input_string)
+        real_ast = self._parse(input_string)
         expected_ast = _std_module()
         var = ast.VarDecl(
             name='testVar',
@@ -292,7 +300,7 @@ class TestParser(unittest.TestCase):
     def test_var_decl_with_ctor(self):
         ''' Parse var decl stmt with constructor call. '''
         input_string = 'func start { p := Parser() }'
-        real_ast = _parse(input_string)
+        real_ast = self._parse(input_string)
         expected_ast = _std_module()
         var = ast.VarDecl(
             name='p',
@@ -308,7 +316,7 @@ class TestParser(unittest.TestCase):
             complex initiaization.
         '''
         input_string = 'func start { v2 := plus(1 2) }'
-        real_ast = _parse(input_string)
+        real_ast = self._parse(input_string)
         expected_ast = _std_module()
         var = ast.VarDecl(
             name='v2',
@@ -325,7 +333,7 @@ class TestParser(unittest.TestCase):
             constructor call with args.
         '''
         input_string = 'func start { p := Parser(lexer 1) }'
-        real_ast = _parse(input_string)
+        real_ast = self._parse(input_string)
         expected_ast = _std_module()
         expected_ast.decl_list[0].body.append(
             ast.VarDecl(
@@ -344,7 +352,7 @@ class TestParser(unittest.TestCase):
     def test_simple_if(self):
         ''' Parse if stmt. '''
         input_string = 'func start { if 1 {} }'
-        real_ast = _parse(input_string)
+        real_ast = self._parse(input_string)
         expected_ast = _std_module()
         expected_ast.decl_list[0].body.append(
             ast.If(
@@ -357,7 +365,7 @@ class TestParser(unittest.TestCase):
     def test_simple_if_else(self):
         ''' Parse if-else stmt. '''
         input_string = 'func start { if 1 {} else {} }'
-        real_ast = _parse(input_string)
+        real_ast = self._parse(input_string)
         expected_ast = _std_module()
         expected_ast.decl_list[0].body.append(
             ast.If(
@@ -371,7 +379,7 @@ class TestParser(unittest.TestCase):
     def test_nested_func_call_1(self):
         ''' Parse nested func call. '''
         input_string = 'func start { a()() }'
-        real_ast = _parse(input_string)
+        real_ast = self._parse(input_string)
         expected_ast = _std_module()
         expected_ast.decl_list[0].body.append(
             ast.FuncCall(
@@ -385,7 +393,7 @@ class TestParser(unittest.TestCase):
     def test_simple_return_1(self):
         ''' Parse return stmt with integer. '''
         input_string = 'func start { return 1 }'
-        real_ast = _parse(input_string)
+        real_ast = self._parse(input_string)
         expected_ast = _std_module()
         expected_ast.decl_list[0].body.append(
             ast.Return(expr=ast.Number(1)),
@@ -395,7 +403,7 @@ class TestParser(unittest.TestCase):
     def test_simple_return_2(self):
         ''' Parse return stmt without any value. '''
         input_string = 'func start { return }'
-        real_ast = _parse(input_string)
+        real_ast = self._parse(input_string)
         expected_ast = _std_module()
         expected_ast.decl_list[0].body.append(
             ast.Return(expr=None),
@@ -405,7 +413,7 @@ class TestParser(unittest.TestCase):
     def test_simple_return_3(self):
         ''' Parse return stmt with func call. '''
         input_string = 'func start { return x() }'
-        real_ast = _parse(input_string)
+        real_ast = self._parse(input_string)
         expected_ast = _std_module()
         expected_ast.decl_list[0].body.append(
             ast.Return(
@@ -419,7 +427,7 @@ class TestParser(unittest.TestCase):
     def test_generic_func_1(self):
         ''' First test of generic funcs. '''
         input_string = 'func testFunc <Int> {}'
-        real_ast = _parse(input_string)
+        real_ast = self._parse(input_string)
         expected_ast = ast.Module(
             decl_list=[
                 ast.FuncDecl(
@@ -434,7 +442,7 @@ class TestParser(unittest.TestCase):
 
     def test_type_prefix_1(self):
         input_string = 'func testFunc -> RM:Int {}'
-        real_ast = _parse(input_string)
+        real_ast = self._parse(input_string)
         expected_ast = ast.Module(
             decl_list=[
                 ast.FuncDecl(
@@ -453,7 +461,7 @@ class TestParser(unittest.TestCase):
     def test_string(self):
         ''' Parse anythong with string. '''
         input_string = 'func start { return "hi" }'
-        real_ast = _parse(input_string)
+        real_ast = self._parse(input_string)
         expected_ast = _std_module()
         expected_ast.decl_list[0].body.append(
             ast.Return(
@@ -467,7 +475,7 @@ class TestParser(unittest.TestCase):
         self.assertRaisesRegexp(
             Exception,
             'Lexer error: Illegal character',
-            _parse,
+            self._parse,
             input_string,
         )
 
@@ -477,11 +485,243 @@ class TestParser(unittest.TestCase):
         self.assertRaisesRegexp(
             Exception,
             'Parser error: unexpected token',
-            _parse,
+            self._parse,
+            input_string,
+        )
+
+
+class TestParserWithFastLexer(TestParser):
+    ''' Run parser tests with parse.FastLexer. '''
+
+    def _parse(self, input_string):
+        return parse.get_session().parse(
             input_string,
+            lexer=parse.FastLexer(),
         )
 
 
+class TestParserWithDescentParser(TestParser):
+    ''' Run parser tests with recursive descent backend. '''
+
+    def _parse(self, input_string):
+        return parse.parse(input_string, backend='descent')
+
+
+class TestParse(unittest.TestCase):
+    ''' Test parse.parse() func. '''
+
+    def _check_same_ast(self, input_string):
+        expected_ast = parse.parse(input_string, backend='ply')
+        real_ast = parse.parse(input_string, backend='descent')
+        misc.assert_equal(self, expected_ast, real_ast)
+
+    def _check_same_error(self, input_string):
+        messages = []
+        for backend in ('ply', 'descent'):
+            try:
+                parse.parse(input_string, backend=backend)
+            except Exception as e:
+                messages.append(str(e))
+        self.assertEqual(2, len(messages))
+        misc.assert_equal(self, messages[0], messages[1])
+
+    def test_call_of_call(self):
+        ''' Call suffixes are applied greedily. '''
+        self._check_same_ast('func f { g(a (b)) print(x) (y) f()() }')
+
+    def test_nested_blocks(self):
+        ''' Nested block is stored as list in stmt list. '''
+        self._check_same_ast('func f { {} { x := 1 } }')
+
+    def test_leading_comma_in_params(self):
+        ''' Param list may start with comma. '''
+        self._check_same_ast('func f (, a Int, b R:Int) {}')
+
+    def test_return_not_at_block_end(self):
+        ''' Return must be the last stmt in block. '''
+        self._check_same_error('func f { return 1 print(x) }')
+
+    def test_expr_stmt_error(self):
+        ''' Expr without call is not a stmt. '''
+        self._check_same_error('func f { x }')
+
+    def test_lex_error_after_parse_error(self):
+        ''' Parser error is reported before later lexer error. '''
+        self._check_same_error('func start 666 &')
+
+    def test_end_of_input_error(self):
+        ''' Unexpected end of input is reported. '''
+        for backend in ('ply', 'descent'):
+            self.assertRaisesRegexp(
+                Exception,
+                'Parser error: unexpected end of input',
+                parse.parse,
+                'func f {',
+                backend=backend,
+            )
+
+    def test_bad_backend(self):
+        ''' Unknown backend name. '''
+        self.assertRaisesRegexp(
+            Exception,
+            'Bad parser backend: xxx',
+            parse.parse,
+            'func start {}',
+            backend='xxx',
+        )
+
+
+class TestFastLexer(unittest.TestCase):
+    ''' Test parse.FastLexer class and parse.scan() func. '''
+
+    def _tokens(self, lexer, input_string):
+        lexer.input(input_string)
+        return [
+            (token.type, token.value, token.lineno, token.lexpos)
+            for token in lexer
+        ]
+
+    def _error_message(self, lexer, input_string):
+        try:
+            self._tokens(lexer, input_string)
+        except Exception as e:
+            return str(e)
+        self.fail('no lexer error')
+
+    def test_same_tokens_as_ply_lexer(self):
+        ''' Compare token stream with ply lexer one. '''
+        input_string = (
+            'import {module1}\n'
+            '# comment\n'
+            'func fib (n Int, r R:Int) -> Int {\n'
+            '  a ::= -1\n'
+            '  b := "multi\nline" c = a->b\n'
+            '  if isLess(n 2) { return n } else { return plus(n 1) }\n'
+            '}\n'
+        )
+        expected_tokens = self._tokens(
+            parse.get_session().make_lexer(),
+            input_string,
+        )
+        real_tokens = self._tokens(parse.FastLexer(), input_string)
+        misc.assert_equal(self, expected_tokens, real_tokens)
+
+    def test_same_error_as_ply_lexer(self):
+        ''' Compare error message with ply lexer one. '''
+        input_string = 'func start {\n  a := 1 &\n}'
+        expected_message = self._error_message(
+            parse.get_session().make_lexer(),
+            input_string,
+        )
+        real_message = self._error_message(parse.FastLexer(), input_string)
+        misc.assert_equal(self, expected_message, real_message)
+
+    def test_error_is_raised_lazily(self):
+        ''' Tokens before illegal character are returned. '''
+        lexer = parse.FastLexer()
+        lexer.input('func &')
+        self.assertEqual('FUNC', lexer.token().type)
+        self.assertRaisesRegexp(
+            Exception,
+            'Lexer error: Illegal character',
+            lexer.token,
+        )
+
+    def test_scan(self):
+        ''' scan() returns tuples with column numbers. '''
+        input_string = 'func f\n  x ::= 1'
+        expected_tokens = [
+            ('FUNC', 'func', 1, 0, 0),
+            ('IDENT', 'f', 1, 5, 5),
+            ('IDENT', 'x', 2, 9, 2),
+            ('DOUBLECOLONASSIGN', '::=', 2, 11, 4),
+            ('NUMBER', 1, 2, 15, 8),
+        ]
+        misc.assert_equal(self, expected_tokens, parse.scan(input_string))
+
+    def test_scan_interns_idents(self):
+        ''' Equal identifiers share one string object. '''
+        token_list = parse.scan('someName' + ' someName')
+        self.assertIs(token_list[0][1], token_list[1][1])
+
+
+class TestSession(unittest.TestCase):
+    ''' Test parse.Session class. '''
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def _cache_files(self):
+        return [
+            name for name in os.listdir(self.cache_dir)
+            if name.endswith('.pickle')
+        ]
+
+    def test_parse(self):
+        ''' Session parses the same way as make_parser. '''
+        input_string = 'func start { print(plus(1 2)) }'
+        session = parse.Session(cache_dir=self.cache_dir)
+        real_ast = session.parse(input_string)
+        expected_ast = parse.make_parser(cache_dir=self.cache_dir).parse(
+            input_string,
+            lexer=parse.make_lexer(),
+        )
+        misc.assert_equal(self, expected_ast, real_ast)
+
+    def test_lexer_state_is_not_shared(self):
+        ''' Line numbers start from scratch for every parse. '''
+        input_string = '\n\nfunc start &'
+        session = parse.Session(cache_dir=self.cache_dir)
+        messages = []
+        for _ in range(2):
+            try:
+                session.parse(input_string)
+            except Exception as e:
+                messages.append(str(e))
+        self.assertEqual(2, len(messages))
+        self.assertEqual(messages[0], messages[1])
+
+    def test_tables_are_cached(self):
+        ''' Second session loads tables from cache dir. '''
+        parse.Session(cache_dir=self.cache_dir)
+        cache_files = self._cache_files()
+        self.assertEqual(1, len(cache_files))
+        session = parse.Session(cache_dir=self.cache_dir)
+        self.assertEqual(cache_files, self._cache_files())
+        real_ast = session.parse('func start {}')
+        misc.assert_equal(self, _std_module(), real_ast)
+
+    def test_broken_cache_file(self):
+        ''' Broken cache file is rebuilt. '''
+        parse.Session(cache_dir=self.cache_dir)
+        filename = os.path.join(self.cache_dir, self._cache_files()[0])
+        with open(filename, 'wb') as f:
+            f.write(b'garbage')
+        session = parse.Session(cache_dir=self.cache_dir)
+        real_ast = session.parse('func start {}')
+        misc.assert_equal(self, _std_module(), real_ast)
+        with open(filename, 'rb') as f:
+            self.assertNotEqual(b'garbage', f.read())
+
+    def test_get_session(self):
+        ''' get_session() always returns the same object. '''
+        self.assertIs(parse.get_session(), parse.get_session())
+
+    def test_get_session_with_other_cache_dir(self):
+        ''' Session is replaced when other cache dir is given. '''
+        old_session = parse.get_session()
+        session = parse.get_session(cache_dir=self.cache_dir)
+        try:
+            self.assertEqual(self.cache_dir, session.cache_dir)
+            self.assertIs(session, parse.get_session())
+            self.assertEqual(1, len(self._cache_files()))
+        finally:
+            parse.get_session(cache_dir=old_session.cache_dir)
+
+
 class TestFindColumn(unittest.TestCase):
     ''' Test parse.find_column() func. '''
 
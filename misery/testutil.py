@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for copyright and license details
+
+
+''' Helpers shared by test modules. '''
+
+
+import os
+import tempfile
+from misery import (
+    parse,
+)
+
+
+_tmp_dir = None
+
+
+def tmp_dir():
+    ''' Temp dir shared by all tests of process, removed at exit. '''
+    global _tmp_dir
+    if _tmp_dir is None:
+        _tmp_dir = tempfile.TemporaryDirectory(prefix='misery_test_')
+    return _tmp_dir.name
+
+
+def use_tmp_cache_dir():
+    ''' Keep caches written by tests out of user cache dir.
+
+        MISERY_CACHE_DIR is set for this process and its children
+        and process-wide parser Session caches tables there.
+    '''
+    cache_dir = os.path.join(tmp_dir(), 'cache')
+    os.environ['MISERY_CACHE_DIR'] = cache_dir
+    parse.get_session(cache_dir=cache_dir)
+
+
+# vim: set tabstop=4 shiftwidth=4 softtabstop=4 expandtab: